@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NoReturn, Optional, TypeVar, Union
+
+from SessionHandler.Metrics import SessionMetrics
+from SessionHandler.SessionHandler import SessionHandler, Browser
+from SessionHandler.SessionObject import SessionObject
+
+_T = TypeVar('_T')
+
+
+class AsyncSessionHandler:
+    __browser: Browser
+    __checkpoint_interval: float = 30
+    __collect_metrics = False
+    __driver_pool: Optional['DriverPool'] = None
+    __executor: ThreadPoolExecutor
+    __idb_batch_size: Optional[int] = None
+    __log: logging.Logger
+    __login_timeout: Optional[float] = None
+    __max_concurrency: int
+    __metrics_callback: Optional[Callable[[SessionMetrics], NoReturn]] = None
+    __offline_extraction = False
+    __profile_errors: 'dict[str, Exception]'
+    __script_timeout: Optional[float] = None
+    __semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]'
+    __semaphores_lock: threading.Lock
+    __session: SessionObject
+    __single_step_restore = False
+    __skip_profiles_without_storage = True
+
+    def __init__(self, session_class: SessionObject, browser: Union[Browser, str], max_concurrency: int = 4):
+        """
+        Run :class:`SessionHandler` operations without blocking the event loop
+
+        Every operation gets its own SessionHandler and browser and runs in a worker thread.
+
+        :param session_class: the session that is used if an operation does not get its own session
+        :param browser: the browser that should be used
+        :param max_concurrency: the maximum number of operations that are allowed to run at the same time
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency cannot be < 1')
+        self.__session = session_class
+        self.__browser = Browser(browser.lower()) if isinstance(browser, str) else browser
+        self.__max_concurrency = max_concurrency
+        self.__executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='AsyncSessionHandler')
+        self.__profile_errors = {}
+        self.__semaphores = weakref.WeakKeyDictionary()
+        self.__semaphores_lock = threading.Lock()
+        self.__log = logging.getLogger('SessionHandler')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __create_handler(self, session: Optional[SessionObject]) -> SessionHandler:
+        handler = SessionHandler(session if session is not None else self.__session, self.__browser)
+        if self.__script_timeout is not None:
+            handler.set_script_timeout(self.__script_timeout)
+        if self.__login_timeout is not None:
+            handler.set_login_timeout(self.__login_timeout)
+        handler.set_idb_batch_size(self.__idb_batch_size)
+        handler.set_single_step_restore(self.__single_step_restore)
+        handler.set_offline_extraction(self.__offline_extraction)
+        handler.set_skip_profiles_without_storage(self.__skip_profiles_without_storage)
+        handler.set_driver_pool(self.__driver_pool)
+        handler.set_collect_metrics(self.__collect_metrics, self.__metrics_callback)
+        return handler
+
+    async def __run(self, session: Optional[SessionObject], action: Callable[[SessionHandler], _T],
+                    timeout: Optional[float]) -> _T:
+        # A semaphore is bound to the loop it was first used in, every loop that runs operations gets its own.
+        loop = asyncio.get_running_loop()
+        with self.__semaphores_lock:
+            semaphore = self.__semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self.__semaphores[loop] = asyncio.Semaphore(self.__max_concurrency)
+        async with semaphore:
+            lock = threading.Lock()
+            # The handler is created by the worker, creating it reads the browser profiles from the disk.
+            worker = {'handler': None, 'aborted': False}
+
+            def run_action() -> _T:
+                handler = self.__create_handler(session)
+                with lock:
+                    worker['handler'] = handler
+                    aborted = worker['aborted']
+                if aborted:
+                    handler.abort()
+                return action(handler)
+
+            future = loop.run_in_executor(self.__executor, run_action)
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                # The worker thread cannot be cancelled, quitting its browser makes it stop at the next browser call.
+                with lock:
+                    worker['aborted'] = True
+                    handler = worker['handler']
+                if handler is not None:
+                    handler.abort()
+                raise
+
+    def set_script_timeout(self, timeout: float) -> NoReturn:
+        if timeout <= 0:
+            raise ValueError('Timeout cannot be <= 0')
+        self.__script_timeout = timeout
+
+    def set_collect_metrics(self, enabled: bool,
+                            callback: Optional[Callable[[SessionMetrics], NoReturn]] = None) -> NoReturn:
+        self.__collect_metrics = enabled
+        self.__metrics_callback = callback
+
+    def set_login_timeout(self, timeout: float) -> NoReturn:
+        if timeout <= 0:
+            raise ValueError('Timeout cannot be <= 0')
+        self.__login_timeout = timeout
+
+    def set_idb_batch_size(self, batch_size: Optional[int]) -> NoReturn:
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError('Batch size cannot be <= 0')
+        self.__idb_batch_size = batch_size
+
+    def set_single_step_restore(self, enabled: bool) -> NoReturn:
+        self.__single_step_restore = enabled
+
+    def set_offline_extraction(self, enabled: bool) -> NoReturn:
+        self.__offline_extraction = enabled
+
+    def set_skip_profiles_without_storage(self, enabled: bool) -> NoReturn:
+        self.__skip_profiles_without_storage = enabled
+
+    def set_checkpoint_interval(self, interval: float) -> NoReturn:
+        """
+        :param interval: the maximum time between two captures of `open_session` in seconds
+        """
+        if interval <= 0:
+            raise ValueError('Interval cannot be <= 0')
+        self.__checkpoint_interval = interval
+
+    def set_driver_pool(self, driver_pool: Optional['DriverPool']) -> NoReturn:
+        if driver_pool is not None and driver_pool.get_browser() != self.__browser:
+            raise ValueError('The browser of the driver pool does not match the selected browser.')
+        self.__driver_pool = driver_pool
+
+    async def create_new_session(self, session: Optional[SessionObject] = None,
+                                 timeout: Optional[float] = None) -> SessionObject:
+        """
+        Coroutine version of :meth:`SessionHandler.create_new_session`
+
+        :param session: the session class that should be used instead of the one passed to `__init__`
+        :param timeout: the maximum time in seconds the operation is allowed to take, `None` waits forever
+
+        :return: the new session
+        """
+        return await self.__run(session, lambda handler: handler.create_new_session(), timeout)
+
+    async def get_active_session(self, use_profile: Optional[Union['list[str]', str]] = None, all_profiles=False,
+                                 session: Optional[SessionObject] = None,
+                                 timeout: Optional[float] = None) -> Union['dict[str, SessionObject]', SessionObject]:
+        """
+        Coroutine version of :meth:`SessionHandler.get_active_session`
+
+        Every profile is extracted by its own browser, failed profiles are skipped and can be inspected with
+        `get_profile_errors`.
+
+        :param use_profile: a profile name or a list of profile names, if `None` a new session is created
+        :param all_profiles: get the sessions of all profiles of the selected browser
+        :param session: the session class that should be used instead of the one passed to `__init__`
+        :param timeout: the maximum time in seconds the extraction of a single profile is allowed to take
+
+        :return: a dict containing the sessions by profile name or a single session
+        """
+        self.__profile_errors = {}
+        if all_profiles:
+            skip_profiles = self.__skip_profiles_without_storage
+            profile_list = await self.__run(session, lambda handler: handler.get_profile_list(skip_profiles), None)
+        elif use_profile is None:
+            return await self.create_new_session(session, timeout)
+        elif isinstance(use_profile, str):
+            profile_list = [use_profile]
+        elif isinstance(use_profile, list):
+            profile_list = use_profile
+        else:
+            raise ValueError('Invalid profile provided. Make sure you provided a list of profiles or a profile name.')
+
+        results = await asyncio.gather(*[
+            self.__run(session, lambda handler, profile=profile: handler.get_active_session(profile)[profile],
+                       timeout)
+            for profile in profile_list
+        ], return_exceptions=True)
+
+        profile_storage_dict = {}
+        for profile, result in zip(profile_list, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                self.__log.error('Could not get session of profile %s: %s', profile, result)
+                self.__profile_errors[profile] = result
+            else:
+                profile_storage_dict[profile] = result
+        return profile_storage_dict
+
+    def get_profile_errors(self) -> 'dict[str, Exception]':
+        return self.__profile_errors
+
+    async def open_session(self, session: Optional[SessionObject] = None, timeout: Optional[float] = None,
+                           checkpoint_path: Optional[str] = None, wait_for_close: bool = True) -> SessionObject:
+        """
+        Coroutine version of :meth:`SessionHandler.open_session`
+
+        Cancelling the coroutine closes the browser window.
+
+        :param session: the session that should be opened instead of the one passed to `__init__`
+        :param timeout: the maximum time in seconds the browser is allowed to stay open, `None` waits forever
+        :param checkpoint_path: the session file the checkpoints of this session are saved to, `None` disables
+                                checkpointing, see :meth:`SessionHandler.set_checkpointing`
+        :param wait_for_close: `False` restores and captures the session without a user, see
+                               :meth:`SessionHandler.open_session`
+
+        :return: the session that was captured last
+        """
+        interval = self.__checkpoint_interval
+
+        def open_with_checkpoints(handler: SessionHandler) -> SessionObject:
+            handler.set_checkpointing(checkpoint_path, interval)
+            return handler.open_session(wait_for_close)
+
+        return await self.__run(session, open_with_checkpoints, timeout)
+
+    def close(self) -> NoReturn:
+        """
+        Shut down the worker threads, operations that are still running are not interrupted
+        """
+        self.__executor.shutdown(wait=False)
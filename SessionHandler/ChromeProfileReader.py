@@ -0,0 +1,421 @@
+import contextlib
+import datetime
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+from SessionHandler import Snappy
+from SessionHandler.IDBKey import to_hashable_key
+from SessionHandler.LevelDB import read_leveldb
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+from SessionHandler.V8Deserializer import deserialize
+from SessionHandler.Varint import read_varint
+
+# content/browser/indexed_db/indexed_db_leveldb_coding.cc
+_GLOBAL_DATABASE_NAME = 201
+_DATABASE_USER_VERSION = 4
+_OBJECT_STORE_META_DATA = 50
+_INDEX_META_DATA = 100
+_OBJECT_STORE_NAME = 0
+_OBJECT_STORE_KEY_PATH = 1
+_OBJECT_STORE_AUTO_INCREMENT = 2
+_INDEX_NAME = 0
+_INDEX_UNIQUE = 1
+_INDEX_KEY_PATH = 2
+_INDEX_MULTI_ENTRY = 3
+_OBJECT_STORE_DATA_INDEX_ID = 1
+_BLOB_ENTRY_INDEX_ID = 3
+
+_KEY_NULL = 0
+_KEY_STRING = 1
+_KEY_DATE = 2
+_KEY_NUMBER = 3
+_KEY_ARRAY = 4
+_KEY_BINARY = 6
+
+_KEY_PATH_NULL = 0
+_KEY_PATH_STRING = 1
+_KEY_PATH_ARRAY = 2
+
+# third_party/blink/renderer/modules/indexeddb/idb_value_wrapping.cc
+_WRAPPED_PSEUDO_VERSION = 0x11
+_WRAPPED_IN_BLOB = 1
+_WRAPPED_SNAPPY = 2
+
+# components/services/storage/dom_storage/local_storage_impl.cc
+_LS_UTF16 = 0
+_LS_LATIN1 = 1
+
+# Chrome counts cookie expiry in microseconds since 1601-01-01.
+_WINDOWS_EPOCH_OFFSET = 11644473600
+
+
+def _decode_string(data: bytes) -> str:
+    return data.decode('utf-16-be', 'surrogatepass')
+
+
+def _read_string_with_length(data: bytes, pos: int) -> tuple[str, int]:
+    length, pos = read_varint(data, pos)
+    if pos + 2 * length > len(data):
+        raise ValueError('Invalid IndexedDB data: string exceeds the data.')
+    return _decode_string(data[pos:pos + 2 * length]), pos + 2 * length
+
+
+def _decode_key_prefix(data: bytes) -> Optional[tuple[int, int, int, int]]:
+    # The first byte holds the byte lengths of the database, object store and index ids that follow it.
+    if len(data) == 0:
+        return None
+    db_id_size = (data[0] >> 5) + 1
+    os_id_size = ((data[0] >> 2) & 0x07) + 1
+    index_id_size = (data[0] & 0x03) + 1
+    end = 1 + db_id_size + os_id_size + index_id_size
+    if end > len(data):
+        return None
+    db_id = int.from_bytes(data[1:1 + db_id_size], 'little')
+    os_id = int.from_bytes(data[1 + db_id_size:1 + db_id_size + os_id_size], 'little')
+    index_id = int.from_bytes(data[1 + db_id_size + os_id_size:end], 'little')
+    return db_id, os_id, index_id, end
+
+
+def _decode_key(data: bytes, pos: int) -> tuple[object, int]:
+    key_type = data[pos]
+    pos += 1
+    if key_type == _KEY_NULL:
+        return None, pos
+    if key_type == _KEY_STRING:
+        return _read_string_with_length(data, pos)
+    if key_type == _KEY_DATE:
+        number = struct.unpack_from('<d', data, pos)[0]
+        return datetime.datetime.fromtimestamp(number / 1000, datetime.timezone.utc), pos + 8
+    if key_type == _KEY_NUMBER:
+        number = struct.unpack_from('<d', data, pos)[0]
+        return int(number) if number.is_integer() else number, pos + 8
+    if key_type == _KEY_ARRAY:
+        length, pos = read_varint(data, pos)
+        key = []
+        for _ in range(length):
+            item, pos = _decode_key(data, pos)
+            key.append(item)
+        return key, pos
+    if key_type == _KEY_BINARY:
+        length, pos = read_varint(data, pos)
+        return data[pos:pos + length], pos + length
+    raise ValueError(f'Invalid IndexedDB key: unknown type {key_type:#x}.')
+
+
+def decode_key(data: bytes) -> object:
+    """
+    Decode an IndexedDB key in the encoding Chrome uses for its LevelDB databases
+
+    :param data: the encoded key
+    :return: the key, dates are returned as :class:`datetime.datetime` and binary keys as bytes
+    """
+    if len(data) == 0:
+        raise ValueError('Invalid IndexedDB key: the key is empty.')
+    return _decode_key(data, 0)[0]
+
+
+def _decode_key_path(data: bytes) -> Optional[object]:
+    if len(data) < 3 or data[0] != 0 or data[1] != 0:
+        # Key paths written by old versions are plain strings.
+        return _decode_string(data)
+    if data[2] == _KEY_PATH_NULL:
+        return None
+    if data[2] == _KEY_PATH_STRING:
+        return _read_string_with_length(data, 3)[0]
+    if data[2] == _KEY_PATH_ARRAY:
+        length, pos = read_varint(data, 3)
+        key_path = []
+        for _ in range(length):
+            item, pos = _read_string_with_length(data, pos)
+            key_path.append(item)
+        return key_path
+    raise ValueError(f'Invalid IndexedDB key path: unknown type {data[2]}.')
+
+
+def _decode_blob_numbers(data: bytes) -> list[int]:
+    blob_numbers = []
+    pos = 0
+    while pos < len(data):
+        is_file = data[pos] != 0
+        blob_number, pos = read_varint(data, pos + 1)
+        _, pos = _read_string_with_length(data, pos)
+        if is_file:
+            _, pos = _read_string_with_length(data, pos)
+        else:
+            _, pos = read_varint(data, pos)
+        blob_numbers.append(blob_number)
+    return blob_numbers
+
+
+def get_origin_identifier(url: str) -> str:
+    """
+    Get the name Chrome uses for the storage directories of an origin
+
+    :param url: an URL of the origin
+    :return: the origin identifier, e.g. ``https_web.whatsapp.com_0``
+    """
+    parts = urlsplit(url)
+    return f'{parts.scheme}_{parts.hostname}_{parts.port if parts.port is not None else 0}'
+
+
+class ChromeProfileReader:
+    __profile_dir: str
+    __log: logging.Logger
+
+    def __init__(self, profile_dir: str):
+        """
+        Read sessions directly from the files of a Chrome profile, no browser has to be started
+
+        :param profile_dir: the path to the profile directory (e.g. ``Default``), not the user data directory
+        """
+        if not os.path.isdir(profile_dir):
+            raise ValueError(f'Profile directory does not exist: {profile_dir}')
+        self.__profile_dir = profile_dir
+        self.__log = logging.getLogger('SessionHandler')
+
+    @staticmethod
+    @contextlib.contextmanager
+    def __open_database(path: str) -> Iterator[sqlite3.Connection]:
+        # A running Chrome keeps the cookie database locked, so a copy is read instead.
+        with tempfile.TemporaryDirectory(prefix='SessionHandler') as temp_dir:
+            temp_path = os.path.join(temp_dir, 'db.sqlite')
+            shutil.copyfile(path, temp_path)
+            if os.path.isfile(path + '-journal'):
+                shutil.copyfile(path + '-journal', temp_path + '-journal')
+            connection = sqlite3.connect(temp_path)
+            try:
+                yield connection
+            finally:
+                connection.close()
+
+    def __get_idb_dir(self, url: str) -> str:
+        return os.path.join(self.__profile_dir, 'IndexedDB', get_origin_identifier(url) + '.indexeddb.leveldb')
+
+    def __get_blob_dir(self, url: str) -> str:
+        return os.path.join(self.__profile_dir, 'IndexedDB', get_origin_identifier(url) + '.indexeddb.blob')
+
+    def get_profile_dir(self) -> str:
+        return self.__profile_dir
+
+    def has_origin_storage(self, url: str) -> bool:
+        """
+        Check if the profile contains storage of an origin without opening any database
+
+        localStorage of all origins shares one database, so only the IndexedDB directory is checked.
+
+        :param url: an URL of the origin
+        :return: `True` if the origin has an IndexedDB directory
+        """
+        return os.path.isdir(self.__get_idb_dir(url))
+
+    def get_cookies(self, url: str) -> dict[str, str]:
+        """
+        Get the cookies `document.cookie` would return on the given page
+
+        Encrypted cookie values cannot be read without the key of the operating system's keyring and are skipped.
+
+        :param url: the URL of the page
+        :return: a dict containing the cookie values by name
+        """
+        path = os.path.join(self.__profile_dir, 'Network', 'Cookies')
+        if not os.path.isfile(path):
+            path = os.path.join(self.__profile_dir, 'Cookies')
+            if not os.path.isfile(path):
+                return {}
+        hostname = urlsplit(url).hostname
+        now = (time.time() + _WINDOWS_EPOCH_OFFSET) * 1000000
+        cookie_dict = {}
+        with self.__open_database(path) as connection:
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(cookies)')]
+            partition_filter = " AND top_frame_site_key = ''" if 'top_frame_site_key' in columns else ''
+            rows = connection.execute(
+                'SELECT name, value, encrypted_value, host_key, path, expires_utc FROM cookies '
+                'WHERE is_httponly = 0' + partition_filter + ' ORDER BY length(path) DESC, creation_utc'
+            )
+            for name, value, encrypted_value, host, cookie_path, expires in rows:
+                if host.startswith('.'):
+                    if hostname != host[1:] and not hostname.endswith(host):
+                        continue
+                elif hostname != host:
+                    continue
+                if cookie_path not in ('', '/'):
+                    continue
+                if expires != 0 and expires < now:
+                    continue
+                if value == '' and encrypted_value:
+                    self.__log.debug('Skipping encrypted cookie: %s', name)
+                    continue
+                cookie_dict.setdefault(name, value)
+        return cookie_dict
+
+    def get_local_storage(self, url: str) -> dict[str, str]:
+        """
+        Get the localStorage of an origin
+
+        :param url: an URL of the origin
+        :return: a dict containing the localStorage items
+        """
+        path = os.path.join(self.__profile_dir, 'Local Storage', 'leveldb')
+        if not os.path.isdir(path):
+            return {}
+        parts = urlsplit(url)
+        prefix = f'_{parts.scheme}://{parts.netloc}\x00'.encode('utf-8')
+        local_storage_dict = {}
+        for key, value in read_leveldb(path).items():
+            if not key.startswith(prefix) or len(key) == len(prefix) or len(value) == 0:
+                continue
+            local_storage_dict[self.__decode_local_storage_string(key[len(prefix):])] = \
+                self.__decode_local_storage_string(value)
+        return local_storage_dict
+
+    @staticmethod
+    def __decode_local_storage_string(data: bytes) -> str:
+        if data[0] == _LS_LATIN1:
+            return data[1:].decode('latin-1')
+        if data[0] == _LS_UTF16:
+            return data[1:].decode('utf-16-le', 'surrogatepass')
+        raise ValueError(f'Invalid localStorage data: unknown string format {data[0]}.')
+
+    def __unwrap_value(self, data: bytes, blob_path: Optional[str]) -> bytes:
+        # Blink compresses large values and moves values that are still too large into a blob file.
+        while len(data) >= 3 and data[0] == 0xFF and data[1] == _WRAPPED_PSEUDO_VERSION:
+            if data[2] == _WRAPPED_SNAPPY:
+                data = Snappy.decompress(data[3:])
+            elif data[2] == _WRAPPED_IN_BLOB:
+                if blob_path is None:
+                    raise ValueError('Value was moved to a blob file that does not exist.')
+                with open(blob_path, 'rb') as file:
+                    data = file.read()
+                blob_path = None
+            else:
+                break
+        return data
+
+    def __get_blob_path(self, blob_dir: str, db_id: int, blob_entries: dict[bytes, bytes], encoded_key: bytes,
+                        data: bytes) -> Optional[str]:
+        if len(data) < 3 or data[2] != _WRAPPED_IN_BLOB or encoded_key not in blob_entries:
+            return None
+        _, pos = read_varint(data, 3)
+        blob_index, _ = read_varint(data, pos)
+        blob_numbers = _decode_blob_numbers(blob_entries[encoded_key])
+        if blob_index >= len(blob_numbers):
+            return None
+        blob_number = blob_numbers[blob_index]
+        return os.path.join(blob_dir, f'{db_id:x}', f'{(blob_number & 0xff00) >> 8:02x}', f'{blob_number:x}')
+
+    def __get_database(self, entries: dict[bytes, bytes], blob_dir: str, db_id: int,
+                       name: str) -> IDBDatabase:
+        version = 1
+        # os_id -> metadata type -> value
+        object_store_meta = {}
+        # (os_id, index_id) -> metadata type -> value
+        index_meta = {}
+        # os_id -> index_id -> encoded key -> value
+        os_entries = {}
+        for key, value in entries.items():
+            prefix = _decode_key_prefix(key)
+            if prefix is None or prefix[0] != db_id:
+                continue
+            _, os_id, index_id, pos = prefix
+            if os_id == 0 and index_id == 0 and pos < len(key):
+                if key[pos] == _DATABASE_USER_VERSION and pos + 1 == len(key):
+                    version = read_varint(value, 0)[0]
+                elif key[pos] == _OBJECT_STORE_META_DATA:
+                    meta_os_id, meta_pos = read_varint(key, pos + 1)
+                    if meta_pos < len(key):
+                        object_store_meta.setdefault(meta_os_id, {})[key[meta_pos]] = value
+                elif key[pos] == _INDEX_META_DATA:
+                    meta_os_id, meta_pos = read_varint(key, pos + 1)
+                    meta_index_id, meta_pos = read_varint(key, meta_pos)
+                    if meta_pos < len(key):
+                        index_meta.setdefault((meta_os_id, meta_index_id), {})[key[meta_pos]] = value
+            elif index_id in (_OBJECT_STORE_DATA_INDEX_ID, _BLOB_ENTRY_INDEX_ID):
+                os_entries.setdefault(os_id, {}).setdefault(index_id, {})[key[pos:]] = value
+
+        new_db = IDBDatabase(name, version)
+        object_stores = sorted(
+            (_decode_string(meta[_OBJECT_STORE_NAME]), os_id) for os_id, meta in object_store_meta.items()
+            if _OBJECT_STORE_NAME in meta
+        )
+        for os_name, os_id in object_stores:
+            meta = object_store_meta[os_id]
+            auto_increment = meta.get(_OBJECT_STORE_AUTO_INCREMENT, b'\x00') not in (b'', b'\x00')
+            key_path = _decode_key_path(meta[_OBJECT_STORE_KEY_PATH]) if _OBJECT_STORE_KEY_PATH in meta else None
+            new_os = IDBObjectStore(os_name, auto_increment, key_path)
+            indices = sorted(
+                (_decode_string(meta[_INDEX_NAME]), meta) for (index_os_id, _), meta in index_meta.items()
+                if index_os_id == os_id and _INDEX_NAME in meta
+            )
+            for index_name, index in indices:
+                new_os.create_index(index_name, {
+                    'unique': index.get(_INDEX_UNIQUE, b'\x00') not in (b'', b'\x00'),
+                    'keyPath': _decode_key_path(index[_INDEX_KEY_PATH]) if _INDEX_KEY_PATH in index else None,
+                    'multiEntry': index.get(_INDEX_MULTI_ENTRY, b'\x00') not in (b'', b'\x00')
+                })
+            data_entries = os_entries.get(os_id, {})
+            blob_entries = data_entries.get(_BLOB_ENTRY_INDEX_ID, {})
+            records = []
+            for encoded_key, value in data_entries.get(_OBJECT_STORE_DATA_INDEX_ID, {}).items():
+                key = decode_key(encoded_key)
+                try:
+                    # Every value starts with the version of the record.
+                    _, pos = read_varint(value, 0)
+                    data = value[pos:]
+                    blob_path = self.__get_blob_path(blob_dir, db_id, blob_entries, encoded_key, data)
+                    record = deserialize(self.__unwrap_value(data, blob_path))
+                except (ValueError, OSError) as error:
+                    raise ValueError(f'Could not decode record {key!r} of "{name}/{os_name}": {error}') from error
+                records.append((to_hashable_key(key), record))
+            # LevelDB orders the keys with a custom comparator, the records are sorted like getAll() returns them.
+            records.sort(key=lambda item: item[0])
+            for _, record in records:
+                new_os.add_data(record)
+            new_db.add_object_store(new_os)
+        return new_db
+
+    def get_indexed_db(self, url: str, db_names: Optional[list[str]] = None) -> IndexedDB:
+        """
+        Get the IndexedDB of an origin
+
+        :param url: an URL of the origin
+        :param db_names: the databases that should be read, `None` reads every database of the origin
+        :return: the IndexedDB containing the requested databases that exist
+        """
+        new_idb = IndexedDB(url)
+        path = self.__get_idb_dir(url)
+        if not os.path.isdir(path):
+            return new_idb
+        entries = read_leveldb(path)
+        global_prefix = b'\x00\x00\x00\x00' + bytes([_GLOBAL_DATABASE_NAME])
+        database_ids = {}
+        for key, value in entries.items():
+            if key.startswith(global_prefix):
+                _, pos = _read_string_with_length(key, len(global_prefix))
+                db_name, _ = _read_string_with_length(key, pos)
+                database_ids[db_name] = int.from_bytes(value, 'little')
+        for name in db_names if db_names is not None else sorted(database_ids.keys()):
+            if name in database_ids:
+                new_idb.add_db(self.__get_database(entries, self.__get_blob_dir(url), database_ids[name], name))
+            else:
+                self.__log.debug('IndexedDB database does not exist in profile: %s', name)
+        return new_idb
+
+    def get_session(self, session: SessionObject) -> SessionObject:
+        """
+        Read a session from the profile
+
+        :param session: a session object of the requested type, only its name, URL and database names are used
+        :return: a new session object containing the stored session
+        """
+        url = session.get_url()
+        self.__log.info('Reading session from Chrome profile: %s', self.__profile_dir)
+        return SessionObject(session.get_name(), url, session.get_file_ext(),
+                             self.get_cookies(url), self.get_local_storage(url),
+                             self.get_indexed_db(url, session.get_idb_db_names()))
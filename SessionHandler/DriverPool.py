@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+from typing import Callable, NoReturn, Optional, Union
+
+import selenium.webdriver.chrome.webdriver as c_wd
+import selenium.webdriver.firefox.webdriver as f_wd
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from SessionHandler.SessionHandler import Browser, create_browser_options
+
+_HEALTH_CHECK_JS = '''
+        // pySessionHandler: health_check
+        return 1;
+'''
+
+
+class DriverPool:
+    __browser: Browser
+    __size: int
+    __max_uses: int
+    __driver_factory: Callable[[], Union[c_wd.WebDriver, f_wd.WebDriver]]
+    __idle: list[Union[c_wd.WebDriver, f_wd.WebDriver]]
+    # id(driver) -> number of times the driver was handed out
+    __uses: dict[int, int]
+    __driver_num: int
+    __closed: bool
+    __condition: threading.Condition
+    __log: logging.Logger
+
+    def __create_default_driver(self) -> Union[c_wd.WebDriver, f_wd.WebDriver]:
+        options = create_browser_options(self.__browser, True)
+        if self.__browser == Browser.CHROME:
+            return webdriver.Chrome(options=options)
+        return webdriver.Firefox(options=options)
+
+    def __create_driver(self) -> Union[c_wd.WebDriver, f_wd.WebDriver]:
+        self.__log.info('Starting pooled browser... [TYPE: %s]', self.__browser.value)
+        driver = self.__driver_factory()
+        self.__uses[id(driver)] = 0
+        return driver
+
+    def __discard(self, driver: Union[c_wd.WebDriver, f_wd.WebDriver]) -> NoReturn:
+        self.__uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def __is_healthy(driver: Union[c_wd.WebDriver, f_wd.WebDriver]) -> bool:
+        try:
+            return driver.execute_script(_HEALTH_CHECK_JS) == 1
+        except Exception:
+            return False
+
+    def __init__(self, browser: Union[Browser, str], size: int = 2, max_uses: int = 20,
+                 driver_factory: Optional[Callable[[], Union[c_wd.WebDriver, f_wd.WebDriver]]] = None):
+        """
+        Create a pool of headless browsers that are reused across :class:`SessionHandler` operations
+
+        :param browser: the browser that should be used
+        :param size: the maximum number of browsers in the pool
+        :param max_uses: the number of uses after which a browser is replaced by a fresh one
+        :param driver_factory: a function creating a new webdriver, defaults to a headless browser
+        """
+        if size < 1:
+            raise ValueError('Pool size cannot be < 1')
+        if max_uses < 1:
+            raise ValueError('max_uses cannot be < 1')
+        self.__browser = Browser(browser.lower()) if isinstance(browser, str) else browser
+        self.__size = size
+        self.__max_uses = max_uses
+        self.__driver_factory = driver_factory if driver_factory is not None else self.__create_default_driver
+        self.__idle = []
+        self.__uses = {}
+        self.__driver_num = 0
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__log = logging.getLogger('SessionHandler')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_browser(self) -> Browser:
+        return self.__browser
+
+    def warm_up(self) -> NoReturn:
+        """
+        Start browsers until the pool is full
+        """
+        with self.__condition:
+            missing = self.__size - self.__driver_num
+            self.__driver_num = self.__size
+        for position in range(missing):
+            try:
+                driver = self.__create_driver()
+            except Exception:
+                with self.__condition:
+                    self.__driver_num -= missing - position
+                    self.__condition.notify_all()
+                raise
+            with self.__condition:
+                self.__idle.append(driver)
+                self.__condition.notify()
+
+    def acquire(self, timeout: Optional[float] = None) -> Union[c_wd.WebDriver, f_wd.WebDriver]:
+        """
+        Get a browser from the pool, a new one is started if the pool is not full yet
+
+        :param timeout: the maximum time in seconds to wait for a free browser, `None` waits forever
+
+        :return: the webdriver, pass it to `release` after using it
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            driver = None
+            with self.__condition:
+                while True:
+                    if self.__closed:
+                        raise RuntimeError('Cannot acquire a browser from a closed pool.')
+                    if len(self.__idle) > 0:
+                        driver = self.__idle.pop()
+                        break
+                    if self.__driver_num < self.__size:
+                        self.__driver_num += 1
+                        break
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if (remaining is not None and remaining <= 0) or not self.__condition.wait(remaining):
+                        raise TimeoutError('No browser of the pool became available in time.')
+            if driver is None:
+                break
+            # Browser calls can be slow, they must not block other threads that acquire or release browsers.
+            if self.__is_healthy(driver):
+                self.__uses[id(driver)] += 1
+                return driver
+            self.__log.warning('Discarding unhealthy pooled browser.')
+            self.__discard(driver)
+            with self.__condition:
+                self.__driver_num -= 1
+                self.__condition.notify()
+        try:
+            driver = self.__create_driver()
+        except Exception:
+            with self.__condition:
+                self.__driver_num -= 1
+                self.__condition.notify()
+            raise
+        self.__uses[id(driver)] += 1
+        return driver
+
+    def release(self, driver: Union[c_wd.WebDriver, f_wd.WebDriver],
+                idb_db_names: Optional[list[str]] = None) -> NoReturn:
+        """
+        Return a browser to the pool
+
+        Cookies, localStorage and IndexedDB of the currently opened origin are deleted before the browser can be used
+        again. Browsers that are unhealthy or reached `max_uses` are replaced.
+
+        :param driver: the webdriver returned by `acquire`
+        :param idb_db_names: databases that should be deleted if the browser can not list them itself
+        """
+        recycle = self.__uses.get(id(driver), self.__max_uses) >= self.__max_uses
+        if not recycle:
+            try:
+                self.reset_origin_storage(driver, idb_db_names)
+                driver.get('about:blank')
+            except Exception as error:
+                self.__log.warning('Could not reset pooled browser: %s', error)
+                recycle = True
+        with self.__condition:
+            recycle = recycle or self.__closed
+            if recycle:
+                self.__driver_num -= 1
+            else:
+                self.__idle.append(driver)
+            self.__condition.notify()
+        if recycle:
+            self.__discard(driver)
+
+    @staticmethod
+    def reset_origin_storage(driver: Union[c_wd.WebDriver, f_wd.WebDriver],
+                             idb_db_names: Optional[list[str]] = None) -> NoReturn:
+        driver.delete_all_cookies()
+        result = driver.execute_async_script('''
+        // pySessionHandler: reset_storage
+        const callback = arguments[arguments.length - 1];
+        const fallbackNames = arguments[0];
+        async function resetStorage() {
+          window.localStorage.clear();
+          window.sessionStorage.clear();
+          let names = fallbackNames;
+          if (indexedDB.databases != undefined) {
+            names = (await indexedDB.databases()).map(db => db.name);
+          }
+          for (const name of names) {
+            await new Promise((resolve, reject) => {
+              const deleteRequest = indexedDB.deleteDatabase(name);
+              deleteRequest.onsuccess = _ => resolve();
+              deleteRequest.onerror = _ => reject(new Error('Could not delete "' + name + '": ' + deleteRequest.error));
+              deleteRequest.onblocked = _ => reject(new Error('Deleting "' + name + '" is blocked.'));
+            });
+          }
+        }
+        resetStorage().then(_ => callback({}), error => callback({'error': String(error)}));
+        ''', idb_db_names if idb_db_names is not None else [])
+        if result.get('error') is not None:
+            raise WebDriverException(f'Could not reset origin storage: {result["error"]}')
+
+    def close(self) -> NoReturn:
+        """
+        Quit all idle browsers, browsers that are still in use are quit when they are released
+        """
+        with self.__condition:
+            self.__closed = True
+            idle = self.__idle
+            self.__driver_num -= len(idle)
+            self.__idle = []
+            self.__condition.notify_all()
+        for driver in idle:
+            self.__discard(driver)
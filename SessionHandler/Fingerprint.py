@@ -0,0 +1,29 @@
+import hashlib
+import json
+from typing import Iterable
+
+DIGEST_SIZE = 16
+
+
+def hash_value(value: object) -> bytes:
+    """
+    Hash a JSON serializable value, the order of object keys does not change the hash
+
+    :param value: the value
+    :return: the digest
+    """
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode('utf-8', 'surrogatepass'), digest_size=DIGEST_SIZE).digest()
+
+
+def hash_digests(digests: Iterable[bytes]) -> bytes:
+    """
+    Combine the digests of child nodes into the digest of their parent
+
+    :param digests: the digests in a stable order
+    :return: the digest
+    """
+    combined = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for digest in digests:
+        combined.update(digest)
+    return combined.digest()
@@ -0,0 +1,560 @@
+import contextlib
+import datetime
+import glob
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+from SessionHandler import Snappy
+from SessionHandler.JsValue import UNDEFINED, to_json_number, to_json_date, typed_array_to_json, is_array_index, \
+    order_properties
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+# dom/indexedDB/Key.h
+_KEY_TERMINATOR = 0x00
+_KEY_FLOAT = 0x10
+_KEY_DATE = 0x20
+_KEY_STRING = 0x30
+_KEY_BINARY = 0x40
+_KEY_ARRAY = 0x50
+_KEY_MAX_ARRAY_COLLAPSE = 3
+
+# js/src/vm/StructuredClone.cpp
+_SCTAG_FLOAT_MAX = 0xFFF00000
+_SCTAG_HEADER = 0xFFF10000
+_SCTAG_NULL = 0xFFFF0000
+_SCTAG_UNDEFINED = 0xFFFF0001
+_SCTAG_BOOLEAN = 0xFFFF0002
+_SCTAG_INT32 = 0xFFFF0003
+_SCTAG_STRING = 0xFFFF0004
+_SCTAG_DATE_OBJECT = 0xFFFF0005
+_SCTAG_REGEXP_OBJECT = 0xFFFF0006
+_SCTAG_ARRAY_OBJECT = 0xFFFF0007
+_SCTAG_OBJECT_OBJECT = 0xFFFF0008
+_SCTAG_ARRAY_BUFFER_OBJECT_V2 = 0xFFFF0009
+_SCTAG_BOOLEAN_OBJECT = 0xFFFF000A
+_SCTAG_STRING_OBJECT = 0xFFFF000B
+_SCTAG_NUMBER_OBJECT = 0xFFFF000C
+_SCTAG_BACK_REFERENCE_OBJECT = 0xFFFF000D
+_SCTAG_TYPED_ARRAY_OBJECT_V2 = 0xFFFF0010
+_SCTAG_MAP_OBJECT = 0xFFFF0011
+_SCTAG_SET_OBJECT = 0xFFFF0012
+_SCTAG_END_OF_KEYS = 0xFFFF0013
+_SCTAG_DATA_VIEW_OBJECT_V2 = 0xFFFF0015
+_SCTAG_BIGINT = 0xFFFF001D
+_SCTAG_BIGINT_OBJECT = 0xFFFF001E
+_SCTAG_ARRAY_BUFFER_OBJECT = 0xFFFF001F
+_SCTAG_TYPED_ARRAY_OBJECT = 0xFFFF0020
+_SCTAG_DATA_VIEW_OBJECT = 0xFFFF0021
+_SCTAG_TYPED_ARRAY_V1_MIN = 0xFFFF0100
+_SCTAG_TYPED_ARRAY_V1_MAX = 0xFFFF01FF
+# element formats by js::Scalar::Type
+_TYPED_ARRAY_FORMATS = ['b', 'B', 'h', 'H', 'i', 'I', 'f', 'd', 'B', 'q', 'Q', 'e']
+
+# dom/localstorage/LSValue.h
+_LS_CONVERSION_UTF16_UTF8 = 1
+_LS_COMPRESSION_SNAPPY = 1
+
+
+def _decode_key_number(data: bytes, pos: int) -> tuple[float, int]:
+    # Trailing zero bytes of a key are trimmed, so the last number can be shorter than 8 bytes.
+    number = int.from_bytes(data[pos:pos + 8].ljust(8, b'\x00'), 'big')
+    if number & 0x8000000000000000:
+        bits = number & 0x7FFFFFFFFFFFFFFF
+    else:
+        bits = -number & 0xFFFFFFFFFFFFFFFF
+    return struct.unpack('<d', struct.pack('<Q', bits))[0], pos + 8
+
+
+def _decode_key_units(data: bytes, pos: int) -> tuple[list[int], int]:
+    units = []
+    while pos < len(data) and data[pos] != _KEY_TERMINATOR:
+        byte = data[pos]
+        if byte & 0x80 == 0:
+            units.append(byte - 1)
+            pos += 1
+        elif byte & 0x40 == 0:
+            second = data[pos + 1] if pos + 1 < len(data) else 0
+            units.append((((byte << 8) | second) + 0x7F - 0x8000) & 0xFFFF)
+            pos += 2
+        else:
+            second = data[pos + 1] if pos + 1 < len(data) else 0
+            third = data[pos + 2] if pos + 2 < len(data) else 0
+            units.append(((byte << 10) | (second << 2) | (third >> 6)) & 0xFFFF)
+            pos += 3
+    return units, pos + 1
+
+
+def _decode_key(data: bytes, pos: int, type_offset: int) -> tuple[object, int]:
+    key_type = data[pos] - type_offset
+    if key_type >= _KEY_ARRAY:
+        type_offset += _KEY_ARRAY
+        if type_offset == _KEY_ARRAY * _KEY_MAX_ARRAY_COLLAPSE:
+            pos += 1
+            type_offset = 0
+        key = []
+        while pos < len(data) and data[pos] - type_offset != _KEY_TERMINATOR:
+            item, pos = _decode_key(data, pos, type_offset)
+            type_offset = 0
+            key.append(item)
+        return key, pos + 1
+    if key_type == _KEY_STRING:
+        units, pos = _decode_key_units(data, pos + 1)
+        return struct.pack(f'<{len(units)}H', *units).decode('utf-16-le', 'surrogatepass'), pos
+    if key_type == _KEY_BINARY:
+        units, pos = _decode_key_units(data, pos + 1)
+        return bytes(units), pos
+    if key_type == _KEY_DATE:
+        number, pos = _decode_key_number(data, pos + 1)
+        return datetime.datetime.fromtimestamp(number / 1000, datetime.timezone.utc), pos
+    if key_type == _KEY_FLOAT:
+        return _decode_key_number(data, pos + 1)
+    raise ValueError(f'Invalid IndexedDB key: unknown type {data[pos]:#x}.')
+
+
+def decode_key(data: bytes) -> object:
+    """
+    Decode an IndexedDB key in the encoding Firefox uses for its SQLite databases
+
+    :param data: the encoded key
+    :return: the key, dates are returned as :class:`datetime.datetime` and binary keys as bytes
+    """
+    if len(data) == 0:
+        raise ValueError('Invalid IndexedDB key: the key is empty.')
+    return _decode_key(data, 0, 0)[0]
+
+
+class StructuredCloneReader:
+    """
+    Decode SpiderMonkey structured clone data into the values JSON.stringify would produce in the browser
+    """
+    __data: bytes
+    __pos: int
+    # every object in the order it was read, back references point into this list
+    __objects: list[object]
+    # id of the dict that represents an ArrayBuffer -> contents of the buffer
+    __buffers: dict[int, bytes]
+
+    def __init__(self, data: bytes):
+        self.__data = data
+        self.__pos = 0
+        self.__objects = []
+        self.__buffers = {}
+
+    def __read_pair(self) -> tuple[int, int]:
+        if self.__pos + 8 > len(self.__data):
+            raise ValueError('Invalid structured clone data: unexpected end of data.')
+        data, tag = struct.unpack_from('<II', self.__data, self.__pos)
+        self.__pos += 8
+        return tag, data
+
+    def __read_uint64(self) -> int:
+        if self.__pos + 8 > len(self.__data):
+            raise ValueError('Invalid structured clone data: unexpected end of data.')
+        value, = struct.unpack_from('<Q', self.__data, self.__pos)
+        self.__pos += 8
+        return value
+
+    def __read_double(self) -> float:
+        self.__read_uint64()
+        return struct.unpack_from('<d', self.__data, self.__pos - 8)[0]
+
+    def __read_bytes(self, length: int) -> bytes:
+        if self.__pos + length > len(self.__data):
+            raise ValueError('Invalid structured clone data: unexpected end of data.')
+        value = self.__data[self.__pos:self.__pos + length]
+        # Everything is aligned to 8 bytes.
+        self.__pos += (length + 7) & ~7
+        return value
+
+    def __read_string(self, data: int) -> str:
+        length = data & 0x7FFFFFFF
+        if data & 0x80000000:
+            return self.__read_bytes(length).decode('latin-1')
+        return self.__read_bytes(length * 2).decode('utf-16-le', 'surrogatepass')
+
+    def __read_bigint(self, data: int) -> int:
+        value = 0
+        for i in range(data & 0x7FFFFFFF):
+            value |= self.__read_uint64() << (64 * i)
+        return -value if data & 0x80000000 else value
+
+    def __read_property_key(self, tag: int, data: int) -> str:
+        if tag == _SCTAG_INT32:
+            return str(struct.unpack('<i', struct.pack('<I', data))[0])
+        if tag == _SCTAG_STRING:
+            return self.__read_string(data)
+        raise ValueError(f'Invalid structured clone data: unexpected property key tag {tag:#x}.')
+
+    def __read_array_buffer(self, length: int) -> dict:
+        # JSON.stringify turns an ArrayBuffer into an empty object, the contents are kept for typed arrays.
+        value = {}
+        self.__objects.append(value)
+        self.__buffers[id(value)] = self.__read_bytes(length)
+        return value
+
+    def __read_typed_array(self, array_type: int, element_num: int, buffer: Optional[bytes] = None) -> dict:
+        if array_type >= len(_TYPED_ARRAY_FORMATS):
+            raise ValueError(f'Invalid structured clone data: unknown typed array type {array_type}.')
+        # The typed array is registered before its buffer, back references depend on this order.
+        index = len(self.__objects)
+        self.__objects.append(None)
+        byte_offset = 0
+        if buffer is None:
+            buffer_object = self.__read_value(*self.__read_pair())
+            if id(buffer_object) not in self.__buffers:
+                raise ValueError('Invalid structured clone data: typed array without an ArrayBuffer.')
+            buffer = self.__buffers[id(buffer_object)]
+            byte_offset = self.__read_uint64()
+        element_format = f'<{element_num}{_TYPED_ARRAY_FORMATS[array_type]}'
+        if byte_offset + struct.calcsize(element_format) > len(buffer):
+            raise ValueError('Invalid structured clone data: typed array exceeds its ArrayBuffer.')
+        elements = struct.unpack_from(element_format, buffer, byte_offset)
+        value = typed_array_to_json(elements)
+        self.__objects[index] = value
+        return value
+
+    def __read_properties(self) -> Iterator[tuple[str, object]]:
+        while True:
+            tag, data = self.__read_pair()
+            if tag == _SCTAG_END_OF_KEYS:
+                return
+            key = self.__read_property_key(tag, data)
+            yield key, self.__read_value(*self.__read_pair())
+
+    def __read_value(self, tag: int, data: int) -> object:
+        if tag <= _SCTAG_FLOAT_MAX:
+            return to_json_number(struct.unpack_from('<d', self.__data, self.__pos - 8)[0])
+        if tag == _SCTAG_NULL:
+            return None
+        if tag == _SCTAG_UNDEFINED:
+            return UNDEFINED
+        if tag == _SCTAG_BOOLEAN:
+            return data != 0
+        if tag == _SCTAG_INT32:
+            return struct.unpack('<i', struct.pack('<I', data))[0]
+        if tag == _SCTAG_STRING:
+            return self.__read_string(data)
+        if tag == _SCTAG_BIGINT:
+            return self.__read_bigint(data)
+        if tag == _SCTAG_BACK_REFERENCE_OBJECT:
+            if data >= len(self.__objects):
+                raise ValueError('Invalid structured clone data: invalid back reference.')
+            return self.__objects[data]
+
+        if tag == _SCTAG_BOOLEAN_OBJECT:
+            value = data != 0
+        elif tag == _SCTAG_STRING_OBJECT:
+            value = self.__read_string(data)
+        elif tag == _SCTAG_NUMBER_OBJECT:
+            value = to_json_number(self.__read_double())
+        elif tag == _SCTAG_BIGINT_OBJECT:
+            value = self.__read_bigint(data)
+        elif tag == _SCTAG_DATE_OBJECT:
+            value = to_json_date(self.__read_double())
+        elif tag == _SCTAG_REGEXP_OBJECT:
+            string_tag, string_data = self.__read_pair()
+            if string_tag != _SCTAG_STRING:
+                raise ValueError('Invalid structured clone data: RegExp without source.')
+            self.__read_string(string_data)
+            value = {}
+        elif tag == _SCTAG_OBJECT_OBJECT:
+            value = {}
+            self.__objects.append(value)
+            for key, property_value in self.__read_properties():
+                if property_value is not UNDEFINED:
+                    value[key] = property_value
+            order_properties(value)
+            return value
+        elif tag == _SCTAG_ARRAY_OBJECT:
+            value = [None] * data
+            self.__objects.append(value)
+            for key, element in self.__read_properties():
+                if is_array_index(key) and int(key) < data:
+                    value[int(key)] = None if element is UNDEFINED else element
+            return value
+        elif tag == _SCTAG_MAP_OBJECT or tag == _SCTAG_SET_OBJECT:
+            # Maps and Sets cannot be represented by JSON.stringify, only their entries have to be skipped.
+            value = {}
+            self.__objects.append(value)
+            while True:
+                entry_tag, entry_data = self.__read_pair()
+                if entry_tag == _SCTAG_END_OF_KEYS:
+                    break
+                self.__read_value(entry_tag, entry_data)
+                if tag == _SCTAG_MAP_OBJECT:
+                    self.__read_value(*self.__read_pair())
+            return value
+        elif tag == _SCTAG_ARRAY_BUFFER_OBJECT_V2:
+            return self.__read_array_buffer(data)
+        elif tag == _SCTAG_ARRAY_BUFFER_OBJECT:
+            return self.__read_array_buffer(self.__read_uint64())
+        elif tag == _SCTAG_TYPED_ARRAY_OBJECT or tag == _SCTAG_TYPED_ARRAY_OBJECT_V2:
+            return self.__read_typed_array(data, self.__read_uint64())
+        elif _SCTAG_TYPED_ARRAY_V1_MIN <= tag <= _SCTAG_TYPED_ARRAY_V1_MAX:
+            array_type = tag - _SCTAG_TYPED_ARRAY_V1_MIN
+            element_size = struct.calcsize('<' + _TYPED_ARRAY_FORMATS[array_type])
+            return self.__read_typed_array(array_type, data, self.__read_bytes(data * element_size))
+        elif tag == _SCTAG_DATA_VIEW_OBJECT or tag == _SCTAG_DATA_VIEW_OBJECT_V2:
+            value = {}
+            self.__objects.append(value)
+            self.__read_uint64()
+            self.__read_value(*self.__read_pair())
+            self.__read_uint64()
+            return value
+        else:
+            raise ValueError(f'Unsupported structured clone tag: {tag:#x}')
+        self.__objects.append(value)
+        return value
+
+    def read(self) -> object:
+        tag, data = self.__read_pair()
+        if tag == _SCTAG_HEADER:
+            tag, data = self.__read_pair()
+        value = self.__read_value(tag, data)
+        return None if value is UNDEFINED else value
+
+
+def decode_structured_clone(data: bytes) -> object:
+    return StructuredCloneReader(data).read()
+
+
+def _deserialize_key_path(key_path: Optional[str]) -> Optional[object]:
+    # Array key paths are stored as their components, each one prefixed with a comma.
+    if key_path is not None and key_path.startswith(','):
+        return key_path[1:].split(',')
+    return key_path
+
+
+def get_origin_dir_name(url: str) -> str:
+    """
+    Get the name of the directory Firefox uses for the storage of an origin
+
+    :param url: an URL of the origin, e.g. https://web.whatsapp.com/
+    :return: the directory name, e.g. https+++web.whatsapp.com
+    """
+    parts = urlsplit(url)
+    dir_name = f'{parts.scheme}+++{parts.hostname}'
+    if parts.port is not None:
+        dir_name += f'+{parts.port}'
+    return dir_name
+
+
+class FirefoxProfileReader:
+    __profile_dir: str
+    __log: logging.Logger
+
+    def __init__(self, profile_dir: str):
+        """
+        Read sessions directly from the files of a Firefox profile, no browser has to be started
+
+        :param profile_dir: the path to the profile directory
+        """
+        if not os.path.isdir(profile_dir):
+            raise ValueError(f'Profile directory does not exist: {profile_dir}')
+        self.__profile_dir = profile_dir
+        self.__log = logging.getLogger('SessionHandler')
+
+    @staticmethod
+    @contextlib.contextmanager
+    def __open_database(path: str) -> Iterator[sqlite3.Connection]:
+        # A running Firefox keeps its databases locked and has recent changes in the WAL file.
+        # Reading a copy avoids both problems, SQLite replays the copied WAL file when it opens the database.
+        with tempfile.TemporaryDirectory(prefix='SessionHandler') as temp_dir:
+            temp_path = os.path.join(temp_dir, 'db.sqlite')
+            shutil.copyfile(path, temp_path)
+            if os.path.isfile(path + '-wal'):
+                shutil.copyfile(path + '-wal', temp_path + '-wal')
+            connection = sqlite3.connect(temp_path)
+            try:
+                yield connection
+            finally:
+                connection.close()
+
+    @staticmethod
+    def __get_columns(connection: sqlite3.Connection, table: str) -> list[str]:
+        return [row[1] for row in connection.execute(f'PRAGMA table_info({table})')]
+
+    def __get_origin_dir(self, url: str) -> str:
+        return os.path.join(self.__profile_dir, 'storage', 'default', get_origin_dir_name(url))
+
+    def get_profile_dir(self) -> str:
+        return self.__profile_dir
+
+    def has_origin_storage(self, url: str) -> bool:
+        """
+        Check if the profile contains storage of an origin without opening any database
+
+        :param url: an URL of the origin
+        :return: `True` if the origin has an IndexedDB or localStorage directory
+        """
+        origin_dir = self.__get_origin_dir(url)
+        return os.path.isdir(os.path.join(origin_dir, 'idb')) or os.path.isdir(os.path.join(origin_dir, 'ls'))
+
+    def get_cookies(self, url: str) -> dict[str, str]:
+        """
+        Get the cookies `document.cookie` would return on the given page
+
+        :param url: the URL of the page
+        :return: a dict containing the cookie values by name
+        """
+        path = os.path.join(self.__profile_dir, 'cookies.sqlite')
+        if not os.path.isfile(path):
+            return {}
+        hostname = urlsplit(url).hostname
+        now = time.time()
+        cookie_dict = {}
+        with self.__open_database(path) as connection:
+            columns = self.__get_columns(connection, 'moz_cookies')
+            origin_filter = " AND originAttributes = ''" if 'originAttributes' in columns else ''
+            rows = connection.execute(
+                'SELECT name, value, host, path, expiry FROM moz_cookies '
+                'WHERE isHttpOnly = 0' + origin_filter + ' ORDER BY length(path) DESC, creationTime'
+            )
+            for name, value, host, cookie_path, expiry in rows:
+                if host.startswith('.'):
+                    if hostname != host[1:] and not hostname.endswith(host):
+                        continue
+                elif hostname != host:
+                    continue
+                if cookie_path not in ('', '/'):
+                    continue
+                # Newer Firefox versions store the expiry in milliseconds.
+                if (expiry / 1000 if expiry > 1e11 else expiry) < now:
+                    continue
+                cookie_dict.setdefault(name, value)
+        return cookie_dict
+
+    def __get_local_storage_lsng(self, path: str) -> dict[str, str]:
+        local_storage_dict = {}
+        with self.__open_database(path) as connection:
+            columns = self.__get_columns(connection, 'data')
+            if 'conversion_type' in columns:
+                query = 'SELECT key, value, conversion_type, compression_type FROM data'
+            elif 'compressed' in columns:
+                query = 'SELECT key, value, 1, compressed FROM data'
+            else:
+                query = 'SELECT key, value, 1, 0 FROM data'
+            for key, value, conversion_type, compression_type in connection.execute(query):
+                if isinstance(value, str):
+                    local_storage_dict[key] = value
+                    continue
+                if compression_type == _LS_COMPRESSION_SNAPPY:
+                    value = Snappy.decompress(value)
+                if conversion_type == _LS_CONVERSION_UTF16_UTF8:
+                    local_storage_dict[key] = value.decode('utf-8', 'surrogatepass')
+                else:
+                    local_storage_dict[key] = value.decode('latin-1')
+        return local_storage_dict
+
+    def __get_local_storage_legacy(self, path: str, url: str) -> dict[str, str]:
+        parts = urlsplit(url)
+        port = parts.port if parts.port is not None else (443 if parts.scheme == 'https' else 80)
+        origin_key = f'{parts.hostname[::-1]}.:{parts.scheme}:{port}'
+        with self.__open_database(path) as connection:
+            columns = self.__get_columns(connection, 'webappsstore2')
+            origin_filter = " AND originAttributes = ''" if 'originAttributes' in columns else ''
+            rows = connection.execute(
+                'SELECT key, value FROM webappsstore2 WHERE originKey = ?' + origin_filter, (origin_key,)
+            )
+            return {key: value for key, value in rows}
+
+    def get_local_storage(self, url: str) -> dict[str, str]:
+        """
+        Get the localStorage of an origin
+
+        The database of the current localStorage implementation is preferred over the legacy webappsstore.sqlite.
+
+        :param url: an URL of the origin
+        :return: a dict containing the localStorage items
+        """
+        lsng_path = os.path.join(self.__get_origin_dir(url), 'ls', 'data.sqlite')
+        if os.path.isfile(lsng_path):
+            return self.__get_local_storage_lsng(lsng_path)
+        legacy_path = os.path.join(self.__profile_dir, 'webappsstore.sqlite')
+        if os.path.isfile(legacy_path):
+            return self.__get_local_storage_legacy(legacy_path, url)
+        return {}
+
+    @staticmethod
+    def __read_record(db_path: str, data: object) -> bytes:
+        # Large values are stored in a separate file and only their file id is kept in the database.
+        if isinstance(data, int):
+            files_dir = os.path.splitext(db_path)[0] + '.files'
+            with open(os.path.join(files_dir, str(data)), 'rb') as file:
+                return Snappy.decompress_framed(file.read())
+        return Snappy.decompress(data)
+
+    def __get_database(self, path: str, db_names: Optional[list[str]]) -> Optional[IDBDatabase]:
+        with self.__open_database(path) as connection:
+            name, version = connection.execute('SELECT name, version FROM database').fetchone()
+            if db_names is not None and name not in db_names:
+                return None
+            new_db = IDBDatabase(name, version)
+            object_stores = connection.execute(
+                'SELECT id, name, key_path, auto_increment FROM object_store ORDER BY name'
+            ).fetchall()
+            for os_id, os_name, key_path, auto_increment in object_stores:
+                new_os = IDBObjectStore(os_name, bool(auto_increment), _deserialize_key_path(key_path))
+                indices = connection.execute(
+                    'SELECT name, key_path, unique_index, multientry FROM object_store_index '
+                    'WHERE object_store_id = ? ORDER BY name', (os_id,)
+                )
+                for index_name, index_key_path, unique, multi_entry in indices:
+                    new_os.create_index(index_name, {
+                        'unique': bool(unique),
+                        'keyPath': _deserialize_key_path(index_key_path),
+                        'multiEntry': bool(multi_entry)
+                    })
+                # Keys are encoded so that the byte order matches the IndexedDB key order.
+                rows = connection.execute(
+                    'SELECT key, data FROM object_data WHERE object_store_id = ? ORDER BY key', (os_id,)
+                )
+                for key, data in rows:
+                    try:
+                        new_os.add_data(decode_structured_clone(self.__read_record(path, data)))
+                    except ValueError as error:
+                        raise ValueError(f'Could not decode record {decode_key(key)!r} of '
+                                         f'"{name}/{os_name}": {error}') from error
+                new_db.add_object_store(new_os)
+        return new_db
+
+    def get_indexed_db(self, url: str, db_names: Optional[list[str]] = None) -> IndexedDB:
+        """
+        Get the IndexedDB of an origin
+
+        :param url: an URL of the origin
+        :param db_names: the databases that should be read, `None` reads every database of the origin
+        :return: the IndexedDB containing the requested databases that exist
+        """
+        new_idb = IndexedDB(url)
+        databases = {}
+        for path in glob.glob(os.path.join(glob.escape(self.__get_origin_dir(url)), 'idb', '*.sqlite')):
+            database = self.__get_database(path, db_names)
+            if database is not None:
+                databases[database.name] = database
+        for name in db_names if db_names is not None else sorted(databases.keys()):
+            if name in databases:
+                new_idb.add_db(databases[name])
+            else:
+                self.__log.debug('IndexedDB database does not exist in profile: %s', name)
+        return new_idb
+
+    def get_session(self, session: SessionObject) -> SessionObject:
+        """
+        Read a session from the profile
+
+        :param session: a session object of the requested type, only its name, URL and database names are used
+        :return: a new session object containing the stored session
+        """
+        url = session.get_url()
+        self.__log.info('Reading session from Firefox profile: %s', self.__profile_dir)
+        return SessionObject(session.get_name(), url, session.get_file_ext(),
+                             self.get_cookies(url), self.get_local_storage(url),
+                             self.get_indexed_db(url, session.get_idb_db_names()))
@@ -0,0 +1,132 @@
+import datetime
+from typing import Optional, Union
+
+# Sentinel used to signal that a key could not be extracted from a value.
+NO_KEY = object()
+
+
+def evaluate_key_path(value: object, key_path: Optional[Union[list[str], str]]) -> object:
+    """
+    Extract a key from a value the same way IndexedDB evaluates a keyPath
+
+    :param value: the record the key should be extracted from
+    :param key_path: a single keyPath string (e.g. ``"id"`` or ``"a.b"``) or a list of keyPath strings
+
+    :return: the extracted key or `NO_KEY` if the value does not contain the keyPath
+    """
+    if isinstance(key_path, list):
+        key = []
+        for path in key_path:
+            item = evaluate_key_path(value, path)
+            if item is NO_KEY:
+                return NO_KEY
+            key.append(item)
+        return key
+    if key_path is None:
+        return NO_KEY
+    if key_path == '':
+        return value
+    for identifier in key_path.split('.'):
+        if isinstance(value, dict) and identifier in value:
+            value = value[identifier]
+        elif isinstance(value, str) and identifier == 'length':
+            value = len(value)
+        elif isinstance(value, list) and identifier == 'length':
+            value = len(value)
+        else:
+            return NO_KEY
+    return value
+
+
+def to_hashable_key(key: object) -> Optional[tuple]:
+    """
+    Convert an IndexedDB key into a hashable representation
+
+    Two keys are considered equal by IndexedDB if and only if their hashable representations are equal.
+    Comparing hashable representations follows the IndexedDB key order (Number < Date < String < Binary < Array).
+
+    :param key: the key that should be converted
+
+    :return: the hashable key or `None` if `key` is not a valid IndexedDB key
+    """
+    # bool is a subclass of int, but booleans are not valid keys
+    if isinstance(key, bool):
+        return None
+    if isinstance(key, (int, float)):
+        if key != key:
+            # NaN is not a valid key
+            return None
+        return 1, key
+    if isinstance(key, datetime.datetime):
+        return 2, key.timestamp()
+    if isinstance(key, str):
+        return 3, key
+    if isinstance(key, (bytes, bytearray)):
+        return 4, bytes(key)
+    if isinstance(key, (list, tuple)):
+        items = []
+        for item in key:
+            hashable_item = to_hashable_key(item)
+            if hashable_item is None:
+                return None
+            items.append(hashable_item)
+        return 5, tuple(items)
+    return None
+
+
+class IDBKeyRange:
+    lower: object
+    upper: object
+    lower_open: bool
+    upper_open: bool
+
+    @staticmethod
+    def only(key: object):
+        return IDBKeyRange(key, key)
+
+    @staticmethod
+    def lower_bound(lower: object, is_open: Optional[bool] = False):
+        return IDBKeyRange(lower, None, is_open, False)
+
+    @staticmethod
+    def upper_bound(upper: object, is_open: Optional[bool] = False):
+        return IDBKeyRange(None, upper, False, is_open)
+
+    @staticmethod
+    def bound(lower: object, upper: object, lower_open: Optional[bool] = False, upper_open: Optional[bool] = False):
+        return IDBKeyRange(lower, upper, lower_open, upper_open)
+
+    def __init__(self, lower: object = None, upper: object = None,
+                 lower_open: Optional[bool] = False, upper_open: Optional[bool] = False):
+        if lower is None and upper is None:
+            raise ValueError('A key range needs at least one bound.')
+        if lower is not None and to_hashable_key(lower) is None:
+            raise ValueError(f'Invalid lower bound: {lower}')
+        if upper is not None and to_hashable_key(upper) is None:
+            raise ValueError(f'Invalid upper bound: {upper}')
+        if lower is not None and upper is not None:
+            if to_hashable_key(lower) > to_hashable_key(upper):
+                raise ValueError('The lower bound of a key range cannot be greater than the upper bound.')
+            if to_hashable_key(lower) == to_hashable_key(upper) and (lower_open or upper_open):
+                raise ValueError('A key range with equal bounds cannot be open.')
+        self.lower = lower
+        self.upper = upper
+        self.lower_open = lower_open
+        self.upper_open = upper_open
+
+    def get_hashable_bounds(self) -> tuple[Optional[tuple], Optional[tuple]]:
+        return (
+            to_hashable_key(self.lower) if self.lower is not None else None,
+            to_hashable_key(self.upper) if self.upper is not None else None
+        )
+
+    def includes(self, key: object) -> bool:
+        hashable = to_hashable_key(key)
+        if hashable is None:
+            raise ValueError(f'Invalid key: {key}')
+        lower, upper = self.get_hashable_bounds()
+        if lower is not None and (hashable < lower or (self.lower_open and hashable == lower)):
+            return False
+        if upper is not None and (hashable > upper or (self.upper_open and hashable == upper)):
+            return False
+        return True
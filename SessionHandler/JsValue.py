@@ -0,0 +1,58 @@
+import datetime
+import math
+from typing import Iterable, NoReturn, Optional
+
+# Marks JavaScript's undefined while decoding, it is dropped from objects and becomes null in arrays.
+UNDEFINED = object()
+
+
+def to_json_number(value: float) -> Optional[object]:
+    """
+    Convert a JavaScript number the way JSON.stringify does
+
+    :param value: the number
+    :return: `None` for NaN and Infinity, an int for integral numbers and the float otherwise
+    """
+    if math.isnan(value) or math.isinf(value):
+        return None
+    if value.is_integer() and abs(value) <= 2 ** 53:
+        return int(value)
+    return value
+
+
+def to_json_date(value: float) -> Optional[str]:
+    """
+    Convert the time value of a JavaScript Date the way JSON.stringify does
+
+    :param value: milliseconds since the epoch
+    :return: the ISO 8601 string or `None` for invalid dates
+    """
+    if math.isnan(value):
+        return None
+    date = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(milliseconds=value)
+    return date.strftime('%Y-%m-%dT%H:%M:%S.') + f'{date.microsecond // 1000:03d}Z'
+
+
+def typed_array_to_json(elements: Iterable[object]) -> dict[str, object]:
+    # JSON.stringify turns typed arrays into objects keyed by the element index.
+    return {str(i): to_json_number(element) if isinstance(element, float) else element
+            for i, element in enumerate(elements)}
+
+
+def is_array_index(key: str) -> bool:
+    return key.isascii() and key.isdigit() and str(int(key)) == key and int(key) < 2 ** 32 - 1
+
+
+def order_properties(properties: dict[str, object]) -> NoReturn:
+    """
+    Reorder the properties of a decoded object in place, integer keys always come first in JavaScript objects
+
+    :param properties: the decoded object
+    """
+    index_keys = sorted((key for key in properties if is_array_index(key)), key=int)
+    if len(index_keys) > 0:
+        string_properties = [(key, value) for key, value in properties.items() if not is_array_index(key)]
+        index_properties = [(key, properties[key]) for key in index_keys]
+        properties.clear()
+        properties.update(index_properties)
+        properties.update(string_properties)
@@ -0,0 +1,218 @@
+import json
+import re
+from typing import IO, Iterator, NoReturn, Optional
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+class JsonStreamWriter:
+    __file: IO[str]
+    __indent: int
+    # one entry per open container, True if the container already contains an element
+    __stack: list[bool]
+    __after_key: bool
+
+    def __init__(self, file: IO[str], indent: Optional[int] = 2):
+        self.__file = file
+        self.__indent = indent
+        self.__stack = []
+        self.__after_key = False
+
+    def __begin_element(self) -> NoReturn:
+        if self.__after_key:
+            self.__after_key = False
+            return
+        if len(self.__stack) > 0:
+            if self.__stack[-1]:
+                self.__file.write(',')
+            self.__stack[-1] = True
+            self.__newline()
+
+    def __newline(self) -> NoReturn:
+        if self.__indent is not None:
+            self.__file.write('\n' + ' ' * (self.__indent * len(self.__stack)))
+
+    def __end_container(self, char: str) -> NoReturn:
+        has_elements = self.__stack.pop()
+        if has_elements:
+            self.__newline()
+        self.__file.write(char)
+
+    def begin_object(self) -> NoReturn:
+        self.__begin_element()
+        self.__file.write('{')
+        self.__stack.append(False)
+
+    def end_object(self) -> NoReturn:
+        self.__end_container('}')
+
+    def begin_array(self) -> NoReturn:
+        self.__begin_element()
+        self.__file.write('[')
+        self.__stack.append(False)
+
+    def end_array(self) -> NoReturn:
+        self.__end_container(']')
+
+    def key(self, name: str) -> NoReturn:
+        self.__begin_element()
+        self.__file.write(json.dumps(name) + ': ')
+        self.__after_key = True
+
+    def value(self, value: object, pretty: bool = False) -> NoReturn:
+        # By default values are written on a single line, this keeps large records from being split over many lines.
+        self.__begin_element()
+        if pretty and self.__indent is not None:
+            text = json.dumps(value, indent=self.__indent)
+            self.__file.write(text.replace('\n', '\n' + ' ' * (self.__indent * len(self.__stack))))
+        else:
+            self.__file.write(json.dumps(value))
+
+    def item(self, name: str, value: object, pretty: bool = False) -> NoReturn:
+        self.key(name)
+        self.value(value, pretty)
+
+    def placeholder(self, length: int) -> int:
+        """
+        Reserve space for a value that is only known after the rest of the document was written
+
+        :param length: the number of characters that should be reserved
+        :return: the position of the placeholder, pass it to `fill_placeholder`
+        """
+        self.__begin_element()
+        position = self.__file.tell()
+        self.__file.write('null'.ljust(length))
+        return position
+
+    def fill_placeholder(self, position: int, length: int, value: object) -> NoReturn:
+        text = json.dumps(value)
+        if len(text) > length:
+            raise ValueError('Cannot fill placeholder. The value is longer than the reserved space.')
+        self.__file.seek(position)
+        self.__file.write(text.ljust(length))
+        self.__file.seek(0, 2)
+
+
+class JsonStreamReader:
+    __file: IO[str]
+    __chunk_size: int
+    __buffer: str
+    __pos: int
+    __eof: bool
+    __decoder: json.JSONDecoder
+
+    def __init__(self, file: IO[str], chunk_size: Optional[int] = 1 << 16):
+        self.__file = file
+        self.__chunk_size = chunk_size
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+        self.__decoder = json.JSONDecoder()
+
+    def __fill(self, size: Optional[int] = None) -> bool:
+        if self.__eof:
+            return False
+        chunk = self.__file.read(size if size is not None else self.__chunk_size)
+        if len(chunk) == 0:
+            self.__eof = True
+            return False
+        # Drop everything that was already consumed before growing the buffer.
+        self.__buffer = self.__buffer[self.__pos:] + chunk
+        self.__pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Get the next non-whitespace character without consuming it
+
+        :return: the next character or an empty string at the end of the file
+        """
+        while True:
+            self.__pos = _WHITESPACE.match(self.__buffer, self.__pos).end()
+            if self.__pos < len(self.__buffer) or not self.__fill():
+                break
+        return self.__buffer[self.__pos:self.__pos + 1]
+
+    def expect(self, char: str) -> NoReturn:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f'Invalid JSON: expected "{char}" but found "{found}".')
+        self.__pos += 1
+
+    def read_value(self) -> object:
+        """
+        Decode the next complete JSON value
+
+        Only the value itself is held in memory, it is decoded as soon as it is completely buffered.
+
+        :return: the decoded value
+        """
+        self.peek()
+        read_size = self.__chunk_size
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+                # A number at the end of the buffer might continue in the next chunk.
+                if end < len(self.__buffer) or self.__eof:
+                    self.__pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.__eof:
+                    raise
+            self.__fill(read_size)
+            read_size *= 2
+
+    def skip_value(self) -> NoReturn:
+        char = self.peek()
+        if char == '{':
+            for _ in self.iter_object():
+                self.skip_value()
+        elif char == '[':
+            for _ in self.iter_array():
+                self.skip_value()
+        else:
+            self.read_value()
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Iterate over the keys of the next JSON object
+
+        The caller has to consume the value of every key before requesting the next one.
+
+        :return: an iterator over the keys of the object
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.__pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError('Invalid JSON: object keys have to be strings.')
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.__pos += 1
+            else:
+                self.expect('}')
+                return
+
+    def iter_array(self) -> Iterator[None]:
+        """
+        Iterate over the elements of the next JSON array
+
+        The caller has to consume every element before requesting the next one.
+
+        :return: an iterator yielding once per element
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.__pos += 1
+            return
+        while True:
+            yield None
+            if self.peek() == ',':
+                self.__pos += 1
+            else:
+                self.expect(']')
+                return
@@ -0,0 +1,238 @@
+import os
+import re
+import struct
+from typing import Callable, Iterator, Optional
+
+from SessionHandler import Snappy
+from SessionHandler.Varint import read_varint
+
+# https://github.com/google/leveldb/blob/main/doc/log_format.md
+_LOG_BLOCK_SIZE = 32768
+_LOG_HEADER_SIZE = 7
+_LOG_FULL = 1
+_LOG_FIRST = 2
+_LOG_MIDDLE = 3
+_LOG_LAST = 4
+
+# https://github.com/google/leveldb/blob/main/doc/table_format.md
+_TABLE_MAGIC = 0xdb4775248b80fb57
+_TABLE_FOOTER_SIZE = 48
+_BLOCK_TRAILER_SIZE = 5
+_NO_COMPRESSION = 0
+_SNAPPY_COMPRESSION = 1
+
+_TYPE_DELETION = 0
+_TYPE_VALUE = 1
+
+# https://github.com/google/leveldb/blob/main/db/version_edit.cc
+_EDIT_COMPARATOR = 1
+_EDIT_LOG_NUMBER = 2
+_EDIT_NEXT_FILE_NUMBER = 3
+_EDIT_LAST_SEQUENCE = 4
+_EDIT_COMPACT_POINTER = 5
+_EDIT_DELETED_FILE = 6
+_EDIT_NEW_FILE = 7
+_EDIT_PREV_LOG_NUMBER = 9
+
+_READ_ATTEMPTS = 3
+
+_LOG_FILE = re.compile(r'^(\d+)\.log$')
+_TABLE_FILE = re.compile(r'^(\d+)\.(ldb|sst)$')
+
+
+def _read_length_prefixed(data: bytes, pos: int) -> tuple[bytes, int]:
+    length, pos = read_varint(data, pos)
+    if pos + length > len(data):
+        raise ValueError('Invalid LevelDB data: unexpected end of data.')
+    return data[pos:pos + length], pos + length
+
+
+def _iter_log_records(data: bytes) -> Iterator[bytes]:
+    # The checksums are not verified, a torn record at the end of the log is simply dropped.
+    fragments = []
+    block_start = 0
+    while block_start < len(data):
+        block = data[block_start:block_start + _LOG_BLOCK_SIZE]
+        pos = 0
+        while pos + _LOG_HEADER_SIZE <= len(block):
+            length, record_type = struct.unpack_from('<HB', block, pos + 4)
+            if record_type == 0 and length == 0:
+                # Preallocated space, the rest of the block is empty.
+                break
+            fragment = block[pos + _LOG_HEADER_SIZE:pos + _LOG_HEADER_SIZE + length]
+            pos += _LOG_HEADER_SIZE + length
+            if len(fragment) != length:
+                return
+            if record_type == _LOG_FULL:
+                fragments = []
+                yield fragment
+            elif record_type == _LOG_FIRST:
+                fragments = [fragment]
+            elif record_type == _LOG_MIDDLE:
+                fragments.append(fragment)
+            elif record_type == _LOG_LAST:
+                fragments.append(fragment)
+                yield b''.join(fragments)
+                fragments = []
+        block_start += _LOG_BLOCK_SIZE
+
+
+def _iter_log_entries(data: bytes) -> Iterator[tuple[bytes, int, int, bytes]]:
+    for batch in _iter_log_records(data):
+        if len(batch) < 12:
+            continue
+        sequence, count = struct.unpack_from('<QI', batch, 0)
+        pos = 12
+        for i in range(count):
+            entry_type = batch[pos]
+            key, pos = _read_length_prefixed(batch, pos + 1)
+            if entry_type == _TYPE_VALUE:
+                value, pos = _read_length_prefixed(batch, pos)
+            else:
+                value = b''
+            yield key, sequence + i, entry_type, value
+
+
+def _read_block(data: bytes, offset: int, size: int) -> bytes:
+    if offset + size + _BLOCK_TRAILER_SIZE > len(data):
+        raise ValueError('Invalid LevelDB table: block exceeds the file.')
+    block = data[offset:offset + size]
+    compression = data[offset + size]
+    if compression == _SNAPPY_COMPRESSION:
+        return Snappy.decompress(block)
+    if compression != _NO_COMPRESSION:
+        raise ValueError(f'Unsupported LevelDB block compression: {compression}')
+    return block
+
+
+def _iter_block_entries(block: bytes) -> Iterator[tuple[bytes, bytes]]:
+    restart_num, = struct.unpack_from('<I', block, len(block) - 4)
+    end = len(block) - 4 - 4 * restart_num
+    pos = 0
+    key = b''
+    while pos < end:
+        shared, pos = read_varint(block, pos)
+        non_shared, pos = read_varint(block, pos)
+        value_length, pos = read_varint(block, pos)
+        key = key[:shared] + block[pos:pos + non_shared]
+        pos += non_shared
+        yield key, block[pos:pos + value_length]
+        pos += value_length
+
+
+def _iter_table_entries(data: bytes) -> Iterator[tuple[bytes, int, int, bytes]]:
+    if len(data) < _TABLE_FOOTER_SIZE:
+        raise ValueError('Invalid LevelDB table: file is too small.')
+    footer = data[-_TABLE_FOOTER_SIZE:]
+    magic, = struct.unpack_from('<Q', footer, _TABLE_FOOTER_SIZE - 8)
+    if magic != _TABLE_MAGIC:
+        raise ValueError('Invalid LevelDB table: wrong magic number.')
+    _, pos = read_varint(footer, 0)
+    _, pos = read_varint(footer, pos)
+    index_offset, pos = read_varint(footer, pos)
+    index_size, _ = read_varint(footer, pos)
+    for _, handle in _iter_block_entries(_read_block(data, index_offset, index_size)):
+        block_offset, pos = read_varint(handle, 0)
+        block_size, _ = read_varint(handle, pos)
+        for internal_key, value in _iter_block_entries(_read_block(data, block_offset, block_size)):
+            trailer, = struct.unpack_from('<Q', internal_key, len(internal_key) - 8)
+            yield internal_key[:-8], trailer >> 8, trailer & 0xff, value
+
+
+def _read_live_files(path: str) -> Optional[tuple[set[int], int]]:
+    # Replays the version edits of the current MANIFEST, tables that were already compacted or that are still
+    # being written by a running browser are not part of the current version.
+    current_path = os.path.join(path, 'CURRENT')
+    if not os.path.isfile(current_path):
+        return None
+    with open(current_path, 'r') as file:
+        manifest_path = os.path.join(path, file.read().strip())
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, 'rb') as file:
+        data = file.read()
+    tables = set()
+    log_number = 0
+    for edit in _iter_log_records(data):
+        pos = 0
+        while pos < len(edit):
+            tag, pos = read_varint(edit, pos)
+            if tag == _EDIT_COMPARATOR:
+                _, pos = _read_length_prefixed(edit, pos)
+            elif tag == _EDIT_LOG_NUMBER:
+                log_number, pos = read_varint(edit, pos)
+            elif tag in (_EDIT_NEXT_FILE_NUMBER, _EDIT_LAST_SEQUENCE, _EDIT_PREV_LOG_NUMBER):
+                _, pos = read_varint(edit, pos)
+            elif tag == _EDIT_COMPACT_POINTER:
+                _, pos = read_varint(edit, pos)
+                _, pos = _read_length_prefixed(edit, pos)
+            elif tag == _EDIT_DELETED_FILE:
+                _, pos = read_varint(edit, pos)
+                file_number, pos = read_varint(edit, pos)
+                tables.discard(file_number)
+            elif tag == _EDIT_NEW_FILE:
+                _, pos = read_varint(edit, pos)
+                file_number, pos = read_varint(edit, pos)
+                _, pos = read_varint(edit, pos)
+                _, pos = _read_length_prefixed(edit, pos)
+                _, pos = _read_length_prefixed(edit, pos)
+                tables.add(file_number)
+            else:
+                raise ValueError(f'Invalid LevelDB manifest: unknown tag {tag}.')
+    return tables, log_number
+
+
+def _get_files(path: str) -> list[tuple[str, Callable[[bytes], Iterator[tuple[bytes, int, int, bytes]]]]]:
+    live_files = _read_live_files(path)
+    files = []
+    for file_name in os.listdir(path):
+        log_match = _LOG_FILE.match(file_name)
+        table_match = _TABLE_FILE.match(file_name)
+        if log_match is not None:
+            if live_files is None or int(log_match.group(1)) >= live_files[1]:
+                files.append((os.path.join(path, file_name), _iter_log_entries))
+        elif table_match is not None and live_files is None:
+            files.append((os.path.join(path, file_name), _iter_table_entries))
+    if live_files is not None:
+        for file_number in live_files[0]:
+            table_path = os.path.join(path, f'{file_number:06d}.ldb')
+            if not os.path.isfile(table_path):
+                table_path = os.path.join(path, f'{file_number:06d}.sst')
+            files.append((table_path, _iter_table_entries))
+    return files
+
+
+def _read_entries(path: str) -> dict[bytes, tuple[int, int, bytes]]:
+    # key -> (sequence number, type, value)
+    entries = {}
+    for file_path, parser in _get_files(path):
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        for key, sequence, entry_type, value in parser(data):
+            current = entries.get(key)
+            if current is None or current[0] < sequence:
+                entries[key] = (sequence, entry_type, value)
+    return entries
+
+
+def read_leveldb(path: str) -> dict[bytes, bytes]:
+    """
+    Read the current contents of a LevelDB database without opening it with LevelDB
+
+    The live tables are taken from the MANIFEST, logs that were not compacted yet are replayed on top of them.
+    For each key the entry with the highest sequence number wins.
+
+    :param path: the database directory
+    :return: a dict containing the values by key, deleted keys are left out
+    """
+    if not os.path.isdir(path):
+        raise ValueError(f'LevelDB directory does not exist: {path}')
+    for attempt in range(_READ_ATTEMPTS):
+        try:
+            entries = _read_entries(path)
+            break
+        except FileNotFoundError:
+            # A running browser compacted the database while it was read.
+            if attempt == _READ_ATTEMPTS - 1:
+                raise
+    return {key: entry[2] for key, entry in entries.items() if entry[1] == _TYPE_VALUE}
@@ -0,0 +1,166 @@
+import contextlib
+import json
+import time
+from typing import Iterator, NoReturn, Optional
+
+from SessionHandler.SessionContainer import encode_json
+
+
+class MetricsPhase:
+    name: str
+    labels: dict[str, str]
+    time: float
+    bytes: int
+    records: int
+    __measure_payload: bool
+
+    def __init__(self, name: str, labels: dict[str, str], measure_payload: bool = True):
+        """
+        :param name: the name of the phase, e.g. ``get_cookies``
+        :param labels: additional labels like the database and object store the phase belongs to
+        :param measure_payload: `False` to ignore payloads, their size is not computed
+        """
+        self.name = name
+        self.labels = labels
+        self.time = 0.0
+        self.bytes = 0
+        self.records = 0
+        self.__measure_payload = measure_payload
+
+    def add_payload(self, value: object, records: Optional[int] = None) -> NoReturn:
+        """
+        Count a value that was sent to or received from the browser
+
+        :param value: the JSON serializable value, its size is the size of its JSON encoding
+        :param records: the number of records the value contains
+        """
+        if self.__measure_payload:
+            self.bytes += len(encode_json(value))
+            if records is not None:
+                self.records += records
+
+    def as_dict(self) -> dict:
+        return {'phase': self.name, 'labels': self.labels, 'time': self.time, 'bytes': self.bytes,
+                'records': self.records}
+
+
+# Handed out while metrics are disabled, the sizes of payloads are not computed.
+UNMEASURED_PHASE = MetricsPhase('', {}, measure_payload=False)
+
+
+class SessionMetrics:
+    """
+    Wall time, transferred bytes and record counts of the phases of a single operation
+
+    Phases are recorded in the order they end, a phase can occur multiple times (e.g. once per batch). The object
+    store phases ``get_object_store`` and ``set_object_store`` are part of the IndexedDB phase that contains them.
+    """
+    operation: str
+    labels: dict[str, str]
+    start_time: float
+    __phases: list[MetricsPhase]
+
+    def __init__(self, operation: str, **labels: str):
+        """
+        :param operation: the name of the operation, e.g. ``capture`` or ``restore``
+        :param labels: labels of the whole operation like the browser profile
+        """
+        self.operation = operation
+        self.labels = labels
+        self.start_time = time.time()
+        self.__phases = []
+
+    @contextlib.contextmanager
+    def measure(self, name: str, **labels: str) -> Iterator[MetricsPhase]:
+        """
+        Measure the wall time of a phase, the phase is recorded even if it raises an exception
+
+        :param name: the name of the phase
+        :param labels: labels of the phase like the database and object store
+
+        :return: a context manager yielding the :class:`MetricsPhase`
+        """
+        phase = MetricsPhase(name, labels)
+        start_time = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.time += time.perf_counter() - start_time
+            self.__phases.append(phase)
+
+    def add(self, name: str, duration: float, value: object = None, records: Optional[int] = None,
+            **labels: str) -> MetricsPhase:
+        """
+        Record a phase that was measured elsewhere, e.g. by a script running in the browser
+
+        :param name: the name of the phase
+        :param duration: the wall time in seconds
+        :param value: the payload of the phase
+        :param records: the number of records of the payload
+        :param labels: labels of the phase
+        """
+        phase = MetricsPhase(name, labels)
+        phase.time = duration
+        if value is not None:
+            phase.add_payload(value)
+        if records is not None:
+            phase.records = records
+        self.__phases.append(phase)
+        return phase
+
+    def get_phases(self) -> list[MetricsPhase]:
+        return list(self.__phases)
+
+    def get_total(self, name: Optional[str] = None) -> dict:
+        """
+        Sum up the phases
+
+        :param name: only sum up the phases with this name
+
+        :return: a dict containing the ``time``, ``bytes`` and ``records``
+        """
+        phases = [phase for phase in self.__phases if name is None or phase.name == name]
+        return {'time': sum(phase.time for phase in phases), 'bytes': sum(phase.bytes for phase in phases),
+                'records': sum(phase.records for phase in phases)}
+
+    def as_dict(self) -> dict:
+        return {'operation': self.operation, 'labels': self.labels, 'startTime': self.start_time,
+                'phases': [phase.as_dict() for phase in self.__phases]}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=1)
+
+    @staticmethod
+    def __format_labels(labels: dict[str, str]) -> str:
+        escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+                   for value in labels.values())
+        return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels.keys(), escaped)) + '}'
+
+    def to_prometheus(self, prefix: str = 'sessionhandler') -> str:
+        """
+        Export the metrics in the Prometheus text format
+
+        Phases with the same name and labels are summed up.
+
+        :param prefix: the prefix of the metric names
+
+        :return: the metrics, one sample per line
+        """
+        samples = {}
+        for phase in self.__phases:
+            labels = dict(self.labels, operation=self.operation, phase=phase.name, **phase.labels)
+            key = tuple(sorted(labels.items()))
+            sample = samples.setdefault(key, [labels, 0.0, 0, 0])
+            sample[1] += phase.time
+            sample[2] += phase.bytes
+            sample[3] += phase.records
+        lines = []
+        metrics = (('phase_seconds', 'Wall time of the phase in seconds', 1),
+                   ('phase_bytes', 'Size of the JSON payloads of the phase in bytes', 2),
+                   ('phase_records', 'Number of cookies, localStorage items or IndexedDB records of the phase', 3))
+        for name, description, position in metrics:
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            for sample in samples.values():
+                lines.append(f'{prefix}_{name}{self.__format_labels(sample[0])} {sample[position]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,202 @@
+import configparser
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Union
+
+from SessionHandler.ChromeProfileReader import ChromeProfileReader
+from SessionHandler.FirefoxProfileReader import FirefoxProfileReader
+
+
+class ProfileDiscovery(ABC):
+    """
+    Find the profiles of a browser and cache them until the files they were read from change
+    """
+    __user_dir: str
+    # (modification times of the user dir and the profile list files, profile names)
+    __cache: Optional[tuple[tuple, list[str]]]
+    __lock: threading.Lock
+    __log: logging.Logger
+
+    def __init__(self, user_dir: str):
+        """
+        :param user_dir: the directory containing the profiles of the browser
+        """
+        self.__user_dir = user_dir
+        self.__cache = None
+        self.__lock = threading.Lock()
+        self.__log = logging.getLogger('SessionHandler')
+
+    @staticmethod
+    def __get_mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _get_profile_list_files(self) -> list[str]:
+        return []
+
+    @abstractmethod
+    def _read_profiles(self) -> list[str]:
+        pass
+
+    def get_user_dir(self) -> str:
+        return self.__user_dir
+
+    def get_profiles(self) -> list[str]:
+        """
+        Get the names of the profiles
+
+        The profiles are only read again when the user dir or one of the files listing the profiles was modified.
+
+        :return: a list containing the profile names
+        """
+        if not os.path.isdir(self.__user_dir):
+            raise ValueError(f'Browser user dir does not exist: {self.__user_dir}')
+        signature = tuple(self.__get_mtime(path) for path in [self.__user_dir] + self._get_profile_list_files())
+        with self.__lock:
+            if self.__cache is None or self.__cache[0] != signature:
+                self.__log.debug('Reading browser profiles...')
+                self.__cache = (signature, self._read_profiles())
+            return list(self.__cache[1])
+
+    def get_profile_dir(self, profile_name: str) -> str:
+        return os.path.join(self.__user_dir, profile_name)
+
+    @abstractmethod
+    def get_reader(self, profile_name: str) -> Union[ChromeProfileReader, FirefoxProfileReader]:
+        pass
+
+    def has_origin_storage(self, profile_name: str, url: str) -> bool:
+        """
+        Check if a profile contains storage of a website, only the existence of directories is checked
+
+        :param profile_name: the name of the profile
+        :param url: an URL of the website
+        :return: `True` if the profile contains storage of the website's origin
+        """
+        try:
+            return self.get_reader(profile_name).has_origin_storage(url)
+        except ValueError:
+            return False
+
+
+class ChromeProfileDiscovery(ProfileDiscovery):
+    """
+    Read the profiles of Chrome from the ``Local State`` file of the user data directory
+
+    Directories that are used as their own user data directory (e.g. created by starting Chrome with
+    ``user-data-dir`` pointing into the user data directory) are included as well.
+    The default profile is named ``''``.
+    """
+    __log: logging.Logger
+
+    def __init__(self, user_dir: str):
+        super().__init__(user_dir)
+        self.__log = logging.getLogger('SessionHandler')
+
+    def _get_profile_list_files(self) -> list[str]:
+        return [os.path.join(self.get_user_dir(), 'Local State')]
+
+    def __read_local_state(self) -> list[str]:
+        path = os.path.join(self.get_user_dir(), 'Local State')
+        if not os.path.isfile(path):
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                local_state = json.load(file)
+            return list(local_state.get('profile', {}).get('info_cache', {}).keys())
+        except (ValueError, AttributeError) as error:
+            self.__log.warning('Could not read Chrome profiles from "%s": %s', path, error)
+            return []
+
+    def _read_profiles(self) -> list[str]:
+        profile_list = ['']
+        for profile_dir in self.__read_local_state():
+            if profile_dir != 'Default' and profile_dir not in profile_list:
+                if os.path.isdir(os.path.join(self.get_user_dir(), profile_dir)):
+                    profile_list.append(profile_dir)
+        for profile_dir in sorted(os.listdir(self.get_user_dir())):
+            if 'profile' in profile_dir.lower() and profile_dir != 'System Profile':
+                if profile_dir not in profile_list and os.path.isdir(os.path.join(self.get_user_dir(), profile_dir)):
+                    profile_list.append(profile_dir)
+        return profile_list
+
+    def get_profile_dir(self, profile_name: str) -> str:
+        # A profile started as its own user data directory keeps its data in "Default".
+        profile_dir = super().get_profile_dir(profile_name)
+        if os.path.isdir(os.path.join(profile_dir, 'Default')):
+            return os.path.join(profile_dir, 'Default')
+        return profile_dir
+
+    def get_reader(self, profile_name: str) -> ChromeProfileReader:
+        return ChromeProfileReader(self.get_profile_dir(profile_name))
+
+
+class FirefoxProfileDiscovery(ProfileDiscovery):
+    """
+    Read the profiles of Firefox from ``profiles.ini``
+
+    Profiles inside the user dir are named by their directory, profiles stored elsewhere by their absolute path.
+    Without ``profiles.ini`` every directory in the user dir except the legacy ``*.default`` profile is used.
+    """
+    __log: logging.Logger
+
+    def __init__(self, user_dir: str):
+        super().__init__(user_dir)
+        self.__log = logging.getLogger('SessionHandler')
+
+    def __get_profiles_ini(self) -> Optional[str]:
+        # profiles.ini is next to the profiles on Linux, on Windows it is in the parent of the "Profiles" dir.
+        for directory in (self.get_user_dir(), os.path.dirname(self.get_user_dir())):
+            path = os.path.join(directory, 'profiles.ini')
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _get_profile_list_files(self) -> list[str]:
+        path = self.__get_profiles_ini()
+        return [path] if path is not None else []
+
+    def __read_profiles_ini(self, path: str) -> Optional[list[str]]:
+        parser = configparser.ConfigParser(interpolation=None)
+        try:
+            parser.read(path, encoding='utf-8')
+        except configparser.Error as error:
+            self.__log.warning('Could not read Firefox profiles from "%s": %s', path, error)
+            return None
+        user_dir = os.path.realpath(self.get_user_dir())
+        profile_list = []
+        for section in parser.sections():
+            if not section.startswith('Profile') or not parser.has_option(section, 'Path'):
+                continue
+            profile_path = parser.get(section, 'Path')
+            if parser.get(section, 'IsRelative', fallback='1') == '1':
+                profile_path = os.path.join(os.path.dirname(path), profile_path)
+            profile_path = os.path.realpath(profile_path)
+            if not os.path.isdir(profile_path):
+                continue
+            if os.path.dirname(profile_path) == user_dir:
+                profile_list.append(os.path.basename(profile_path))
+            else:
+                profile_list.append(profile_path)
+        return profile_list
+
+    def _read_profiles(self) -> list[str]:
+        path = self.__get_profiles_ini()
+        if path is not None:
+            profile_list = self.__read_profiles_ini(path)
+            if profile_list is not None:
+                return profile_list
+        profile_list = []
+        for profile_dir in sorted(os.listdir(self.get_user_dir())):
+            if not profile_dir.endswith('.default'):
+                if os.path.isdir(os.path.join(self.get_user_dir(), profile_dir)):
+                    profile_list.append(profile_dir)
+        return profile_list
+
+    def get_reader(self, profile_name: str) -> FirefoxProfileReader:
+        return FirefoxProfileReader(self.get_profile_dir(profile_name))
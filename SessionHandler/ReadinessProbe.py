@@ -0,0 +1,119 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Union
+
+import selenium.webdriver.chrome.webdriver as c_wd
+import selenium.webdriver.firefox.webdriver as f_wd
+
+# Checks the condition after every DOM mutation and in a fixed interval, storage changes made by the page itself do
+# not fire events. The script returns `true` as soon as the condition is met and `false` when the deadline is reached.
+_PROBE_JS = '''
+        // pySessionHandler: readiness_probe
+        const [timeoutMs, resolve] = arguments;
+        const isReady = () => {
+          try {
+            return Boolean(%s);
+          } catch (error) {
+            return false;
+          }
+        };
+        if (isReady()) {
+          resolve(true);
+          return;
+        }
+        let observer = null;
+        let interval = null;
+        let deadline = null;
+        const finish = ready => {
+          if (observer !== null) {
+            observer.disconnect();
+          }
+          clearInterval(interval);
+          clearTimeout(deadline);
+          resolve(ready);
+        };
+        const check = () => {
+          if (isReady()) {
+            finish(true);
+          }
+        };
+        observer = new MutationObserver(check);
+        observer.observe(document, {childList: true, subtree: true, attributes: true});
+        interval = setInterval(check, 250);
+        deadline = setTimeout(() => finish(isReady()), timeoutMs);
+'''
+
+
+class ReadinessProbe(ABC):
+    """
+    Condition that tells when a website finished loading and its session is usable
+
+    Every probe is a JavaScript expression that is evaluated in the page, probes can be combined with
+    :class:`AnyProbe`.
+    """
+
+    @abstractmethod
+    def get_condition(self) -> str:
+        """
+        :return: a JavaScript expression that is truthy once the page is ready
+        """
+        pass
+
+    def wait(self, driver: Union[c_wd.WebDriver, f_wd.WebDriver], timeout: float) -> bool:
+        """
+        Wait until the page is ready
+
+        The browser's script timeout is changed.
+
+        :param driver: the browser showing the page
+        :param timeout: the maximum time to wait in seconds
+
+        :return: `True` if the page got ready in time
+        """
+        # The script resolves itself at the deadline, the extra time only covers the round trip.
+        driver.set_script_timeout(timeout + 5)
+        return driver.execute_async_script(_PROBE_JS % self.get_condition(), int(timeout * 1000)) is True
+
+
+class LocalStorageProbe(ReadinessProbe):
+    __keys: list[str]
+
+    def __init__(self, *keys: str):
+        """
+        :param keys: the page is ready when all of these localStorage keys exist
+        """
+        if len(keys) == 0:
+            raise ValueError('A LocalStorageProbe needs at least one key.')
+        self.__keys = list(keys)
+
+    def get_condition(self) -> str:
+        return '%s.every(key => localStorage.getItem(key) !== null)' % json.dumps(self.__keys)
+
+
+class SelectorProbe(ReadinessProbe):
+    __selector: str
+
+    def __init__(self, selector: str):
+        """
+        :param selector: the page is ready when an element matching this CSS selector is visible
+        """
+        self.__selector = selector
+
+    def get_condition(self) -> str:
+        return '(element => element !== null && element.getClientRects().length > 0)(document.querySelector(%s))' \
+               % json.dumps(self.__selector)
+
+
+class AnyProbe(ReadinessProbe):
+    __probes: list[ReadinessProbe]
+
+    def __init__(self, *probes: ReadinessProbe):
+        """
+        :param probes: the page is ready when one of these probes is ready
+        """
+        if len(probes) == 0:
+            raise ValueError('An AnyProbe needs at least one probe.')
+        self.__probes = list(probes)
+
+    def get_condition(self) -> str:
+        return ' || '.join('(%s)' % probe.get_condition() for probe in self.__probes)
@@ -0,0 +1,68 @@
+import marshal
+from array import array
+from collections.abc import Sequence
+from typing import Iterable, Iterator, NoReturn, Union
+
+
+class RecordBuffer(Sequence):
+    """
+    Read-only sequence of records that are stored encoded in one contiguous buffer
+
+    A decoded record costs several hundred bytes of dict and string objects, an encoded record only costs its
+    encoding and an 8 byte offset. Records are decoded on every access, changing a returned record does not change
+    the stored record.
+    """
+    __buffer: bytearray
+    # start offset of every record, the end of a record is the start of the next one
+    __offsets: array
+
+    def __init__(self, records: Iterable[object] = ()):
+        self.__buffer = bytearray()
+        self.__offsets = array('Q')
+        self.extend(records)
+
+    def append(self, record: object) -> NoReturn:
+        try:
+            encoded = marshal.dumps(record)
+        except ValueError as error:
+            raise ValueError(f'Cannot store record in a compact object store: {error}') from error
+        self.__offsets.append(len(self.__buffer))
+        self.__buffer += encoded
+
+    def extend(self, records: Iterable[object]) -> NoReturn:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def __decode(self, position: int) -> object:
+        start = self.__offsets[position]
+        end = self.__offsets[position + 1] if position + 1 < len(self.__offsets) else len(self.__buffer)
+        return marshal.loads(self.__buffer[start:end])
+
+    def __getitem__(self, position: Union[int, slice]) -> Union[object, list]:
+        if isinstance(position, slice):
+            return [self.__decode(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('Record index out of range')
+        return self.__decode(position)
+
+    def __iter__(self) -> Iterator[object]:
+        for position in range(len(self)):
+            yield self.__decode(position)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, RecordBuffer) and self.__offsets == other.__offsets and self.__buffer == other.__buffer:
+            return True
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def get_size(self) -> int:
+        """
+        :return: the number of bytes used by the encoded records and their offsets
+        """
+        return len(self.__buffer) + self.__offsets.itemsize * len(self.__offsets)
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import zlib
+from typing import NoReturn
+
+from SessionHandler.SessionContainer import encode_json
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+_MANIFEST_VERSION = 1
+_ENTRY_NAME = re.compile(r'^[^/\\\x00]+$')
+# A block ends after a record whose hash is divisible by this number, blocks contain 256 records on average.
+# The boundaries only depend on the records themselves, so inserting a record only changes the block it lands in.
+_BLOCK_BOUNDARY_DIVISOR = 256
+_MAX_BLOCK_RECORDS = 2048
+
+
+class SessionArchive:
+    """
+    Store many sessions in a directory and keep every piece of session data only once
+
+    A session is split into chunks: cookies, localStorage, the schema of every object store and blocks of records.
+    Chunks are stored compressed under the SHA-256 hash of their contents in ``objects``, every archived session is
+    a small manifest in ``manifests`` that lists the hashes of its chunks.
+    """
+    __path: str
+    __objects_dir: str
+    __manifests_dir: str
+    __log: logging.Logger
+
+    def __init__(self, path: str):
+        """
+        :param path: the directory of the archive, it is created if it does not exist
+        """
+        self.__path = path
+        self.__objects_dir = os.path.join(path, 'objects')
+        self.__manifests_dir = os.path.join(path, 'manifests')
+        os.makedirs(self.__objects_dir, exist_ok=True)
+        os.makedirs(self.__manifests_dir, exist_ok=True)
+        self.__log = logging.getLogger('SessionHandler')
+
+    @staticmethod
+    def __write_atomic(path: str, data: bytes) -> NoReturn:
+        # Readers never see a partially written file.
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def __get_object_path(self, digest: str) -> str:
+        return os.path.join(self.__objects_dir, digest[:2], digest)
+
+    def __get_manifest_path(self, name: str) -> str:
+        if not _ENTRY_NAME.match(name) or name in ('.', '..'):
+            raise ValueError(f'Invalid archive entry name: {name!r}')
+        return os.path.join(self.__manifests_dir, name + '.json')
+
+    def __put_chunk(self, value: object) -> str:
+        data = encode_json(value)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.__get_object_path(digest)
+        if os.path.isfile(path):
+            # Chunks that are referenced again must not be collected by a concurrent gc.
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.__write_atomic(path, zlib.compress(data, 6))
+        return digest
+
+    def __get_chunk(self, digest: str) -> object:
+        path = self.__get_object_path(digest)
+        if not os.path.isfile(path):
+            raise KeyError(f'Archive chunk does not exist: {digest}')
+        with open(path, 'rb') as file:
+            data = zlib.decompress(file.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'Archive chunk is corrupted: {digest}')
+        return json.loads(data)
+
+    @staticmethod
+    def __split_blocks(records: list[dict[str, object]]) -> list[list[dict[str, object]]]:
+        blocks = []
+        block = []
+        for record in records:
+            block.append(record)
+            record_hash = hashlib.blake2b(encode_json(record), digest_size=8).digest()
+            if int.from_bytes(record_hash, 'little') % _BLOCK_BOUNDARY_DIVISOR == 0 or \
+                    len(block) >= _MAX_BLOCK_RECORDS:
+                blocks.append(block)
+                block = []
+        if len(block) > 0:
+            blocks.append(block)
+        return blocks
+
+    def __load_blocks(self, digests: list[str]) -> list[dict[str, object]]:
+        records = []
+        for digest in digests:
+            records.extend(self.__get_chunk(digest))
+        return records
+
+    def get_path(self) -> str:
+        return self.__path
+
+    def save(self, name: str, session: SessionObject) -> NoReturn:
+        """
+        Add a session to the archive, an existing entry with the same name is replaced
+
+        :param name: the name of the archive entry
+        :param session: the session that should be archived
+        """
+        manifest_path = self.__get_manifest_path(name)
+        databases = []
+        for idb_db in session.indexed_db.get_dbs():
+            object_stores = []
+            for object_store in idb_db.get_object_stores():
+                schema = object_store.as_dict()
+                del schema['data']
+                records = object_store.get_data()
+                object_stores.append({
+                    'schema': self.__put_chunk(schema),
+                    'blocks': [self.__put_chunk(block) for block in self.__split_blocks(records)],
+                    'dataNum': len(records)
+                })
+            databases.append({'name': idb_db.name, 'version': idb_db.version, 'objectStores': object_stores})
+        manifest = {
+            'version': _MANIFEST_VERSION,
+            'header': session.get_header(),
+            'cookies': self.__put_chunk(session.cookies),
+            'localStorage': self.__put_chunk(session.local_storage),
+            'indexedDb': {'url': session.indexed_db.get_url(), 'databases': databases}
+        }
+        self.__write_atomic(manifest_path, json.dumps(manifest, indent=1).encode('utf-8'))
+
+    def load(self, name: str, lazy: bool = False) -> SessionObject:
+        """
+        Restore a session from the archive
+
+        :param name: the name of the archive entry
+        :param lazy: only read the record blocks of an object store when its records are accessed for the first time
+        :return: the restored session
+        """
+        manifest = self.get_manifest(name)
+        header = manifest['header']
+        indexed_db = IndexedDB(manifest['indexedDb']['url'])
+        for db_dict in manifest['indexedDb']['databases']:
+            idb_db = IDBDatabase(db_dict['name'], db_dict['version'])
+            for os_dict in db_dict['objectStores']:
+                schema = self.__get_chunk(os_dict['schema'])
+                object_store = IDBObjectStore(schema['name'], schema['autoIncrement'], schema['keyPath'])
+                for index_name, options in schema['indices'].items():
+                    object_store.create_index(index_name, options)
+                if lazy:
+                    object_store.set_data_loader(lambda blocks=os_dict['blocks']: self.__load_blocks(blocks),
+                                                 os_dict['dataNum'])
+                else:
+                    for data in self.__load_blocks(os_dict['blocks']):
+                        object_store.add_data(data)
+                idb_db.add_object_store(object_store)
+            indexed_db.add_db(idb_db)
+        session = SessionObject(header['name'], header['url'], header['fileExt'],
+                                self.__get_chunk(manifest['cookies']), self.__get_chunk(manifest['localStorage']),
+                                indexed_db)
+        session.capture_time = header['captureTime']
+        return session
+
+    def get_manifest(self, name: str) -> dict:
+        """
+        Get the manifest of an archive entry
+
+        :param name: the name of the archive entry
+        :return: the manifest, its ``header`` has the same format as the header of session files
+        """
+        manifest_path = self.__get_manifest_path(name)
+        if not os.path.isfile(manifest_path):
+            raise KeyError(f'Archive entry does not exist: {name}')
+        with open(manifest_path, 'rb') as file:
+            manifest = json.load(file)
+        if manifest.get('version') != _MANIFEST_VERSION:
+            raise ValueError(f'Unsupported archive manifest version: {manifest.get("version")}')
+        return manifest
+
+    def get_entries(self) -> list[str]:
+        return sorted(file_name[:-len('.json')] for file_name in os.listdir(self.__manifests_dir)
+                      if file_name.endswith('.json'))
+
+    def delete(self, name: str) -> NoReturn:
+        """
+        Remove an entry from the archive, its chunks are only removed by :meth:`gc`
+
+        :param name: the name of the archive entry
+        """
+        manifest_path = self.__get_manifest_path(name)
+        if not os.path.isfile(manifest_path):
+            raise KeyError(f'Archive entry does not exist: {name}')
+        os.remove(manifest_path)
+
+    def __get_referenced_chunks(self) -> set[str]:
+        referenced = set()
+        for name in self.get_entries():
+            manifest = self.get_manifest(name)
+            referenced.add(manifest['cookies'])
+            referenced.add(manifest['localStorage'])
+            for db_dict in manifest['indexedDb']['databases']:
+                for os_dict in db_dict['objectStores']:
+                    referenced.add(os_dict['schema'])
+                    referenced.update(os_dict['blocks'])
+        return referenced
+
+    def gc(self, grace_period: float = 3600) -> tuple[int, int]:
+        """
+        Remove chunks that are not referenced by any entry
+
+        :param grace_period: chunks written or reused within this number of seconds are kept, they may belong to
+                             a session that is being saved at the same time
+        :return: the number of removed chunks and the number of freed bytes
+        """
+        referenced = self.__get_referenced_chunks()
+        deadline = time.time() - grace_period
+        removed_num = 0
+        freed_bytes = 0
+        for directory in os.listdir(self.__objects_dir):
+            directory_path = os.path.join(self.__objects_dir, directory)
+            if not os.path.isdir(directory_path):
+                continue
+            for digest in os.listdir(directory_path):
+                path = os.path.join(directory_path, digest)
+                if digest in referenced:
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime > deadline:
+                    continue
+                os.remove(path)
+                removed_num += 1
+                freed_bytes += stat.st_size
+        self.__log.info('Removed %s unreferenced archive chunks. [Freed: %s bytes]', removed_num, freed_bytes)
+        return removed_num, freed_bytes
+
+    def get_stats(self) -> dict:
+        """
+        Get the size of the archive
+
+        :return: a dict containing the number of entries and chunks and the stored size of all chunks in bytes
+        """
+        chunk_num = 0
+        stored_size = 0
+        for directory, _, file_names in os.walk(self.__objects_dir):
+            for file_name in file_names:
+                if not file_name.startswith('.tmp'):
+                    chunk_num += 1
+                    stored_size += os.path.getsize(os.path.join(directory, file_name))
+        return {'entryNum': len(self.get_entries()), 'chunkNum': chunk_num, 'storedSize': stored_size}
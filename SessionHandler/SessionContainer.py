@@ -0,0 +1,179 @@
+import bz2
+import json
+import lzma
+import mmap
+import os
+import struct
+import zlib
+from typing import IO, NoReturn, Optional
+
+MAGIC = b'WASOBIN\x00'
+FORMAT_VERSION = 1
+# magic, format version, section table offset, section table length
+_FILE_HEADER = struct.Struct('<8sIQQ')
+# codec, offset, stored length, raw length
+_SECTION_ENTRY = struct.Struct('<BQQQ')
+
+CODECS = {
+    'none': 0,
+    'zlib': 1,
+    'lzma': 2,
+    'bz2': 3
+}
+
+
+def _compress(codec: int, data: bytes) -> bytes:
+    if codec == CODECS['zlib']:
+        return zlib.compress(data, 6)
+    if codec == CODECS['lzma']:
+        return lzma.compress(data)
+    if codec == CODECS['bz2']:
+        return bz2.compress(data)
+    return data
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    try:
+        if codec == CODECS['zlib']:
+            return zlib.decompress(data)
+        if codec == CODECS['lzma']:
+            return lzma.decompress(data)
+        if codec == CODECS['bz2']:
+            return bz2.decompress(data)
+    except (zlib.error, lzma.LZMAError, OSError, EOFError) as error:
+        raise ValueError(f'Invalid section data: {error}') from error
+    if codec == CODECS['none']:
+        return bytes(data)
+    raise ValueError(f'Unknown section codec: {codec}')
+
+
+def encode_json(value: object) -> bytes:
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def is_container(path: str) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class SessionContainerWriter:
+    __file: IO[bytes]
+    __codec: int
+    # section name -> (codec, offset, stored length, raw length)
+    __sections: dict[str, tuple[int, int, int, int]]
+
+    def __init__(self, file: IO[bytes], codec: Optional[str] = 'zlib'):
+        if codec not in CODECS:
+            raise ValueError(f'Unknown codec "{codec}". Use one of: {", ".join(CODECS.keys())}')
+        self.__file = file
+        self.__codec = CODECS[codec]
+        self.__sections = {}
+        self.__file.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+
+    def add_section(self, name: str, data: bytes, codec: Optional[str] = None) -> NoReturn:
+        """
+        Compress and append a section to the container
+
+        :param name: the unique name of the section
+        :param data: the raw section data
+        :param codec: overrides the default codec of the container for this section
+        """
+        if name in self.__sections:
+            raise ValueError(f'Cannot add section. Duplicate name: {name}')
+        section_codec = self.__codec if codec is None else CODECS[codec]
+        stored = _compress(section_codec, data)
+        offset = self.__file.tell()
+        self.__file.write(stored)
+        self.__sections[name] = (section_codec, offset, len(stored), len(data))
+
+    def add_json_section(self, name: str, value: object, codec: Optional[str] = None) -> NoReturn:
+        self.add_section(name, encode_json(value), codec)
+
+    def get_raw_size(self) -> int:
+        return sum(section[3] for section in self.__sections.values())
+
+    def close(self) -> NoReturn:
+        table = bytearray()
+        for name, entry in self.__sections.items():
+            encoded_name = name.encode('utf-8')
+            table += struct.pack('<H', len(encoded_name)) + encoded_name + _SECTION_ENTRY.pack(*entry)
+        table_offset = self.__file.tell()
+        self.__file.write(table)
+        self.__file.seek(0)
+        self.__file.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION, table_offset, len(table)))
+        self.__file.seek(0, 2)
+
+
+class SessionContainerReader:
+    __mmap: Optional[mmap.mmap]
+    __sections: dict[str, tuple[int, int, int, int]]
+
+    def __init__(self, path: str):
+        self.__mmap = None
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < _FILE_HEADER.size:
+                raise ValueError(f'"{path}" is not a valid session container.')
+            # Only the pages of the sections that are actually read get loaded from disk.
+            self.__mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, table_offset, table_length = _FILE_HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'"{path}" is not a valid session container.')
+        if version > FORMAT_VERSION:
+            self.close()
+            raise ValueError(f'Unsupported session container version: {version}')
+        table_end = table_offset + table_length
+        # The table is written last, a file that was not written completely has no table or a cut off one.
+        if table_offset < _FILE_HEADER.size or table_end > len(self.__mmap):
+            self.close()
+            raise ValueError(f'Session container "{path}" is truncated.')
+        self.__sections = {}
+        pos = table_offset
+        try:
+            while pos < table_end:
+                name_length, = struct.unpack_from('<H', self.__mmap, pos)
+                pos += 2
+                name = self.__mmap[pos:pos + name_length].decode('utf-8')
+                pos += name_length
+                codec, offset, stored_length, raw_length = _SECTION_ENTRY.unpack_from(self.__mmap, pos)
+                pos += _SECTION_ENTRY.size
+                if pos > table_end or offset < _FILE_HEADER.size or offset + stored_length > table_offset:
+                    raise ValueError('section exceeds the file')
+                self.__sections[name] = (codec, offset, stored_length, raw_length)
+        except (struct.error, ValueError) as error:
+            self.close()
+            raise ValueError(f'Session container "{path}" has an invalid section table: {error}') from error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> NoReturn:
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def get_section_names(self) -> list[str]:
+        return list(self.__sections.keys())
+
+    def has_section(self, name: str) -> bool:
+        return name in self.__sections
+
+    def get_section_size(self, name: str) -> int:
+        return self.__sections[name][3]
+
+    def read_section(self, name: str) -> bytes:
+        if self.__mmap is None:
+            raise ValueError('Cannot read section. The container is already closed.')
+        if name not in self.__sections:
+            raise KeyError(f'Could not find section "{name}" in session container.')
+        codec, offset, stored_length, raw_length = self.__sections[name]
+        data = _decompress(codec, self.__mmap[offset:offset + stored_length])
+        if len(data) != raw_length:
+            raise ValueError(f'Section "{name}" of the session container is corrupted.')
+        return data
+
+    def read_json_section(self, name: str) -> object:
+        return json.loads(self.read_section(name))
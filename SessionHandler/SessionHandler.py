@@ -1,9 +1,11 @@
+import contextlib
 import logging
 import os
 import platform
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
-from typing import NoReturn, Union, Optional
+from typing import Callable, ContextManager, NoReturn, Union, Optional
 
 import selenium.webdriver.chrome.options as c_op
 import selenium.webdriver.chrome.webdriver as c_wd
@@ -11,11 +13,128 @@ import selenium.webdriver.firefox.options as f_op
 import selenium.webdriver.firefox.webdriver as f_wd
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException, TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as ec
-from selenium.webdriver.support.ui import WebDriverWait
 
-from SessionHandler.SessionObject import SessionObject, IndexedDB
+from SessionHandler.Metrics import MetricsPhase, SessionMetrics, UNMEASURED_PHASE
+from SessionHandler.ProfileDiscovery import ProfileDiscovery, ChromeProfileDiscovery, FirefoxProfileDiscovery
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+_DEFAULT_RESTORE_BATCH_SIZE = 1000
+
+# The first line of every script names it, e.g. `// pySessionHandler: get_cookies`, so tools like the benchmark's
+# FakeWebDriver can tell the scripts apart.
+_OPEN_WINDOW_JS = '''
+        // pySessionHandler: open_window
+        window.open();
+'''
+_SET_LOCAL_STORAGE_ITEM_JS = '''
+        // pySessionHandler: set_local_storage_item
+        window.localStorage.setItem(arguments[0], arguments[1]);
+'''
+
+# Every IDB request gets an error handler, errors are returned to Python instead of stalling the script.
+_IDB_HELPERS_JS = '''
+        function requestToPromise(request, description) {
+          return new Promise((resolve, reject) => {
+            request.onsuccess = _ => resolve(request.result);
+            request.onerror = _ => reject(new Error(description + ': ' + request.error));
+          });
+        }
+        function openDatabase(dbName) {
+          return new Promise((resolve, reject) => {
+            const openRequest = indexedDB.open(dbName);
+            openRequest.onsuccess = _ => resolve(openRequest.result);
+            openRequest.onerror = _ => reject(new Error('Could not open "' + dbName + '": ' + openRequest.error));
+            openRequest.onblocked = _ => reject(new Error('Opening "' + dbName + '" is blocked.'));
+          });
+        }
+'''
+
+# Counts the storage changes of the page, installed again after every page load. IndexedDB writes are counted once
+# their transaction completed, so a capture after a changed count contains them.
+_CHANGE_COUNTER_JS = '''
+        // pySessionHandler: count_changes
+        if (window.sessionHandlerChanges === undefined) {
+          window.sessionHandlerChanges = 0;
+          const countChange = _ => { window.sessionHandlerChanges++; };
+          for (const name of ['setItem', 'removeItem', 'clear']) {
+            const original = Storage.prototype[name];
+            Storage.prototype[name] = function() {
+              countChange();
+              return original.apply(this, arguments);
+            };
+          }
+          const originalTransaction = IDBDatabase.prototype.transaction;
+          IDBDatabase.prototype.transaction = function(storeNames, mode) {
+            const transaction = originalTransaction.apply(this, arguments);
+            if (mode !== undefined && mode !== 'readonly') {
+              transaction.addEventListener('complete', countChange);
+            }
+            return transaction;
+          };
+          window.addEventListener('storage', countChange);
+        }
+        return window.sessionHandlerChanges;
+'''
+
+# Reference PoC: https://github.com/jeliebig/WaWebSessionHandler/issues/15#issuecomment-893716129
+# PoC by: https://github.com/thewh1teagle
+# Only the schema is created during the upgrade, data is written in separate transactions afterwards.
+_IDB_RESTORE_JS = '''
+        async function createSchema(schema) {
+          for (const [idbDbName, idbDbProps] of Object.entries(schema)) {
+            await new Promise((resolve, reject) => {
+              const deleteRequest = indexedDB.deleteDatabase(idbDbName);
+              deleteRequest.onsuccess = _ => resolve();
+              deleteRequest.onerror = _ => resolve();
+            });
+            const db = await new Promise((resolve, reject) => {
+              const openRequest = indexedDB.open(idbDbName, idbDbProps['version']);
+              openRequest.onupgradeneeded = function(event) {
+                const db = event.target.result;
+                for (const [idbOsName, idbOsProps] of Object.entries(idbDbProps['objectStores'])) {
+                  const objectStoreOptions = {autoIncrement: idbOsProps['autoIncrement']};
+                  if (idbOsProps['keyPath'].length > 0) {
+                    objectStoreOptions['keyPath'] = (idbOsProps['keyPath'].length == 1 ?
+                      idbOsProps['keyPath'].join('') : idbOsProps['keyPath']);
+                  }
+                  const objectStore = db.createObjectStore(idbOsName, objectStoreOptions);
+                  for (const [idbIndexName, idbIndexOptions] of Object.entries(idbOsProps['indices'])) {
+                    objectStore.createIndex(idbIndexName, idbIndexOptions['keyPath'], {
+                      unique: idbIndexOptions['unique'],
+                      multiEntry: idbIndexOptions['multiEntry']
+                    });
+                  }
+                }
+              };
+              openRequest.onsuccess = _ => resolve(openRequest.result);
+              openRequest.onerror = _ => reject(new Error('Could not open "' + idbDbName + '": ' + openRequest.error));
+              openRequest.onblocked = _ => reject(new Error('Opening "' + idbDbName + '" is blocked.'));
+            });
+            db.close();
+          }
+        }
+        // All records are written in one transaction without waiting for every single request.
+        // Records of object stores without a keyPath get their position as key (firstKey is null otherwise).
+        function writeRecords(db, dbName, osName, data, firstKey) {
+          return new Promise((resolve, reject) => {
+            const transaction = db.transaction(osName, 'readwrite');
+            const objectStore = transaction.objectStore(osName);
+            transaction.oncomplete = _ => resolve();
+            transaction.onerror = _ => reject(new Error(
+              'Could not write "' + dbName + '/' + osName + '": ' + transaction.error
+            ));
+            transaction.onabort = transaction.onerror;
+            for (let i = 0; i < data.length; i++) {
+              if (firstKey == null) {
+                objectStore.add(data[i]);
+              }
+              else {
+                objectStore.add(data[i], firstKey + i);
+              }
+            }
+          });
+        }
+'''
 
 
 class Browser(Enum):
@@ -23,34 +142,62 @@ class Browser(Enum):
     FIREFOX = 'firefox'
 
 
+def create_browser_options(browser: Browser, headless: bool) -> Union[c_op.Options, f_op.Options]:
+    """
+    Create new options for starting a browser
+
+    :param browser: the browser the options are created for
+    :param headless: start the browser without a window
+    :return: the browser options
+    """
+    if browser == Browser.CHROME:
+        options = webdriver.ChromeOptions()
+        if headless:
+            options.add_argument('--headless=new')
+    else:
+        options = webdriver.FirefoxOptions()
+        if headless:
+            options.add_argument('-headless')
+    return options
+
+
+def _is_headless(options: Union[c_op.Options, f_op.Options]) -> bool:
+    return '--headless=new' in options.arguments or '-headless' in options.arguments
+
+
 class SessionHandler:
+    __aborted = False
     __browser_choice = 0
-    __browser_options: Union[c_op.Options, f_op.Options]
     __browser_profile_list: 'list[str]'
     __browser_user_dir: str
+    __checkpoint_interval: float = 30
+    __checkpoint_path: Optional[str] = None
+    __collect_metrics = False
     __custom_driver = False
+    __idb_batch_size: Optional[int] = None
     __driver: Union[c_wd.WebDriver, f_wd.WebDriver] = None
+    __driver_factory: Optional[Callable[[Union[c_op.Options, f_op.Options], Optional[str]],
+                                        Union[c_wd.WebDriver, f_wd.WebDriver]]] = None
+    __driver_pool: Optional['DriverPool'] = None
+    __pooled_driver = False
     __log: logging.Logger
+    __login_timeout: float = 120
+    # metrics of the operation that is currently running
+    __metrics: Optional[SessionMetrics] = None
+    __metrics_callback: Optional[Callable[[SessionMetrics], NoReturn]] = None
+    __offline_extraction = False
+    __profile_discovery: ProfileDiscovery
+    __profile_errors: 'dict[str, Exception]'
+    __script_timeout: float = 60
+    __single_step_restore = False
+    __skip_profiles_without_storage = True
     __session: SessionObject
 
     def __refresh_profile_list(self) -> NoReturn:
         if not self.__custom_driver:
             if os.path.isdir(self.__browser_user_dir):
                 self.__log.debug('Getting browser profiles...')
-                if self.__browser_choice == Browser.CHROME:
-                    self.__browser_profile_list = ['']
-                    for profile_dir in os.listdir(self.__browser_user_dir):
-                        if 'profile' in profile_dir.lower():
-                            if profile_dir != 'System Profile':
-                                self.__browser_profile_list.append(profile_dir)
-                elif self.__browser_choice == Browser.FIREFOX:
-                    # TODO: consider reading out the profiles.ini
-                    self.__browser_profile_list = []
-                    for profile_dir in os.listdir(self.__browser_user_dir):
-                        if not profile_dir.endswith('.default'):
-                            if os.path.isdir(os.path.join(self.__browser_user_dir, profile_dir)):
-                                self.__browser_profile_list.append(profile_dir)
-
+                self.__browser_profile_list = self.__profile_discovery.get_profiles()
                 self.__log.debug('Browser profiles registered.')
             else:
                 self.__log.error('Browser user dir does not exist.')
@@ -59,11 +206,25 @@ class SessionHandler:
             # TODO: Figure out why I did that before
             raise AssertionError('Do not call this method while using a custom driver.')
 
+    def __measure(self, name: str, **labels: str) -> ContextManager[MetricsPhase]:
+        if self.__metrics is None:
+            return contextlib.nullcontext(UNMEASURED_PHASE)
+        return self.__metrics.measure(name, **labels)
+
+    def __begin_metrics(self, operation: str, **labels: str) -> NoReturn:
+        self.__metrics = SessionMetrics(operation, **labels) if self.__collect_metrics else None
+
+    def __end_metrics(self) -> Optional[SessionMetrics]:
+        metrics = self.__metrics
+        self.__metrics = None
+        if metrics is not None and self.__metrics_callback is not None:
+            self.__metrics_callback(metrics)
+        return metrics
+
     def __init_browser(self) -> NoReturn:
         self.__custom_driver = False
         self.__log.debug('Setting browser user dirs...')
         if self.__browser_choice == Browser.CHROME:
-            self.__browser_options = webdriver.ChromeOptions()
             if self.__platform == 'windows':
                 self.__browser_user_dir = os.path.join(
                     os.environ['USERPROFILE'], 'Appdata', 'Local', 'Google', 'Chrome', 'User Data')
@@ -71,23 +232,27 @@ class SessionHandler:
                 self.__browser_user_dir = os.path.join(os.environ['HOME'], '.config', 'google-chrome')
 
         elif self.__browser_choice == Browser.FIREFOX:
-            self.__browser_options = webdriver.FirefoxOptions()
             if self.__platform == 'windows':
                 self.__browser_user_dir = os.path.join(os.environ['APPDATA'], 'Mozilla', 'Firefox', 'Profiles')
-                self.__browser_profile_list = os.listdir(self.__browser_user_dir)
             elif self.__platform == 'linux':
                 self.__browser_user_dir = os.path.join(os.environ['HOME'], '.mozilla', 'firefox')
 
+        if self.__browser_choice == Browser.CHROME:
+            self.__profile_discovery = ChromeProfileDiscovery(self.__browser_user_dir)
+        else:
+            self.__profile_discovery = FirefoxProfileDiscovery(self.__browser_user_dir)
         self.__log.debug('Browser user dirs set.')
 
-        self.__browser_options.headless = True
         self.__refresh_profile_list()
 
     def __get_cookies(self) -> dict:
         self.__log.debug('Executing getCookies function...')
-        cookie_list = self.__driver.execute_script('''
-        return document.cookie.split("; ");
-        ''')
+        with self.__measure('get_cookies') as phase:
+            cookie_list = self.__driver.execute_script('''
+            // pySessionHandler: get_cookies
+            return document.cookie.split("; ");
+            ''')
+            phase.add_payload(cookie_list, len(cookie_list))
         cookie_dict = {}
         for cookie in cookie_list:
             if len(cookie) == 0:
@@ -97,207 +262,303 @@ class SessionHandler:
         return cookie_dict
 
     def __set_cookies(self, cookie_dict: dict[str, str]) -> NoReturn:
-        cookie_string = ""
-        for key, value in cookie_dict.items():
-            cookie_string += f"{key}={value}; "
-        self.__driver.execute_script('''
-        document.cookie = arguments[0];
-        ''', cookie_string)
+        # Every assignment to document.cookie only sets a single cookie.
+        with self.__measure('set_cookies') as phase:
+            self.__driver.execute_script('''
+            // pySessionHandler: set_cookies
+            for (const [key, value] of Object.entries(arguments[0])) {
+                document.cookie = key + "=" + value;
+            }
+            ''', cookie_dict)
+            phase.add_payload(cookie_dict, len(cookie_dict))
 
     def __get_local_storage(self) -> 'dict[str, str]':
         self.__log.debug('Executing getLocalStorage function...')
-        return self.__driver.execute_script('''
-        var localStorageDict = {};
-        var ls = window.localStorage;
-        for (var i = 0; i < ls.length; i++) {
-            localStorageDict[ls.key(i)] = ls.getItem(ls.key(i));
-        }
-        return localStorageDict;
-        ''')
+        with self.__measure('get_local_storage') as phase:
+            local_storage_dict = self.__driver.execute_script('''
+            // pySessionHandler: get_local_storage
+            var localStorageDict = {};
+            var ls = window.localStorage;
+            for (var i = 0; i < ls.length; i++) {
+                localStorageDict[ls.key(i)] = ls.getItem(ls.key(i));
+            }
+            return localStorageDict;
+            ''')
+            phase.add_payload(local_storage_dict, len(local_storage_dict))
+        return local_storage_dict
 
     def __set_local_storage(self, local_storage_dict: 'dict[str, str]') -> NoReturn:
-        for ls_key, ls_val in local_storage_dict.items():
-            self.__driver.execute_script('window.localStorage.setItem(arguments[0], arguments[1]);',
-                                         ls_key, ls_val)
+        with self.__measure('set_local_storage') as phase:
+            for ls_key, ls_val in local_storage_dict.items():
+                self.__driver.execute_script(_SET_LOCAL_STORAGE_ITEM_JS, ls_key, ls_val)
+            phase.add_payload(local_storage_dict, len(local_storage_dict))
 
-    def __get_indexed_db(self) -> IndexedDB:
-        idb_dict = {'url': self.__session.get_url(), 'databases': {}}
-        idb_db_names = self.__session.get_idb_db_names(self.__driver)
-        if self.__session.idb_special_treatment:
-            self.__log.info("IDB special treatment required.")
-            idb_st_layout = self.__session.get_idb_st_layout()
-        else:
-            idb_st_layout = None
-        self.__log.debug('Executing getIndexedDb function...')
-        # FIXME: Use driver.execute_async_script() in the future
-        self.__driver.execute_script('''
-        document.pySessionHandler = {};
-        document.pySessionHandler.idbObject = {};
-        document.pySessionHandler.idbReady = 0;
-        document.pySessionHandler.idbNames = arguments[0];
-        document.pySessionHandler.idbStLayout = arguments[1];
+    def __dump_indexed_db(self, idb_db_names: list[str], idb_st_layout: Optional[dict[str, list[str]]],
+                          schema_only: bool = False) -> dict:
+        self.__log.debug('Executing getIndexedDb function... [Timeout: %ss]', self.__script_timeout)
+        self.__driver.set_script_timeout(self.__script_timeout)
+        result = self.__driver.execute_async_script('''
+        // pySessionHandler: get_indexed_db
+        const callback = arguments[arguments.length - 1];
+        const idbNames = arguments[0];
+        const idbStLayout = arguments[1];
+        const schemaOnly = arguments[2];
+        ''' + _IDB_HELPERS_JS + '''
         // This could be so easy
         // https://developer.mozilla.org/en-US/docs/Web/API/IDBFactory/databases#browser_compatibility
         // indexedDB.databases();
+        const stats = {};
         async function getAllIndexedDBs() {
-          for (const dbName of document.pySessionHandler.idbNames) {
-            document.pySessionHandler.idbObject[dbName] = {};
-            document.pySessionHandler.db = await new Promise((resolve, reject) => {
-              document.pySessionHandler.openRequest = indexedDB.open(dbName);
-              document.pySessionHandler.openRequest.onsuccess = _ => resolve(
-                document.pySessionHandler.openRequest.result
-              );
-            });
-            document.pySessionHandler.idbObject[dbName]['name'] = document.pySessionHandler.db.name;
-            document.pySessionHandler.idbObject[dbName]['version'] = document.pySessionHandler.db.version;
-            document.pySessionHandler.idbObject[dbName]['objectStores'] = {};
-            for (const objectStoreName of document.pySessionHandler.db.objectStoreNames) {
-              document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName] = {};
-              document.pySessionHandler.osTransaction = document.pySessionHandler.db.transaction(
-                objectStoreName
-              );
-              document.pySessionHandler.objectStore = document.pySessionHandler.osTransaction.objectStore(
-                objectStoreName
-              );
-              document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName] = {};
-              document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName]['name'] =
-                objectStoreName;
-              document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName]['indices'] = {};
-              for (const idbIndexName of Array.from(document.pySessionHandler.objectStore.indexNames)) {
-                idbIndex = document.pySessionHandler.objectStore.index(idbIndexName);
-                document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName]['indices'][
-                  idbIndex.name
-                ] = {'unique': idbIndex.unique, 'keyPath': idbIndex.keyPath, 'multiEntry': idbIndex.multiEntry};
-              }
-              document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName]['keyPath'] =
-                document.pySessionHandler.objectStore.keyPath;
-              document.pySessionHandler.idbObject[dbName]['objectStores'][objectStoreName]['autoIncrement'] =
-                document.pySessionHandler.objectStore.autoIncrement;
-              document.pySessionHandler.osName = objectStoreName;
-              if (document.pySessionHandler.idbStLayout != null &&
-                document.pySessionHandler.idbStLayout[dbName] != undefined &&
-                document.pySessionHandler.idbStLayout[dbName][document.pySessionHandler.osName] != undefined) {
-                    document.pySessionHandler.idbObject[dbName]['objectStores'][document.pySessionHandler.osName]['data']
-                     = []; 
-              }
-              else {
-                document.pySessionHandler.idbObject[dbName]['objectStores'][document.pySessionHandler.osName]['data']
-                 = await new Promise((resolve, reject) => {
-                    document.pySessionHandler.osGetAllRequest = document.pySessionHandler.objectStore.getAll();
-                    document.pySessionHandler.osGetAllRequest.onsuccess =
-                      _ => resolve(document.pySessionHandler.osGetAllRequest.result);
-                });
+          const idbObject = {};
+          for (const dbName of idbNames) {
+            const db = await openDatabase(dbName);
+            try {
+              idbObject[dbName] = {'name': db.name, 'version': db.version, 'objectStores': {}};
+              for (const objectStoreName of db.objectStoreNames) {
+                const startTime = performance.now();
+                const objectStore = db.transaction(objectStoreName).objectStore(objectStoreName);
+                const osObject = {'name': objectStoreName, 'indices': {}};
+                for (const idbIndexName of Array.from(objectStore.indexNames)) {
+                  const idbIndex = objectStore.index(idbIndexName);
+                  osObject['indices'][idbIndex.name] = {
+                    'unique': idbIndex.unique, 'keyPath': idbIndex.keyPath, 'multiEntry': idbIndex.multiEntry
+                  };
+                }
+                osObject['keyPath'] = objectStore.keyPath;
+                osObject['autoIncrement'] = objectStore.autoIncrement;
+                if (schemaOnly || (idbStLayout != null && idbStLayout[dbName] != undefined &&
+                  idbStLayout[dbName][objectStoreName] != undefined)) {
+                  osObject['data'] = [];
+                }
+                else {
+                  osObject['data'] = await requestToPromise(
+                    objectStore.getAll(), 'Could not read "' + dbName + '/' + objectStoreName + '"'
+                  );
+                }
+                idbObject[dbName]['objectStores'][objectStoreName] = osObject;
+                stats[dbName + '/' + objectStoreName] = (performance.now() - startTime) / 1000;
               }
             }
-            document.pySessionHandler.db.close();
-            document.pySessionHandler.idbReady++;
+            finally {
+              db.close();
+            }
           }
+          return idbObject;
         }
-        getAllIndexedDBs();
-        ''', idb_db_names, idb_st_layout)
-        self.__log.debug('Waiting until IDB operation is done...')
-        while not self.__driver.execute_script(
-                f'return document.pySessionHandler.idbReady == {len(idb_db_names)};'):
-            time.sleep(1)
-        self.__log.debug('Getting IDB results...')
-        idb_dict['databases'] = self.__driver.execute_script(
-            'return document.pySessionHandler.idbObject;')
-        self.__driver.execute_script('document.pySessionHandler = {};')
+        getAllIndexedDBs().then(
+          idbObject => callback({'databases': idbObject, 'stats': stats}),
+          error => callback({'error': String(error)})
+        );
+        ''', idb_db_names, idb_st_layout, schema_only)
+        if result.get('error') is not None:
+            raise RuntimeError(f'Could not get IndexedDB: {result["error"]}')
+        self.__log.debug('Got IDB results.')
+        if self.__metrics is not None and not schema_only:
+            for db_name, db_dict in result['databases'].items():
+                for os_name, os_dict in db_dict['objectStores'].items():
+                    self.__metrics.add('get_object_store', result['stats'][db_name + '/' + os_name], os_dict['data'],
+                                       len(os_dict['data']), db=db_name, store=os_name)
+        return result['databases']
+
+    def __get_object_store_batch(self, db_name: str, os_name: str) -> tuple[list[dict], bool]:
+        result = self.__driver.execute_async_script('''
+        // pySessionHandler: get_object_store_batch
+        const callback = arguments[arguments.length - 1];
+        const dbName = arguments[0];
+        const osName = arguments[1];
+        const batchSize = arguments[2];
+        ''' + _IDB_HELPERS_JS + '''
+        // The last key of every object store stays in the page, keys do not have to survive a round trip.
+        if (document.pySessionHandler == undefined || document.pySessionHandler.idbBatches == undefined) {
+          document.pySessionHandler = {'idbBatches': {'dbs': {}, 'lastKeys': {}}};
+        }
+        const state = document.pySessionHandler.idbBatches;
+        async function getBatch() {
+          if (!(dbName in state.dbs)) {
+            state.dbs[dbName] = await openDatabase(dbName);
+          }
+          const objectStore = state.dbs[dbName].transaction(osName).objectStore(osName);
+          const cursorName = JSON.stringify([dbName, osName]);
+          const range = cursorName in state.lastKeys ? IDBKeyRange.lowerBound(state.lastKeys[cursorName], true) : null;
+          const description = 'Could not read "' + dbName + '/' + osName + '"';
+          const [keys, data] = await Promise.all([
+            requestToPromise(objectStore.getAllKeys(range, batchSize), description),
+            requestToPromise(objectStore.getAll(range, batchSize), description)
+          ]);
+          if (keys.length > 0) {
+            state.lastKeys[cursorName] = keys[keys.length - 1];
+          }
+          return {'data': data, 'done': data.length < batchSize};
+        }
+        getBatch().then(callback, error => callback({'error': String(error)}));
+        ''', db_name, os_name, self.__idb_batch_size)
+        if result.get('error') is not None:
+            raise RuntimeError(f'Could not get IndexedDB: {result["error"]}')
+        return result['data'], result['done']
+
+    def __get_indexed_db_paged(self, idb_db_names: list[str],
+                               idb_st_layout: Optional[dict[str, list[str]]]) -> IndexedDB:
+        idb = IndexedDB(self.__session.get_url())
+        schema = self.__dump_indexed_db(idb_db_names, idb_st_layout, schema_only=True)
+        try:
+            for db_name, db_dict in schema.items():
+                idb_db = IDBDatabase(db_dict['name'], db_dict['version'])
+                idb.add_db(idb_db)
+                for os_name, os_dict in db_dict['objectStores'].items():
+                    object_store = IDBObjectStore(os_dict['name'], os_dict['autoIncrement'], os_dict['keyPath'])
+                    for name, options in os_dict['indices'].items():
+                        object_store.create_index(name, options)
+                    idb_db.add_object_store(object_store)
+                    if idb_st_layout is not None and os_name in idb_st_layout.get(db_name, []):
+                        continue
+                    self.__log.debug('Getting %s/%s in batches of %s records...',
+                                     db_name, os_name, self.__idb_batch_size)
+                    done = False
+                    while not done:
+                        with self.__measure('get_object_store', db=db_name, store=os_name) as phase:
+                            data, done = self.__get_object_store_batch(db_name, os_name)
+                            phase.add_payload(data, len(data))
+                        for entry in data:
+                            object_store.add_data(entry)
+        finally:
+            self.__driver.execute_script('''
+            // pySessionHandler: close_databases
+            if (document.pySessionHandler != undefined && document.pySessionHandler.idbBatches != undefined) {
+              for (const db of Object.values(document.pySessionHandler.idbBatches.dbs)) {
+                db.close();
+              }
+            }
+            document.pySessionHandler = {};
+            ''')
+        return idb
+
+    def __get_indexed_db(self) -> IndexedDB:
+        idb_db_names = self.__session.get_idb_db_names()
+        if self.__session.idb_special_treatment:
+            self.__log.info("IDB special treatment required.")
+            idb_st_layout = self.__session.get_idb_st_layout()
+        else:
+            idb_st_layout = None
+        with self.__measure('get_indexed_db'):
+            if self.__idb_batch_size is not None:
+                idb = self.__get_indexed_db_paged(idb_db_names, idb_st_layout)
+            else:
+                idb = IndexedDB.create_from_dict({
+                    'url': self.__session.get_url(),
+                    'databases': self.__dump_indexed_db(idb_db_names, idb_st_layout)
+                })
         if idb_st_layout is not None:
             self.__log.info("Running special actions...")
             st_data = self.__session.do_idb_st_get_action(self.__driver)
             for idb_st_db, idb_st_os_list in idb_st_layout.items():
                 for idb_st_os in idb_st_os_list:
-                    idb_dict['databases'][idb_st_db]['objectStores'][idb_st_os]['data'] = st_data[idb_st_db][idb_st_os]
-        return IndexedDB.create_from_dict(idb_dict)
+                    for entry in st_data[idb_st_db][idb_st_os]:
+                        idb.get_db(idb_st_db).get_object_store(idb_st_os).add_data(entry)
+        return idb
+
+    @staticmethod
+    def __get_indexed_db_schema(idb: IndexedDB) -> dict:
+        schema = {}
+        for idb_db in idb.get_dbs():
+            schema[idb_db.name] = {'version': idb_db.version, 'objectStores': {}}
+            for object_store in idb_db.get_object_stores():
+                schema[idb_db.name]['objectStores'][object_store.name] = {
+                    'autoIncrement': object_store.auto_increment,
+                    'keyPath': object_store.key_path,
+                    'indices': object_store.get_indices()
+                }
+        return schema
+
+    def __create_indexed_db_schema(self, idb: IndexedDB) -> NoReturn:
+        self.__log.debug('Creating IDB schema...')
+        with self.__measure('create_idb_schema'):
+            result = self.__driver.execute_async_script('''
+            // pySessionHandler: create_schema
+            const callback = arguments[arguments.length - 1];
+            const schema = arguments[0];
+            ''' + _IDB_RESTORE_JS + '''
+            createSchema(schema).then(_ => callback({}), error => callback({'error': String(error)}));
+            ''', self.__get_indexed_db_schema(idb))
+        if result.get('error') is not None:
+            raise RuntimeError(f'Could not create IndexedDB schema: {result["error"]}')
+
+    def __write_object_store_batch(self, db_name: str, object_store: IDBObjectStore,
+                                   data: list[dict[str, object]], first_key: int) -> NoReturn:
+        result = self.__driver.execute_async_script('''
+        // pySessionHandler: write_object_store_batch
+        const callback = arguments[arguments.length - 1];
+        const dbName = arguments[0];
+        const osName = arguments[1];
+        const data = arguments[2];
+        const firstKey = arguments[3];
+        ''' + _IDB_HELPERS_JS + '''
+        if (document.pySessionHandler == undefined || document.pySessionHandler.idbRestore == undefined) {
+          document.pySessionHandler = {'idbRestore': {'dbs': {}}};
+        }
+        const state = document.pySessionHandler.idbRestore;
+        ''' + _IDB_RESTORE_JS + '''
+        async function writeBatch() {
+          if (!(dbName in state.dbs)) {
+            state.dbs[dbName] = await openDatabase(dbName);
+          }
+          await writeRecords(state.dbs[dbName], dbName, osName, data, firstKey);
+        }
+        writeBatch().then(_ => callback({}), error => callback({'error': String(error)}));
+        ''', db_name, object_store.name, data, first_key if len(object_store.key_path) == 0 else None)
+        if result.get('error') is not None:
+            raise RuntimeError(f'Could not write IndexedDB: {result["error"]}')
+
+    def __set_idb_st_data(self, idb: IndexedDB, st_layout: dict[str, list[str]]) -> NoReturn:
+        self.__log.info("IDB special treatment required. Running special actions...")
+        st_data = {}
+        for st_db, st_os_list in st_layout.items():
+            st_data[st_db] = {}
+            for st_os in st_os_list:
+                st_data[st_db][st_os] = list(idb.get_db(st_db).get_object_store(st_os).get_data())
+        self.__session.do_idb_st_set_action(self.__driver, st_data)
 
     def __set_indexed_db(self, idb: IndexedDB) -> NoReturn:
-        self.__log.debug('Inserting setIDBObjects function...')
-        self.__driver.execute_script('''
-        document.pySessionHandler = {};
-        // Reference PoC: https://github.com/jeliebig/WaWebSessionHandler/issues/15#issuecomment-893716129
-        // PoC by: https://github.com/thewh1teagle
-        document.pySessionHandler.setAllObjects = async function (idb_data, stLayout) {
-            idb_dbs = idb_data['databases'];
-            for (const [idbDbName, idbDbProps] of Object.entries(idb_dbs)) {
-                await new Promise((resolve, reject) => {
-                    deleteRequest = indexedDB.deleteDatabase(idbDbName);
-                    deleteRequest.onsuccess = _ => resolve(_);
-                    deleteRequest.onerror = _ => resolve(_);
-                });
-                await new Promise((resolve, reject) => {
-                    openRequest = indexedDB.open(idbDbName, idbDbProps['version']);
-                    openRequest.onupgradeneeded = async function(event) {
-                        db = event.target.result;
-                        
-                        for (const [idbOsName, idbOsProps] of Object.entries(idbDbProps['objectStores'])) {
-                            console.log("OS:", idbOsName, idbOsProps);
-                            objectStoreOptions = {
-                              autoIncrement: idbOsProps['autoIncrement']
-                            };
-                            if (idbOsProps['keyPath'].length > 0){
-                               objectStoreOptions['keyPath'] = (idbOsProps['keyPath'].length == 1 ?
-                                idbOsProps['keyPath'].join('') : idbOsProps['keyPath']);
-                            }
-                            objectStore = db.createObjectStore(idbOsName, objectStoreOptions);
-                            containsUniqueIndex = false; 
-                            for (const [idbIndexName, idbIndexOptions] of Object.entries(idbOsProps['indices'])) {
-                                if (idbIndexOptions['unique']) {
-                                    containsUniqueIndex = true;
-                                } 
-                                objectStore.createIndex(idbIndexName, idbIndexOptions['keyPath'],{
-                                    unique: idbIndexOptions['unique'],
-                                    multiEntry: idbIndexOptions['multiEntry']
-                                });    
-                            }
-                            if (!(stLayout != null &&
-                             stLayout[idbDbName] != undefined && stLayout[idbDbName][idbOsName] != undefined)) {
-                                i = 1;
-                                for (const idbOsData of idbOsProps['data']) {
-                                    if (containsUniqueIndex || idbOsProps['keyPath'].length > 0) {
-                                        await new Promise((dResolve, dReject) => {
-                                            addRequest = objectStore.add(idbOsData);
-                                            addRequest.onsuccess = _ => dResolve();
-                                        });
-                                    }
-                                    else {
-                                        await new Promise((dResolve, dReject) => {
-                                            addRequest = objectStore.add(idbOsData, i);
-                                            addRequest.onsuccess = _ => dResolve();
-                                        });
-                                    }
-                                    i++;
-                                }   
-                            }
-                        }
-                        db.close();
-                        resolve();
-                    }
-                });
-            }
-        };
-        document.pySessionHandler.setAllObjectsAsync = async function(idb_data, stLayout, resolve) {
-            console.log(idb_data, stLayout);
-            await document.pySessionHandler.setAllObjects(idb_data, stLayout);
-            resolve();
-        };
-        ''')
-        self.__log.debug('setIDBObjects function inserted.')
+        with self.__measure('set_indexed_db'):
+            self.__write_indexed_db(idb)
+
+    def __write_indexed_db(self, idb: IndexedDB) -> NoReturn:
+        st_layout = self.__session.get_idb_st_layout() if self.__session.idb_special_treatment else {}
+        batch_size = self.__idb_batch_size if self.__idb_batch_size is not None else _DEFAULT_RESTORE_BATCH_SIZE
+        self.__driver.set_script_timeout(self.__script_timeout)
+        self.__create_indexed_db_schema(idb)
 
         self.__log.info('Writing IDB data...')
-        self.__driver.execute_async_script('''
-        var callback = arguments[arguments.length - 1];
-        document.pySessionHandler.setAllObjectsAsync(arguments[0], arguments[1], callback);
-        ''', idb.as_dict(), self.__session.get_idb_st_layout() if self.__session.idb_special_treatment else None)
+        try:
+            for idb_db in idb.get_dbs():
+                for object_store in idb_db.get_object_stores():
+                    if object_store.name in st_layout.get(idb_db.name, []):
+                        continue
+                    data = object_store.get_data()
+                    start_time = time.perf_counter()
+                    for batch_start in range(0, len(data), batch_size):
+                        batch = data[batch_start:batch_start + batch_size]
+                        with self.__measure('set_object_store', db=idb_db.name, store=object_store.name) as phase:
+                            self.__write_object_store_batch(idb_db.name, object_store, batch, batch_start + 1)
+                            phase.add_payload(batch, len(batch))
+                        self.__log.debug('Writing %s/%s... [%s/%s]', idb_db.name, object_store.name,
+                                         min(batch_start + batch_size, len(data)), len(data))
+                    duration = time.perf_counter() - start_time
+                    if len(data) > 0:
+                        self.__log.info('Wrote %s/%s. [Records: %s, Time: %.2fs, Throughput: %.0f records/s]',
+                                        idb_db.name, object_store.name, len(data), duration,
+                                        len(data) / duration if duration > 0 else len(data))
+        finally:
+            self.__driver.execute_script('''
+            // pySessionHandler: close_databases
+            if (document.pySessionHandler != undefined && document.pySessionHandler.idbRestore != undefined) {
+              for (const db of Object.values(document.pySessionHandler.idbRestore.dbs)) {
+                db.close();
+              }
+            }
+            document.pySessionHandler = {};
+            ''')
         if self.__session.idb_special_treatment:
-            self.__log.info("IDB special treatment required. Running special actions...")
-            st_layout = self.__session.get_idb_st_layout()
-            st_data = {}
-            for st_db, st_os_list in st_layout.items():
-                st_data[st_db] = {}
-                for st_os in st_os_list:
-                    st_data[st_db][st_os] = idb.get_db(st_db).get_object_store(st_os).get_data()
-            self.__session.do_idb_st_set_action(self.__driver, st_data)
+            self.__set_idb_st_data(idb, st_layout)
 
         self.__log.info("Finished writing data to IDB!")
 
@@ -310,75 +571,159 @@ class SessionHandler:
 
         return True if profile_name in self.__browser_profile_list else False
 
-    def __wait_for_login(self, timeout=120):
-        login_success = True
+    def __wait_for_login(self, timeout: Optional[float] = None) -> bool:
+        if timeout is None:
+            timeout = self.__login_timeout
         self.__log.info('Waiting for login... [Timeout: %ss]', timeout)
-        # TODO: rewrite this for the general approach
         self.__log.debug(f'Waiting until {self.__session.get_name()} finished loading...')
+        probe = self.__session.get_readiness_probe()
+        deadline = time.monotonic() + timeout
+        login_success = False
         try:
-            WebDriverWait(self.__driver, 120).until(
-                ec.visibility_of_element_located((By.TAG_NAME, 'h1'))
-            )
+            while not self.__aborted and time.monotonic() < deadline:
+                try:
+                    login_success = probe.wait(self.__driver, deadline - time.monotonic())
+                    break
+                except TimeoutException:
+                    break
+                except WebDriverException as error:
+                    # A navigation or reload unloads the document the probe is running in, it is started again in
+                    # the new document. A closed window cannot get ready anymore.
+                    self.__log.debug('Readiness probe was interrupted: %s', error.msg)
+                    try:
+                        _ = self.__driver.current_window_handle
+                    except WebDriverException:
+                        break
+                    time.sleep(min(0.5, max(deadline - time.monotonic(), 0)))
+        finally:
+            self.__driver.set_script_timeout(self.__script_timeout)
+        if login_success:
             self.__log.info('Login completed.')
-        except TimeoutException:
-            login_success = False
+        else:
             self.__log.error('Login was not completed in time. Aborting...')
         return login_success
 
+    def __check_aborted(self) -> NoReturn:
+        if self.__aborted:
+            raise RuntimeError('The SessionHandler was aborted.')
+
+    def __check_aborted_after_start(self) -> NoReturn:
+        # An abort while the browser was starting could not quit it, pooled browsers are released by the caller.
+        if self.__aborted:
+            if not self.__pooled_driver:
+                try:
+                    self.__driver.quit()
+                except Exception:
+                    pass
+            self.__check_aborted()
+
     def __start_session(self, options: Optional[Union[c_op.Options, f_op.Options]] = None,
-                        profile_name: Optional[str] = None, wait_for_login=True) -> NoReturn:
+                        profile_name: Optional[str] = None, wait_for_login=True, pooled=False) -> NoReturn:
+        self.__check_aborted()
         if not self.__custom_driver and options is None:
             raise ValueError("Do not call this method without providing options for the webdriver.")
         if profile_name is None:
-            if not self.__custom_driver:
-                self.__log.info('Starting browser... [HEADLESS: %s]', str(options.headless))
-                if self.__browser_choice == Browser.CHROME:
-                    self.__driver = webdriver.Chrome(options=options)
-                elif self.__browser_choice == Browser.FIREFOX:
-                    self.__driver = webdriver.Firefox(options=options)
-            else:
-                self.__log.debug('Checking if current browser window can be used...')
-                if self.__browser_choice == Browser.CHROME:
-                    if self.__driver.current_url != 'chrome://new-tab-page/' and self.__driver.current_url != 'data:,':
-                        self.__driver.execute_script('window.open()')
-                        self.__driver.switch_to.window(self.__driver.window_handles[-1])
-                elif self.__browser_choice == Browser.FIREFOX:
-                    if self.__driver.current_url != "about:blank":
-                        self.__driver.execute_script('window.open()')
-                        self.__driver.switch_to.window(self.__driver.window_handles[-1])
+            try:
+                self.__start_new_session(options, wait_for_login, pooled)
+            except Exception:
+                # Pooled browsers have to be returned even if they broke, the pool replaces them.
+                if self.__pooled_driver:
+                    self.__close_browser()
+                raise
+        else:
+            self.__log.info('Starting browser... [HEADLESS: %s]', str(_is_headless(options)))
+            with self.__measure('browser_start'):
+                self.__driver = self.__create_driver(options, os.path.join(self.__browser_user_dir, profile_name))
+            self.__check_aborted_after_start()
 
             self.__log.info(f'Loading {self.__session.get_name()}...')
-            self.__driver.get(self.__session.get_url())
+            with self.__measure('page_load'):
+                self.__driver.get(self.__session.get_url())
 
-            if wait_for_login:
-                if not self.__wait_for_login():
-                    return
+    def __start_new_session(self, options: Optional[Union[c_op.Options, f_op.Options]], wait_for_login: bool,
+                            pooled: bool) -> NoReturn:
+        if pooled and self.__driver_pool is not None and not self.__custom_driver:
+            self.__log.info('Acquiring browser from pool...')
+            with self.__measure('browser_start'):
+                self.__driver = self.__driver_pool.acquire()
+            self.__pooled_driver = True
+            self.__check_aborted_after_start()
+        elif not self.__custom_driver:
+            self.__log.info('Starting browser... [HEADLESS: %s]', str(_is_headless(options)))
+            with self.__measure('browser_start'):
+                self.__driver = self.__create_driver(options)
+            self.__check_aborted_after_start()
         else:
-            self.__log.info('Starting browser... [HEADLESS: %s]', str(options.headless))
+            self.__log.debug('Checking if current browser window can be used...')
             if self.__browser_choice == Browser.CHROME:
-                options.add_argument('user-data-dir=%s' % os.path.join(self.__browser_user_dir, profile_name))
-                self.__driver = webdriver.Chrome(options=options)
+                if self.__driver.current_url != 'chrome://new-tab-page/' and self.__driver.current_url != 'data:,':
+                    self.__driver.execute_script(_OPEN_WINDOW_JS)
+                    self.__driver.switch_to.window(self.__driver.window_handles[-1])
             elif self.__browser_choice == Browser.FIREFOX:
-                fire_profile = webdriver.FirefoxProfile(os.path.join(self.__browser_user_dir, profile_name))
-                self.__driver = webdriver.Firefox(fire_profile, options=options)
+                if self.__driver.current_url != "about:blank":
+                    self.__driver.execute_script(_OPEN_WINDOW_JS)
+                    self.__driver.switch_to.window(self.__driver.window_handles[-1])
 
-            self.__log.info(f'Loading {self.__session.get_name()}...')
+        self.__log.info(f'Loading {self.__session.get_name()}...')
+        with self.__measure('page_load'):
             self.__driver.get(self.__session.get_url())
 
-    def __start_visible_session(self, profile_name: Optional[str] = None, wait_for_login=True) -> NoReturn:
-        options = self.__browser_options
-        options.headless = False
+        if wait_for_login:
+            with self.__measure('login'):
+                self.__wait_for_login()
+
+    def __create_driver(self, options: Union[c_op.Options, f_op.Options],
+                        profile_dir: Optional[str] = None) -> Union[c_wd.WebDriver, f_wd.WebDriver]:
+        if self.__driver_factory is not None:
+            return self.__driver_factory(options, profile_dir)
+        if self.__browser_choice == Browser.CHROME:
+            if profile_dir is not None:
+                options.add_argument('user-data-dir=%s' % profile_dir)
+            return webdriver.Chrome(options=options)
+        if profile_dir is not None:
+            return webdriver.Firefox(webdriver.FirefoxProfile(profile_dir), options=options)
+        return webdriver.Firefox(options=options)
 
+    def __start_visible_session(self, profile_name: Optional[str] = None, wait_for_login=True) -> NoReturn:
         if profile_name is not None:
             self.__verify_profile_name_exists(profile_name)
-        self.__start_session(options, profile_name, wait_for_login)
+        self.__start_session(create_browser_options(self.__browser_choice, False), profile_name, wait_for_login)
 
     def __start_invisible_session(self, profile_name: Optional[str] = None) -> NoReturn:
         if profile_name is not None:
             self.__verify_profile_name_exists(profile_name)
-        self.__start_session(self.__browser_options, profile_name)
+        self.__start_session(create_browser_options(self.__browser_choice, True), profile_name)
+
+    def __close_browser(self) -> NoReturn:
+        with self.__measure('close_browser'):
+            self.__quit_browser()
+
+    def __quit_browser(self) -> NoReturn:
+        if self.__pooled_driver:
+            self.__log.info('Returning browser to pool...')
+            self.__pooled_driver = False
+            driver = self.__driver
+            self.__driver = None
+            self.__driver_pool.release(driver, self.__session.get_idb_db_names())
+        elif not self.__custom_driver:
+            self.__log.info("Closing browser...")
+            self.__driver.quit()
+        else:
+            self.__log.info("Closing tab...")
+            self.__driver.close()
+            self.__driver.switch_to.window(self.__driver.window_handles[-1])
 
     def __get_profile_session(self, profile_name: Optional[str] = None) -> SessionObject:
+        self.__begin_metrics('capture', profile=profile_name if profile_name is not None else '')
+        session_object = self.__capture_profile_session(profile_name)
+        session_object.metrics = self.__end_metrics()
+        return session_object
+
+    def __capture_profile_session(self, profile_name: Optional[str]) -> SessionObject:
+        if profile_name is not None and self.__offline_extraction:
+            with self.__measure('offline_read'):
+                return self.__profile_discovery.get_reader(profile_name).get_session(self.__session)
+
         if profile_name is None:
             if self.__custom_driver:
                 self.__start_session()
@@ -391,25 +736,216 @@ class SessionHandler:
         local_storage = self.__get_local_storage()
         indexed_db = self.__get_indexed_db()
 
-        if not self.__custom_driver:
-            self.__log.info("Closing browser...")
-            self.__driver.quit()
-        else:
-            self.__log.info("Closing tab...")
-            self.__driver.close()
-            self.__driver.switch_to.window(self.__driver.window_handles[-1])
+        self.__close_browser()
 
         return SessionObject(self.__session.get_name(), self.__session.get_url(), self.__session.get_file_ext(),
                              cookies, local_storage, indexed_db)
 
+    def __restore_session_in_one_step(self, session_object: SessionObject) -> NoReturn:
+        st_layout = self.__session.get_idb_st_layout() if self.__session.idb_special_treatment else {}
+        batch_size = self.__idb_batch_size if self.__idb_batch_size is not None else _DEFAULT_RESTORE_BATCH_SIZE
+        idb = session_object.indexed_db
+        idb_data = {}
+        for idb_db in idb.get_dbs():
+            idb_data[idb_db.name] = {}
+            for object_store in idb_db.get_object_stores():
+                if object_store.name not in st_layout.get(idb_db.name, []):
+                    idb_data[idb_db.name][object_store.name] = {
+                        'data': list(object_store.get_data()),
+                        'keyed': len(object_store.key_path) == 0
+                    }
+        self.__log.info('Restoring cookies, localStorage and IDB in one step...')
+        self.__driver.set_script_timeout(self.__script_timeout)
+        start_time = time.perf_counter()
+        with self.__measure('restore') as phase:
+            result = self.__restore_in_browser(session_object, idb_data, batch_size)
+            phase.add_payload([session_object.cookies, session_object.local_storage])
+        if result.get('error') is not None:
+            raise RuntimeError(f'Could not restore session: {result["error"]}')
+        for name, stats in result['stats'].items():
+            if stats['records'] > 0:
+                self.__log.info('Wrote %s. [Records: %s, Time: %.2fs, Throughput: %.0f records/s]',
+                                name, stats['records'], stats['time'],
+                                stats['records'] / stats['time'] if stats['time'] > 0 else stats['records'])
+            if self.__metrics is not None:
+                db_name, os_name = name.split('/', maxsplit=1)
+                self.__metrics.add('set_object_store', stats['time'], idb_data[db_name][os_name]['data'],
+                                   stats['records'], db=db_name, store=os_name)
+        self.__log.info('Restored session in %.2fs.', time.perf_counter() - start_time)
+        if self.__session.idb_special_treatment:
+            self.__set_idb_st_data(idb, st_layout)
+
+    def __restore_in_browser(self, session_object: SessionObject, idb_data: dict, batch_size: int) -> dict:
+        return self.__driver.execute_async_script('''
+        // pySessionHandler: restore_session
+        const callback = arguments[arguments.length - 1];
+        const cookies = arguments[0];
+        const localStorageDict = arguments[1];
+        const schema = arguments[2];
+        const idbData = arguments[3];
+        const batchSize = arguments[4];
+        ''' + _IDB_HELPERS_JS + _IDB_RESTORE_JS + '''
+        async function restoreSession() {
+          for (const [key, value] of Object.entries(cookies)) {
+            document.cookie = key + "=" + value;
+          }
+          for (const [key, value] of Object.entries(localStorageDict)) {
+            window.localStorage.setItem(key, value);
+          }
+          await createSchema(schema);
+          const stats = {};
+          for (const [dbName, objectStores] of Object.entries(idbData)) {
+            const db = await openDatabase(dbName);
+            try {
+              for (const [osName, osData] of Object.entries(objectStores)) {
+                const startTime = performance.now();
+                for (let i = 0; i < osData['data'].length; i += batchSize) {
+                  await writeRecords(db, dbName, osName, osData['data'].slice(i, i + batchSize),
+                    osData['keyed'] ? i + 1 : null);
+                }
+                stats[dbName + '/' + osName] = {
+                  'records': osData['data'].length, 'time': (performance.now() - startTime) / 1000
+                };
+              }
+            }
+            finally {
+              db.close();
+            }
+          }
+          return stats;
+        }
+        restoreSession().then(stats => callback({'stats': stats}), error => callback({'error': String(error)}));
+        ''', session_object.cookies, session_object.local_storage,
+                                                 self.__get_indexed_db_schema(session_object.indexed_db), idb_data,
+                                                 batch_size)
+
+    def __copy_settings_to(self, worker: 'SessionHandler') -> NoReturn:
+        # Every setting of this instance, a new setting has to be added here to reach the workers.
+        # The state of the running operation (driver, metrics, abort flag) is not copied.
+        worker.__log = self.__log
+        worker.__platform = self.__platform
+        worker.__session = self.__session
+        worker.__profile_errors = {}
+        worker.__browser_choice = self.__browser_choice
+        worker.__custom_driver = self.__custom_driver
+        worker.__browser_user_dir = self.__browser_user_dir
+        worker.__browser_profile_list = list(self.__browser_profile_list)
+        worker.__profile_discovery = self.__profile_discovery
+        worker.__driver_factory = self.__driver_factory
+        worker.__driver_pool = self.__driver_pool
+        worker.__login_timeout = self.__login_timeout
+        worker.__script_timeout = self.__script_timeout
+        worker.__idb_batch_size = self.__idb_batch_size
+        worker.__single_step_restore = self.__single_step_restore
+        worker.__offline_extraction = self.__offline_extraction
+        worker.__skip_profiles_without_storage = self.__skip_profiles_without_storage
+        worker.__checkpoint_path = self.__checkpoint_path
+        worker.__checkpoint_interval = self.__checkpoint_interval
+        worker.__collect_metrics = self.__collect_metrics
+        worker.__metrics_callback = self.__metrics_callback
+
+    def __create_worker(self) -> 'SessionHandler':
+        # __init__ is skipped, it would read the profiles of the default user dir of the browser again.
+        worker = SessionHandler.__new__(SessionHandler)
+        self.__copy_settings_to(worker)
+        return worker
+
+    def __get_profile_session_in_worker(self, profile_name: str) -> SessionObject:
+        # Every worker gets its own SessionHandler, the driver of this instance is never shared between threads.
+        worker = self.__create_worker()
+        try:
+            return worker.__get_profile_session(profile_name)
+        except Exception:
+            if worker.__driver is not None:
+                try:
+                    worker.__driver.quit()
+                except WebDriverException:
+                    pass
+            raise
+
+    def __get_profile_sessions_concurrently(self, profile_list: 'list[str]',
+                                            max_workers: int) -> 'dict[str, SessionObject]':
+        self.__log.info('Getting sessions of %s profiles... [Workers: %s]', len(profile_list), max_workers)
+        profile_storage_dict = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='SessionHandler') as executor:
+            futures = {
+                executor.submit(self.__get_profile_session_in_worker, profile): profile for profile in profile_list
+            }
+            for future in as_completed(futures):
+                profile = futures[future]
+                try:
+                    profile_storage_dict[profile] = future.result()
+                    self.__log.info('Got session of profile: %s', profile)
+                except Exception as error:
+                    self.__log.error('Could not get session of profile %s: %s', profile, error)
+                    self.__profile_errors[profile] = error
+        return {profile: profile_storage_dict[profile] for profile in profile_list if profile in profile_storage_dict}
+
     # FIXME: get and set methods do very different things
+    def __capture_session(self) -> SessionObject:
+        return SessionObject(
+            self.__session.get_name(),
+            self.__session.get_url(),
+            self.__session.get_file_ext(),
+            self.__get_cookies(),
+            self.__get_local_storage(),
+            self.__get_indexed_db()
+        )
+
+    def __write_checkpoint(self, session_object: SessionObject) -> NoReturn:
+        try:
+            session_object.save_to_file(self.__checkpoint_path, incremental=True)
+            self.__log.debug('Saved checkpoint: %s', self.__checkpoint_path)
+        except Exception as error:
+            self.__log.warning('Could not save checkpoint "%s": %s', self.__checkpoint_path, error)
+
+    def __wait_with_checkpoints(self, session_object: SessionObject) -> SessionObject:
+        # The browser can only be used by this thread, the files are written by a separate thread.
+        # Once the window is closed its storage cannot be read anymore, the last checkpoint is the final state.
+        last_fingerprint = None
+        # The first count always differs, it captures changes made before the counter was installed.
+        last_changes = None
+        next_capture = time.monotonic() + self.__checkpoint_interval
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='SessionCheckpoint') as writer:
+            while not self.__aborted:
+                try:
+                    _ = self.__driver.current_window_handle
+                except WebDriverException:
+                    break
+                try:
+                    changes = self.__driver.execute_script(_CHANGE_COUNTER_JS)
+                except WebDriverException:
+                    # The page is loading, the counter is read again at the next tick.
+                    changes = last_changes
+                # Cookies and changes made by workers are not counted, they are captured at the interval.
+                if changes != last_changes or time.monotonic() >= next_capture:
+                    try:
+                        checkpoint = self.__capture_session()
+                    except WebDriverException:
+                        # A closed window ends the loop at the next tick.
+                        time.sleep(1)
+                        continue
+                    session_object = checkpoint
+                    last_changes = changes
+                    next_capture = time.monotonic() + self.__checkpoint_interval
+                    fingerprint = checkpoint.get_fingerprint()
+                    if fingerprint != last_fingerprint:
+                        last_fingerprint = fingerprint
+                        writer.submit(self.__write_checkpoint, checkpoint)
+                time.sleep(1)
+        return session_object
+
     def __set_profile_session(self, session_object: SessionObject) -> NoReturn:
-        self.__set_cookies(session_object.cookies)
-        self.__set_local_storage(session_object.local_storage)
-        self.__set_indexed_db(session_object.indexed_db)
+        if self.__single_step_restore:
+            self.__restore_session_in_one_step(session_object)
+        else:
+            self.__set_cookies(session_object.cookies)
+            self.__set_local_storage(session_object.local_storage)
+            self.__set_indexed_db(session_object.indexed_db)
 
         self.__log.info(f'Reloading {self.__session.get_name()}...')
-        self.__driver.refresh()
+        with self.__measure('refresh'):
+            self.__driver.refresh()
 
     def __init__(self, session_class: SessionObject,
                  browser: Optional[Union[Browser, str]] = None,
@@ -423,6 +959,7 @@ class SessionHandler:
         self.__log.debug('Detected platform: %s', self.__platform)
 
         self.__session = session_class
+        self.__profile_errors = {}
 
         if driver:
             self.set_custom_webdriver(driver)
@@ -442,6 +979,131 @@ class SessionHandler:
         self.__custom_driver = True
         self.__driver = driver
 
+    def set_driver_factory(self, driver_factory: Optional[Callable[[Union[c_op.Options, f_op.Options], Optional[str]],
+                                                                   Union[c_wd.WebDriver, f_wd.WebDriver]]]) -> NoReturn:
+        """
+        Start browsers with a custom function instead of the Selenium driver of the selected browser
+
+        :param driver_factory: a function getting the browser options and the directory of the browser profile
+                               (`None` for a new session) and returning the started webdriver, `None` to start the
+                               Selenium driver again
+        """
+        self.__driver_factory = driver_factory
+
+    def set_browser_user_dir(self, user_dir: str) -> NoReturn:
+        """
+        Read the browser profiles from another directory than the default user dir of the selected browser
+
+        :param user_dir: the directory containing the browser profiles
+        """
+        if self.__custom_driver:
+            raise AssertionError('Do not call this method if you are using a custom webdriver.')
+        self.__browser_user_dir = user_dir
+        if self.__browser_choice == Browser.CHROME:
+            self.__profile_discovery = ChromeProfileDiscovery(user_dir)
+        else:
+            self.__profile_discovery = FirefoxProfileDiscovery(user_dir)
+        self.__refresh_profile_list()
+
+    def set_script_timeout(self, timeout: float) -> NoReturn:
+        """
+        Set the time asynchronous browser scripts (e.g. dumping IndexedDB) are allowed to take
+
+        :param timeout: the timeout in seconds
+        """
+        if timeout <= 0:
+            raise ValueError('Timeout cannot be <= 0')
+        self.__script_timeout = timeout
+
+    def set_collect_metrics(self, enabled: bool,
+                            callback: Optional[Callable[[SessionMetrics], NoReturn]] = None) -> NoReturn:
+        """
+        Measure the wall time, transferred bytes and records of every phase of capturing and restoring sessions
+
+        The metrics are stored in the ``metrics`` attribute of the returned sessions. Sizes are the sizes of the JSON
+        encoded payloads, computing them costs about as much as encoding the session once.
+
+        :param enabled: `True` to collect metrics
+        :param callback: called with the :class:`SessionMetrics` after every operation, concurrent captures call it
+                         from their worker threads
+        """
+        self.__collect_metrics = enabled
+        self.__metrics_callback = callback
+
+    def set_login_timeout(self, timeout: float) -> NoReturn:
+        """
+        Set the time the website is given to finish loading after a login
+
+        :param timeout: the timeout in seconds
+        """
+        if timeout <= 0:
+            raise ValueError('Timeout cannot be <= 0')
+        self.__login_timeout = timeout
+
+    def set_idb_batch_size(self, batch_size: Optional[int]) -> NoReturn:
+        """
+        Get IndexedDB object stores in batches instead of dumping everything in a single response
+
+        The batch size is also used for the transactions that restore object stores.
+
+        :param batch_size: the maximum number of records per batch or `None` to disable batching
+        """
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError('Batch size cannot be <= 0')
+        self.__idb_batch_size = batch_size
+
+    def set_single_step_restore(self, enabled: bool) -> NoReturn:
+        """
+        Restore cookies, localStorage and IndexedDB with a single script instead of one round trip per item
+
+        :param enabled: `True` to send the whole session to the page at once
+        """
+        self.__single_step_restore = enabled
+
+    def set_offline_extraction(self, enabled: bool) -> NoReturn:
+        """
+        Read the sessions of browser profiles directly from the profile files instead of starting a browser
+
+        Chrome profiles are read from their LevelDB and SQLite files, Firefox profiles from their SQLite files.
+        Encrypted Chrome cookies cannot be read offline and are left out.
+
+        :param enabled: `True` to read profiles offline
+        """
+        self.__offline_extraction = enabled
+
+    def set_checkpointing(self, path: Optional[str], interval: float = 30) -> NoReturn:
+        """
+        Save the session while a session opened with `open_session` is in use
+
+        The page counts its localStorage and IndexedDB writes, the count is checked every second and the session is
+        captured as soon as it changed. Changes the page cannot count, like cookies, are captured at every interval.
+        A capture is only written if the session changed since the last checkpoint. Checkpoints are appended to the
+        journal of the file, writing them does not delay the next capture. `open_session` returns the last
+        checkpoint, it misses at most the changes of the last second before the window was closed.
+
+        :param path: the path of the session file or `None` to disable checkpointing
+        :param interval: the maximum time between two captures in seconds
+        """
+        if interval <= 0:
+            raise ValueError('Interval cannot be <= 0')
+        self.__checkpoint_path = path
+        self.__checkpoint_interval = interval
+
+    def set_driver_pool(self, driver_pool: Optional['DriverPool']) -> NoReturn:
+        """
+        Take the browsers of `open_session` with `wait_for_close=False` from a pool instead of starting a new one
+        every time
+
+        Pooled browsers are headless and returned to the pool with cleared storage. Operations that need a user
+        (`create_new_session`, `open_session` waiting for the window) or a browser profile (`get_active_session`)
+        always start a browser of their own.
+
+        :param driver_pool: a :class:`DriverPool` of the selected browser or `None` to start new browsers again
+        """
+        if driver_pool is not None and driver_pool.get_browser() != self.__browser_choice:
+            raise ValueError('The browser of the driver pool does not match the selected browser.')
+        self.__driver_pool = driver_pool
+
     def set_browser(self, browser: Union[Browser, str]) -> NoReturn:
         if self.__driver is not None:
             self.__driver.quit()
@@ -466,22 +1128,80 @@ class SessionHandler:
             raise TypeError(
                 'Type of browser invalid. Please use Browser.CHROME or Browser.FIREFOX instead.'
             )
+        if self.__driver_pool is not None and self.__driver_pool.get_browser() != self.__browser_choice:
+            self.__log.debug('Removing driver pool of the previous browser...')
+            self.__driver_pool = None
         self.__init_browser()
 
     # TODO: Think about type aliasing
-    def get_active_session(self, use_profile: Optional[Union['list[str]', str]] = None, all_profiles=False) -> Union[
-        'dict[str, SessionObject]', 'SessionObject'
-    ]:
+    def get_profile_list(self, only_with_storage: bool = False) -> 'list[str]':
+        """
+        Get the names of the browser profiles of the selected browser
+
+        :param only_with_storage: only return profiles that contain storage of the session's website
+
+        :return: a list containing the profile names
+        """
+        self.__refresh_profile_list()
+        if not only_with_storage:
+            return list(self.__browser_profile_list)
+        profile_list = []
+        for profile in self.__browser_profile_list:
+            if self.__profile_discovery.has_origin_storage(profile, self.__session.get_url()):
+                profile_list.append(profile)
+            else:
+                self.__log.info('Skipping profile without %s data: %s', self.__session.get_name(), profile)
+        return profile_list
+
+    def set_skip_profiles_without_storage(self, enabled: bool) -> NoReturn:
+        """
+        Skip profiles without storage of the session's website when getting the sessions of all profiles
+
+        Enabled by default, only the storage directories of the profiles are checked before a browser is started.
+
+        :param enabled: `False` to start a browser for every profile
+        """
+        self.__skip_profiles_without_storage = enabled
+
+    def abort(self) -> NoReturn:
+        """
+        Stop the operation that is currently running in another thread
+
+        The browser is quit, which makes pending browser calls fail. The SessionHandler cannot be used afterwards.
+        """
+        self.__aborted = True
+        if self.__driver is not None and not self.__custom_driver:
+            self.__log.info('Aborting... Closing browser...')
+            try:
+                self.__driver.quit()
+            except Exception:
+                pass
+
+    def get_active_session(self, use_profile: Optional[Union['list[str]', str]] = None, all_profiles=False,
+                           max_workers: int = 1) -> Union['dict[str, SessionObject]', 'SessionObject']:
+        """
+        Get the active sessions of browser profiles
+
+        :param use_profile: a profile name or a list of profile names, if `None` a new session is created
+        :param all_profiles: get the sessions of all profiles of the selected browser
+        :param max_workers: the number of browsers that are allowed to run at the same time,
+                            failed profiles are skipped and can be inspected with `get_profile_errors`
+
+        :return: a dict containing the sessions by profile name or a single session
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers cannot be < 1')
         self.__log.info('Make sure the specified browser profile is not being used by another process.')
         profile_storage_dict = {}
         use_profile_list = []
+        self.__profile_errors = {}
         self.__refresh_profile_list()
 
         if self.__custom_driver:
             raise AssertionError('Do not call this method if you are using a custom webdriver.')
 
         if all_profiles:
-            use_profile_list.extend(self.__browser_profile_list)
+            use_profile_list.extend(self.get_profile_list(self.__skip_profiles_without_storage))
             self.__log.info(
                 'Trying to get active sessions for all browser profiles of the selected type...'
             )
@@ -499,38 +1219,71 @@ class SessionHandler:
                     'Invalid profile provided. Make sure you provided a list of profiles or a profile name.'
                 )
 
+        if max_workers > 1 and len(use_profile_list) > 1:
+            return self.__get_profile_sessions_concurrently(use_profile_list, max_workers)
+
         for profile in use_profile_list:
             profile_storage_dict[profile] = self.__get_profile_session(profile)
 
         return profile_storage_dict
 
+    def get_profile_errors(self) -> 'dict[str, Exception]':
+        """
+        Get the errors of profiles that failed during the last concurrent `get_active_session` call
+
+        :return: a dict containing the raised exceptions by profile name
+        """
+        return self.__profile_errors
+
     def create_new_session(self) -> 'SessionObject':
         return self.__get_profile_session()
 
-    def open_session(self) -> SessionObject:
-        if not self.__custom_driver:
+    def open_session(self, wait_for_close: bool = True) -> SessionObject:
+        """
+        Restore the session in a browser window
+
+        :param wait_for_close: wait until the user closed the window, `False` restores and captures the session in a
+                               headless browser without a user, the browser is taken from the driver pool if one is set
+
+        :return: the session that was captured last
+        """
+        self.__begin_metrics('restore')
+        if self.__custom_driver:
+            self.__start_session(wait_for_login=False)
+        elif wait_for_close:
             self.__start_visible_session(wait_for_login=False)
         else:
-            self.__start_session(wait_for_login=False)
+            self.__start_session(create_browser_options(self.__browser_choice, True), wait_for_login=False,
+                                 pooled=True)
 
-        self.__set_profile_session(self.__session)
+        try:
+            self.__set_profile_session(self.__session)
+            return_session = self.__capture_session()
+        except Exception:
+            self.__metrics = None
+            if not wait_for_close:
+                self.__close_browser()
+            raise
 
-        return_session = SessionObject(
-            self.__session.get_name(),
-            self.__session.get_url(),
-            self.__session.get_file_ext(),
-            self.__get_cookies(),
-            self.__get_local_storage(),
-            self.__get_indexed_db()
-        )
+        if not wait_for_close:
+            self.__close_browser()
+            return_session.metrics = self.__end_metrics()
+            return return_session
 
+        # Checkpoints and waiting for the window to be closed are not part of the metrics.
+        metrics = self.__end_metrics()
         if not self.__custom_driver:
             self.__log.info('Do not reload the page manually.')
             self.__log.info('Waiting until the browser window is closed...')
-            while True:
-                try:
-                    _ = self.__driver.current_window_handle
-                    time.sleep(1)
-                except WebDriverException:
-                    break
+            if self.__checkpoint_path is not None:
+                return_session = self.__wait_with_checkpoints(return_session)
+            else:
+                while not self.__aborted:
+                    try:
+                        _ = self.__driver.current_window_handle
+                        time.sleep(1)
+                    except WebDriverException:
+                        break
+        self.__check_aborted()
+        return_session.metrics = metrics
         return return_session
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+from typing import NoReturn, Optional
+
+_JOURNAL_SUFFIX = '.journal'
+_JOURNAL_VERSION = 1
+
+
+def get_journal_path(path: str) -> str:
+    return path + _JOURNAL_SUFFIX
+
+
+def _get_schema(object_store) -> dict:
+    return {
+        'name': object_store.name,
+        'autoIncrement': object_store.auto_increment,
+        'keyPath': object_store.key_path,
+        'indices': object_store.get_indices()
+    }
+
+
+def _get_store_ops(db_name: str, object_store) -> list[dict]:
+    return [{'op': 'store', 'db': db_name, 'store': object_store.name, 'schema': _get_schema(object_store),
+             'data': list(object_store.get_data())}]
+
+
+def _diff_object_store(db_name: str, old_store, new_store) -> list[dict]:
+    store_diff = old_store.diff(new_store)
+    if len(store_diff) == 0:
+        return []
+    if store_diff.get('schema') or len(new_store.key_path) == 0:
+        # Records of object stores without a keyPath are only identified by their position.
+        return _get_store_ops(db_name, new_store)
+    ops = [{'op': 'delete', 'db': db_name, 'store': new_store.name, 'key': key}
+           for key in store_diff.get('removed', [])]
+    for key in store_diff.get('added', []) + store_diff.get('changed', []):
+        ops.append({'op': 'put', 'db': db_name, 'store': new_store.name, 'value': new_store.get(key)})
+    return ops
+
+
+def diff_sessions(old_session, new_session) -> list[dict]:
+    """
+    Get the operations that turn one session into another
+
+    Only the object stores whose fingerprints differ are compared record by record, records are matched by their
+    primary key.
+
+    :param old_session: the last saved state
+    :param new_session: the current state
+    :return: a list containing the journal operations, empty if both sessions contain the same data
+    """
+    session_diff = old_session.diff(new_session)
+    ops = []
+    if session_diff.get('cookies'):
+        ops.append({'op': 'cookies', 'value': new_session.cookies})
+    if session_diff.get('localStorage'):
+        ops.append({'op': 'localStorage', 'value': new_session.local_storage})
+    for name, db_diff in session_diff.get('indexedDb', {}).items():
+        if db_diff == 'removed':
+            ops.append({'op': 'deleteDb', 'db': name})
+            continue
+        new_db = new_session.indexed_db.get_db(name)
+        if db_diff == 'added':
+            ops.append({'op': 'db', 'db': name, 'version': new_db.version})
+            for object_store in new_db.get_object_stores():
+                ops.extend(_get_store_ops(name, object_store))
+            continue
+        if 'version' in db_diff:
+            ops.append({'op': 'db', 'db': name, 'version': new_db.version})
+        old_db = old_session.indexed_db.get_db(name)
+        for store_name, store_diff in db_diff.get('objectStores', {}).items():
+            if store_diff == 'removed':
+                ops.append({'op': 'deleteStore', 'db': name, 'store': store_name})
+            elif store_diff == 'added':
+                ops.extend(_get_store_ops(name, new_db.get_object_store(store_name)))
+            else:
+                ops.extend(_diff_object_store(name, old_db.get_object_store(store_name),
+                                              new_db.get_object_store(store_name)))
+    return ops
+
+
+class SessionJournal:
+    """
+    Append-only log of the changes made to a session file since it was written
+
+    Every line is a JSON encoded operation. The first line binds the journal to the size and modification time of
+    the session file, a journal that belongs to an older version of the file is ignored. Every save ends with a
+    commit line, operations after the last commit line were not written completely and are ignored.
+    """
+    __path: str
+    __journal_path: str
+    __log: logging.Logger
+
+    def __init__(self, path: str):
+        """
+        :param path: the path of the session file the journal belongs to
+        """
+        self.__path = path
+        self.__journal_path = get_journal_path(path)
+        self.__log = logging.getLogger('SessionHandler')
+
+    def __get_base_state(self) -> dict:
+        stat = os.stat(self.__path)
+        return {'version': _JOURNAL_VERSION, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def __read_committed(self) -> tuple[list[dict], int]:
+        # Returns the committed operations and the size of the committed part of the file.
+        if not os.path.isfile(self.__journal_path):
+            return [], 0
+        ops = []
+        committed_ops = []
+        committed_size = 0
+        with open(self.__journal_path, 'rb') as file:
+            header_line = file.readline()
+            try:
+                header = json.loads(header_line.decode('utf-8', 'surrogatepass'))
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get('base') != self.__get_base_state():
+                self.__log.warning('Ignoring journal that does not belong to the session file: %s',
+                                   self.__journal_path)
+                return [], 0
+            committed_size = len(header_line)
+            position = committed_size
+            for line in file:
+                position += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    op = json.loads(line.decode('utf-8', 'surrogatepass'))
+                except ValueError:
+                    break
+                ops.append(op)
+                if op.get('op') == 'commit':
+                    committed_ops.extend(ops)
+                    ops = []
+                    committed_size = position
+        return committed_ops, committed_size
+
+    def get_path(self) -> str:
+        return self.__journal_path
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.__journal_path)
+
+    def get_size(self) -> int:
+        return os.path.getsize(self.__journal_path) if self.exists() else 0
+
+    def read(self) -> list[dict]:
+        """
+        Read the committed operations
+
+        :return: a list containing the operations in the order they have to be applied, including the commit lines
+        """
+        return self.__read_committed()[0]
+
+    def append(self, ops: list[dict], capture_time: Optional[float] = None) -> NoReturn:
+        """
+        Append operations followed by a commit line
+
+        Incomplete operations of an interrupted save are cut off first.
+
+        :param ops: the operations, usually created by :func:`diff_sessions`
+        :param capture_time: the capture time of the session the operations lead to
+        """
+        _, committed_size = self.__read_committed()
+        mode = 'r+b' if committed_size > 0 else 'wb'
+        with open(self.__journal_path, mode) as file:
+            file.seek(committed_size)
+            file.truncate()
+            if committed_size == 0:
+                file.write(self.__encode({'op': 'header', 'base': self.__get_base_state()}))
+            for op in ops:
+                file.write(self.__encode(op))
+            file.write(self.__encode({'op': 'commit', 'captureTime': capture_time}))
+            file.flush()
+            os.fsync(file.fileno())
+
+    @staticmethod
+    def __encode(op: dict) -> bytes:
+        return json.dumps(op, separators=(',', ':'), ensure_ascii=False).encode('utf-8', 'surrogatepass') + b'\n'
+
+    def remove(self) -> NoReturn:
+        if self.exists():
+            os.remove(self.__journal_path)
@@ -1,6 +1,28 @@
+import bisect
 import json
 import os.path
-from typing import NoReturn, Optional, Union
+import time
+from collections.abc import Sequence
+from typing import Callable, Iterable, Iterator, NoReturn, Optional, Union
+
+from SessionHandler.Fingerprint import hash_value, hash_digests
+from SessionHandler.IDBKey import NO_KEY, IDBKeyRange, evaluate_key_path, to_hashable_key
+from SessionHandler.JsonStream import JsonStreamReader, JsonStreamWriter
+from SessionHandler.Metrics import SessionMetrics
+from SessionHandler.ReadinessProbe import ReadinessProbe, SelectorProbe
+from SessionHandler.RecordBuffer import RecordBuffer
+from SessionHandler.SessionContainer import SessionContainerReader, SessionContainerWriter, is_container
+from SessionHandler.SessionJournal import SessionJournal, diff_sessions
+
+
+def _check_required_keys(found_keys, required_keys: list[str], path: Optional[str] = None) -> NoReturn:
+    for key in required_keys:
+        if key not in found_keys:
+            if path is not None:
+                raise KeyError(f'Could not find key "{key}" in "{path}".\n'
+                               f'Make sure the session file contains all required keys.')
+            raise KeyError(f'Could not find key "{key}".\n'
+                           f'Make sure the dictionary contains all required keys.')
 
 
 class IDBObjectStore:
@@ -9,16 +31,103 @@ class IDBObjectStore:
     key_path: list[str]
     # TODO: Think about creating a IDBIndex class
     __indices: dict[str, dict]
-    __data: list[dict[str, object]]
+    # unique index name -> {hashable index key: position in __data}
+    __unique_maps: dict[str, dict[tuple, int]]
+    # lazily built lookup structures, None is used as the name of the primary key index
+    __hash_indexes: dict[Optional[str], dict[tuple, list[int]]]
+    __sorted_indexes: dict[Optional[str], tuple[list[tuple], list[int]]]
+    # a RecordBuffer if the object store is compact
+    __data: Union[list[dict[str, object]], RecordBuffer]
+    __compact: bool
+    # records that are only decoded and indexed on first access
+    __data_loader: Optional[Callable[[], Iterable[dict[str, object]]]]
+    __data_loader_num: Optional[int]
+    # hashes of the records in __data, only maintained once a fingerprint was requested
+    __record_hashes: Optional[list[bytes]]
+    __fingerprint: Optional[bytes]
+
+    def __load_data(self) -> NoReturn:
+        if self.__data_loader is not None:
+            data_loader = self.__data_loader
+            self.__data_loader = None
+            self.__data_loader_num = None
+            for data in data_loader():
+                self.add_data(data)
+
+    def __create_data(self, records: Iterable[dict[str, object]] = ()) -> Union[list[dict[str, object]], RecordBuffer]:
+        return RecordBuffer(records) if self.__compact else list(records)
+
+    # The record can be passed to avoid decoding it again if the object store is compact.
+    def __get_primary_key(self, position: int, data: Optional[dict[str, object]] = None) -> Optional[tuple]:
+        if len(self.key_path) == 0:
+            # Records of object stores without a keyPath are restored with their position as key.
+            return to_hashable_key(position + 1)
+        key_path = self.key_path[0] if len(self.key_path) == 1 else self.key_path
+        key = evaluate_key_path(self.__data[position] if data is None else data, key_path)
+        return None if key is NO_KEY else to_hashable_key(key)
+
+    def __get_key(self, position: int) -> object:
+        if len(self.key_path) == 0:
+            return position + 1
+        key_path = self.key_path[0] if len(self.key_path) == 1 else self.key_path
+        key = evaluate_key_path(self.__data[position], key_path)
+        return None if key is NO_KEY else key
+
+    def __get_keys(self, index: Optional[str], position: int, data: Optional[dict[str, object]] = None) -> list[tuple]:
+        if index is None:
+            key = self.__get_primary_key(position, data)
+            return [] if key is None else [key]
+        return self.__get_index_keys(index, self.__data[position] if data is None else data)
+
+    def __get_hash_index(self, index: Optional[str]) -> dict[tuple, list[int]]:
+        if index not in self.__hash_indexes:
+            hash_index = {}
+            for position, data in enumerate(self.__data):
+                for key in self.__get_keys(index, position, data):
+                    hash_index.setdefault(key, []).append(position)
+            self.__hash_indexes[index] = hash_index
+        return self.__hash_indexes[index]
 
-    def __is_unique_value(self, index: str, value: Optional[object]) -> bool:
-        for entry in self.__data:
-            if value == entry[index]:
-                return False
-        return True
+    def __get_sorted_index(self, index: Optional[str]) -> tuple[list[tuple], list[int]]:
+        if index not in self.__sorted_indexes:
+            entries = []
+            for position, data in enumerate(self.__data):
+                # Records with the same index key are ordered by their primary key.
+                primary_key = self.__get_primary_key(position, data) if index is not None else None
+                for key in self.__get_keys(index, position, data):
+                    entries.append((key, (0, position) if primary_key is None else primary_key, position))
+            entries.sort()
+            self.__sorted_indexes[index] = ([entry[0] for entry in entries], [entry[2] for entry in entries])
+        return self.__sorted_indexes[index]
+
+    def __check_index(self, index: Optional[str]) -> NoReturn:
+        if index is not None and index not in self.__indices:
+            raise KeyError(f'Could not find index "{index}" in object store "{self.name}".')
+
+    def __get_index_keys(self, index: str, data: object) -> list[tuple]:
+        options = self.__indices[index]
+        # Older session files may not contain a keyPath for an index, fall back to the index name.
+        key_path = options['keyPath'] if options['keyPath'] is not None else index
+        key = evaluate_key_path(data, key_path)
+        if key is NO_KEY:
+            return []
+        if options['multiEntry'] and isinstance(key, list):
+            keys = (to_hashable_key(item) for item in key)
+            return list(dict.fromkeys(hashable for hashable in keys if hashable is not None))
+        hashable = to_hashable_key(key)
+        return [] if hashable is None else [hashable]
+
+    def __build_unique_map(self, index: str, records: Iterable[dict[str, object]]) -> dict[tuple, int]:
+        unique_map = {}
+        for position, entry in enumerate(records):
+            for key in self.__get_index_keys(index, entry):
+                if key in unique_map:
+                    raise ValueError(f'Cannot create unique index. Duplicate value for index: {index}')
+                unique_map[key] = position
+        return unique_map
 
     @staticmethod
-    def create_from_dict(os_dict: dict):
+    def create_from_dict(os_dict: dict, lazy: bool = False):
         required_keys = ['name', 'autoIncrement', 'keyPath', 'indices', 'data']
         for key in required_keys:
             if key not in os_dict.keys():
@@ -27,8 +136,37 @@ class IDBObjectStore:
         new_os = IDBObjectStore(os_dict['name'], os_dict['autoIncrement'], os_dict['keyPath'])
         for name, options in os_dict['indices'].items():
             new_os.create_index(name, options)
-        for data in os_dict['data']:
-            new_os.add_data(data)
+        if lazy:
+            new_os.set_data_loader(lambda: os_dict['data'], len(os_dict['data']))
+        else:
+            for data in os_dict['data']:
+                new_os.add_data(data)
+        return new_os
+
+    @staticmethod
+    def create_from_stream(reader: JsonStreamReader, compact: bool = False):
+        os_dict = {}
+        new_os = None
+        for key in reader.iter_object():
+            if key == 'data' and all(k in os_dict for k in ('name', 'autoIncrement', 'keyPath')):
+                new_os = IDBObjectStore(os_dict['name'], os_dict['autoIncrement'], os_dict['keyPath'])
+                new_os.set_compact(compact)
+                for name, options in os_dict.get('indices', {}).items():
+                    new_os.create_index(name, options)
+                # Records are added one by one, the decoded list is never held in memory.
+                for _ in reader.iter_array():
+                    new_os.add_data(reader.read_value())
+                os_dict[key] = None
+            elif key == 'indices' and new_os is not None:
+                os_dict[key] = reader.read_value()
+                for name, options in os_dict[key].items():
+                    new_os.create_index(name, options)
+            else:
+                os_dict[key] = reader.read_value()
+        _check_required_keys(os_dict.keys(), ['name', 'autoIncrement', 'keyPath', 'indices', 'data'])
+        if new_os is None:
+            new_os = IDBObjectStore.create_from_dict(os_dict)
+            new_os.set_compact(compact)
         return new_os
 
     def __init__(self, name: str, auto_increment: Optional[bool] = False,
@@ -36,7 +174,15 @@ class IDBObjectStore:
         self.name = name.strip()
         self.auto_increment = auto_increment
         self.__indices = {}
+        self.__unique_maps = {}
+        self.__hash_indexes = {}
+        self.__sorted_indexes = {}
+        self.__compact = False
         self.__data = []
+        self.__data_loader = None
+        self.__data_loader_num = None
+        self.__record_hashes = None
+        self.__fingerprint = None
         if isinstance(key_path, str):
             if len(key_path.strip()) > 0:
                 self.key_path = [key_path.strip()]
@@ -53,14 +199,29 @@ class IDBObjectStore:
                 raise ValueError('Can not create objectStore with autoInc if keyPath is empty.')
 
     def as_dict(self) -> dict:
+        self.__load_data()
         return {
             'name': self.name,
             'autoIncrement': self.auto_increment,
             'keyPath': self.key_path,
             'indices': self.__indices,
-            'data': self.__data
+            'data': list(self.__data) if self.__compact else self.__data
         }
 
+    def write_to_stream(self, writer: JsonStreamWriter) -> NoReturn:
+        self.__load_data()
+        writer.begin_object()
+        writer.item('name', self.name)
+        writer.item('autoIncrement', self.auto_increment)
+        writer.item('keyPath', self.key_path)
+        writer.item('indices', self.__indices)
+        writer.key('data')
+        writer.begin_array()
+        for data in self.__data:
+            writer.value(data)
+        writer.end_array()
+        writer.end_object()
+
     def create_index(self, name: str, options: Optional[dict[str, dict[str, object]]] = None) -> NoReturn:
         if options is None:
             options = {'unique': False}
@@ -73,18 +234,111 @@ class IDBObjectStore:
                 # TODO: Figure out what the default value for multiEntry is
                 options['multiEntry'] = False
             self.__indices[name.strip()] = options
+            self.__fingerprint = None
+            self.__hash_indexes.pop(name.strip(), None)
+            self.__sorted_indexes.pop(name.strip(), None)
+            if options['unique']:
+                self.__unique_maps[name.strip()] = self.__build_unique_map(name.strip(), self.__data)
         else:
             raise ValueError(f'Cannot create duplicate index: {name.strip()}')
 
     def add_data(self, data: dict[str, Optional[object]]) -> NoReturn:
-        for index, value in data.items():
-            if index in self.__indices.keys():
-                if self.__indices[index]['unique']:
-                    if not self.__is_unique_value(index, value):
-                        raise ValueError(f'Cannot insert data. Duplicate value for unique index: {index}')
+        self.__load_data()
+        unique_keys = {}
+        for index, unique_map in self.__unique_maps.items():
+            unique_keys[index] = self.__get_index_keys(index, data)
+            for key in unique_keys[index]:
+                if key in unique_map:
+                    raise ValueError(f'Cannot insert data. Duplicate value for unique index: {index}')
+        position = len(self.__data)
+        for index, keys in unique_keys.items():
+            for key in keys:
+                self.__unique_maps[index][key] = position
         self.__data.append(data)
+        if self.__record_hashes is not None:
+            self.__record_hashes.append(hash_value(data))
+        self.__fingerprint = None
+        for index, hash_index in self.__hash_indexes.items():
+            for key in self.__get_keys(index, position, data):
+                hash_index.setdefault(key, []).append(position)
+        self.__sorted_indexes.clear()
+
+    def apply_changes(self, put: Iterable[dict[str, object]], delete: Iterable[object] = ()) -> NoReturn:
+        """
+        Insert or replace records and delete records by their primary key, like put() and delete() of IndexedDB
+
+        All changes are applied at once, the indexes are only rebuilt once. The records stay ordered by primary key.
+
+        :param put: the records that should be inserted or replaced
+        :param delete: the primary keys of the records that should be deleted
+        """
+        if len(self.key_path) == 0:
+            raise ValueError(f'Cannot change records by key in object store without keyPath: {self.name}')
+        self.__load_data()
+        key_path = self.key_path[0] if len(self.key_path) == 1 else self.key_path
+        # hashable primary key -> (record, hash of the record if it is known)
+        records = {}
+        for position, data in enumerate(self.__data):
+            key = self.__get_primary_key(position, data)
+            record_hash = self.__record_hashes[position] if self.__record_hashes is not None else None
+            records[(0, position) if key is None else key] = (data, record_hash)
+        for key in delete:
+            records.pop(to_hashable_key(key), None)
+        for data in put:
+            key = evaluate_key_path(data, key_path)
+            hashable = None if key is NO_KEY else to_hashable_key(key)
+            if hashable is None:
+                raise ValueError(f'Cannot insert data. Invalid key for object store: {self.name}')
+            records[hashable] = (data, None)
+        sorted_records = [records[key] for key in sorted(records)]
+        # The object store is only changed after every unique index accepted the new records.
+        unique_maps = {index: self.__build_unique_map(index, (data for data, _ in sorted_records))
+                       for index in self.__unique_maps}
+        self.__data = self.__create_data(data for data, _ in sorted_records)
+        self.__unique_maps = unique_maps
+        if self.__record_hashes is not None:
+            self.__record_hashes = [record_hash if record_hash is not None else hash_value(data)
+                                    for data, record_hash in sorted_records]
+        self.__fingerprint = None
+        self.__hash_indexes.clear()
+        self.__sorted_indexes.clear()
+
+    def set_data_loader(self, data_loader: Callable[[], Iterable[dict[str, object]]],
+                        data_num: Optional[int] = None) -> NoReturn:
+        """
+        Defer decoding and indexing of records until they are accessed for the first time
+
+        :param data_loader: a function returning the records of this object store
+        :param data_num: the number of records returned by `data_loader` if it is known
+        """
+        self.__load_data()
+        self.__data_loader = data_loader
+        self.__data_loader_num = data_num
+
+    def is_loaded(self) -> bool:
+        return self.__data_loader is None
+
+    def set_compact(self, enabled: bool) -> NoReturn:
+        """
+        Store the records encoded in a single buffer instead of as Python objects
+
+        Compact object stores use a fraction of the memory but decode a record on every access. `get_data` returns a
+        read-only sequence and changing a returned record does not change the stored record.
+        Records that are not loaded yet are stored compactly when they are loaded.
+
+        :param enabled: `True` to store the records compactly, `False` to store them as Python objects
+        """
+        if enabled != self.__compact:
+            self.__compact = enabled
+            self.__data = self.__create_data(self.__data)
+
+    def is_compact(self) -> bool:
+        return self.__compact
 
     def get_data_num(self) -> int:
+        if self.__data_loader is not None and self.__data_loader_num is not None:
+            return len(self.__data) + self.__data_loader_num
+        self.__load_data()
         return len(self.__data)
 
     def get_indices_num(self) -> int:
@@ -93,25 +347,207 @@ class IDBObjectStore:
     def get_indices(self) -> dict[str, dict]:
         return self.__indices
 
-    def get_data(self) -> list[dict[str, object]]:
+    def get_data(self) -> Sequence[dict[str, object]]:
+        """
+        :return: the records in insertion order, a read-only :class:`RecordBuffer` if the object store is compact
+        """
+        self.__load_data()
         return self.__data
 
+    def get(self, key: Union[object, IDBKeyRange]) -> Optional[dict[str, object]]:
+        """
+        Get a record by its primary key
+
+        :param key: the primary key of the record or a key range
+
+        :return: the record or `None` if no record was found
+        """
+        return self.get_by_index(key, None)
+
+    def get_by_index(self, key: Union[object, IDBKeyRange], index: Optional[str]) -> Optional[dict[str, object]]:
+        """
+        Get the first record (ordered by primary key) with a matching key in the given index
+
+        :param key: the key that should be looked up or a key range
+        :param index: the name of the index or `None` to use the primary key
+
+        :return: the record or `None` if no record was found
+        """
+        self.__check_index(index)
+        self.__load_data()
+        if isinstance(key, IDBKeyRange):
+            return next(self.iterate(key, index), None)
+        hashable = to_hashable_key(key)
+        if hashable is None:
+            raise ValueError(f'Invalid key: {key}')
+        positions = self.__get_hash_index(index).get(hashable)
+        if not positions:
+            return None
+        if index is None or len(positions) == 1:
+            return self.__data[positions[0]]
+        return self.__data[min(positions, key=lambda position: self.__get_primary_key(position) or (0, position))]
+
+    def get_all_by_index(self, key: Optional[Union[object, IDBKeyRange]] = None,
+                         index: Optional[str] = None) -> list[dict[str, object]]:
+        """
+        Get all records with a matching key in the given index ordered by the index key
+
+        :param key: the key that should be looked up, a key range or `None` to get all records
+        :param index: the name of the index or `None` to use the primary key
+
+        :return: a list containing the matching records
+        """
+        if key is not None and not isinstance(key, IDBKeyRange):
+            key = IDBKeyRange.only(key)
+        return list(self.iterate(key, index))
+
+    def iterate(self, key_range: Optional[IDBKeyRange] = None, index: Optional[str] = None,
+                direction: str = 'next') -> Iterator[dict[str, object]]:
+        """
+        Iterate over the records in key order, like an IndexedDB cursor
+
+        :param key_range: only records with a key in this range are returned, `None` returns all records
+        :param index: the name of the index or `None` to use the primary key
+        :param direction: one of ``next``, ``nextunique``, ``prev`` or ``prevunique``
+
+        :return: an iterator over the matching records
+        """
+        if direction not in ('next', 'nextunique', 'prev', 'prevunique'):
+            raise ValueError(f'Invalid cursor direction: {direction}')
+        self.__check_index(index)
+        self.__load_data()
+        keys, positions = self.__get_sorted_index(index)
+        start, end = 0, len(keys)
+        if key_range is not None:
+            lower, upper = key_range.get_hashable_bounds()
+            if lower is not None:
+                start = (bisect.bisect_right if key_range.lower_open else bisect.bisect_left)(keys, lower)
+            if upper is not None:
+                end = (bisect.bisect_left if key_range.upper_open else bisect.bisect_right)(keys, upper)
+        if direction.startswith('next'):
+            selection = range(start, end)
+        else:
+            selection = range(end - 1, start - 1, -1)
+        last_key = None
+        for i in selection:
+            if direction.endswith('unique'):
+                if last_key is not None and keys[i] == last_key:
+                    continue
+                if direction == 'prevunique':
+                    # prevunique returns the first record (by primary key) of each key
+                    i = bisect.bisect_left(keys, keys[i], start, i + 1)
+                last_key = keys[i]
+            yield self.__data[positions[i]]
+
+    def count(self, key_range: Optional[Union[object, IDBKeyRange]] = None, index: Optional[str] = None) -> int:
+        if key_range is not None and not isinstance(key_range, IDBKeyRange):
+            key_range = IDBKeyRange.only(key_range)
+        return sum(1 for _ in self.iterate(key_range, index))
+
+    def __get_schema(self) -> dict:
+        return {'name': self.name, 'autoIncrement': self.auto_increment, 'keyPath': self.key_path,
+                'indices': self.__indices}
+
+    def __get_record_hashes(self) -> list[bytes]:
+        self.__load_data()
+        if self.__record_hashes is None:
+            self.__record_hashes = [hash_value(data) for data in self.__data]
+        return self.__record_hashes
+
+    def __get_keyed_record_hashes(self) -> dict[tuple, tuple[object, bytes]]:
+        # hashable primary key -> (primary key, hash of the record)
+        record_hashes = self.__get_record_hashes()
+        keyed_hashes = {}
+        for position, record_hash in enumerate(record_hashes):
+            key = self.__get_primary_key(position)
+            keyed_hashes[(0, position) if key is None else key] = (self.__get_key(position), record_hash)
+        return keyed_hashes
+
+    def get_fingerprint(self) -> str:
+        """
+        Get a hash of the schema and the records of the object store
+
+        Every record is hashed once, records added later only add their own hash.
+
+        :return: the hex digest
+        """
+        if self.__fingerprint is None:
+            self.__fingerprint = hash_digests([hash_value(self.__get_schema()),
+                                               hash_digests(self.__get_record_hashes())])
+        return self.__fingerprint.hex()
+
+    def diff(self, other: 'IDBObjectStore') -> dict:
+        """
+        Compare the object store with another version of it
+
+        :param other: the other version
+
+        :return: an empty dict if both contain the same data, otherwise a dict containing ``schema`` if the schemas
+                 differ and the primary keys of the records that were ``added``, ``removed`` or ``changed`` in `other`
+        """
+        if self.get_fingerprint() == other.get_fingerprint():
+            return {}
+        diff = {}
+        if self.__get_schema() != other.__get_schema():
+            diff['schema'] = True
+        own_hashes = self.__get_keyed_record_hashes()
+        other_hashes = other.__get_keyed_record_hashes()
+        added = [key for hashable, (key, _) in other_hashes.items() if hashable not in own_hashes]
+        removed = [key for hashable, (key, _) in own_hashes.items() if hashable not in other_hashes]
+        changed = [key for hashable, (key, record_hash) in other_hashes.items()
+                   if hashable in own_hashes and own_hashes[hashable][1] != record_hash]
+        for name, keys in (('added', added), ('removed', removed), ('changed', changed)):
+            if len(keys) > 0:
+                diff[name] = keys
+        return diff
+
 
 class IDBDatabase:
     name: str
     version: int
     __object_stores: dict[str, IDBObjectStore]
+    __object_store_loader: Optional[Callable[[], Iterable[IDBObjectStore]]]
+
+    def __load_object_stores(self) -> NoReturn:
+        if self.__object_store_loader is not None:
+            object_store_loader = self.__object_store_loader
+            self.__object_store_loader = None
+            for object_store in object_store_loader():
+                self.add_object_store(object_store)
 
     @staticmethod
-    def create_from_dict(db_dict: dict):
+    def create_from_dict(db_dict: dict, lazy: bool = False):
         required_keys = ['name', 'version', 'objectStores']
         for key in required_keys:
             if key not in db_dict.keys():
                 raise KeyError(f'Could not find key "{key}".\n'
                                f'Make sure the dictionary contains all required keys.')
         new_db = IDBDatabase(db_dict['name'], db_dict['version'])
-        for name, object_store in db_dict['objectStores'].items():
-            new_db.add_object_store(IDBObjectStore.create_from_dict(object_store))
+        if lazy:
+            new_db.set_object_store_loader(lambda: (
+                IDBObjectStore.create_from_dict(object_store, True)
+                for object_store in db_dict['objectStores'].values()
+            ))
+        else:
+            for name, object_store in db_dict['objectStores'].items():
+                new_db.add_object_store(IDBObjectStore.create_from_dict(object_store))
+        return new_db
+
+    @staticmethod
+    def create_from_stream(reader: JsonStreamReader, compact: bool = False):
+        db_dict = {}
+        object_stores = []
+        for key in reader.iter_object():
+            if key == 'objectStores':
+                for _ in reader.iter_object():
+                    object_stores.append(IDBObjectStore.create_from_stream(reader, compact))
+                db_dict[key] = None
+            else:
+                db_dict[key] = reader.read_value()
+        _check_required_keys(db_dict.keys(), ['name', 'version', 'objectStores'])
+        new_db = IDBDatabase(db_dict['name'], db_dict['version'])
+        for object_store in object_stores:
+            new_db.add_object_store(object_store)
         return new_db
 
     def __init__(self, name: str, version: Optional[int] = 1):
@@ -121,8 +557,10 @@ class IDBDatabase:
         else:
             raise ValueError('Version cannot be <= 0')
         self.__object_stores = {}
+        self.__object_store_loader = None
 
     def as_dict(self) -> dict:
+        self.__load_object_stores()
         db_dict = {
             'name': self.name,
             'version': self.version,
@@ -132,66 +570,223 @@ class IDBDatabase:
             db_dict['objectStores'][name] = object_store.as_dict()
         return db_dict
 
+    def write_to_stream(self, writer: JsonStreamWriter) -> NoReturn:
+        self.__load_object_stores()
+        writer.begin_object()
+        writer.item('name', self.name)
+        writer.item('version', self.version)
+        writer.key('objectStores')
+        writer.begin_object()
+        for name, object_store in self.__object_stores.items():
+            writer.key(name)
+            object_store.write_to_stream(writer)
+        writer.end_object()
+        writer.end_object()
+
     def add_object_store(self, object_store: IDBObjectStore) -> NoReturn:
+        self.__load_object_stores()
         if object_store.name not in self.__object_stores.keys():
             self.__object_stores[object_store.name] = object_store
         else:
             raise ValueError(f'Cannot add object store. Duplicate name: {object_store.name}')
 
+    def delete_object_store(self, name: str) -> NoReturn:
+        self.__load_object_stores()
+        if name not in self.__object_stores:
+            raise KeyError(f'Cannot delete object store. Object store does not exist: {name}')
+        del self.__object_stores[name]
+
+    def set_object_store_loader(self, object_store_loader: Callable[[], Iterable[IDBObjectStore]]) -> NoReturn:
+        self.__load_object_stores()
+        self.__object_store_loader = object_store_loader
+
     def get_object_store_num(self):
+        self.__load_object_stores()
         return len(self.__object_stores)
 
     def get_object_store(self, name: str) -> IDBObjectStore:
+        self.__load_object_stores()
         return self.__object_stores[name]
 
     def get_object_stores(self) -> list[IDBObjectStore]:
+        self.__load_object_stores()
         return list(self.__object_stores.values())
 
+    def set_compact(self, enabled: bool) -> NoReturn:
+        """
+        Call :meth:`IDBObjectStore.set_compact` on every object store of the database
+        """
+        for object_store in self.get_object_stores():
+            object_store.set_compact(enabled)
+
+    def get_fingerprint(self) -> str:
+        self.__load_object_stores()
+        return hash_digests([hash_value([self.name, self.version])] + [
+            bytes.fromhex(self.__object_stores[name].get_fingerprint()) for name in sorted(self.__object_stores)
+        ]).hex()
+
+    def diff(self, other: 'IDBDatabase') -> dict:
+        """
+        Compare the database with another version of it, only object stores with different fingerprints are compared
+
+        :param other: the other version
+
+        :return: an empty dict if both contain the same data, otherwise a dict containing the ``version`` change and
+                 the differences by object store name in ``objectStores``, either ``added``, ``removed`` or the
+                 result of :meth:`IDBObjectStore.diff`
+        """
+        if self.get_fingerprint() == other.get_fingerprint():
+            return {}
+        diff = {}
+        if self.version != other.version:
+            diff['version'] = [self.version, other.version]
+        own_stores = {object_store.name: object_store for object_store in self.get_object_stores()}
+        other_stores = {object_store.name: object_store for object_store in other.get_object_stores()}
+        store_diffs = {name: 'removed' for name in own_stores if name not in other_stores}
+        for name, object_store in other_stores.items():
+            if name not in own_stores:
+                store_diffs[name] = 'added'
+            elif own_stores[name].get_fingerprint() != object_store.get_fingerprint():
+                store_diffs[name] = own_stores[name].diff(object_store)
+        if len(store_diffs) > 0:
+            diff['objectStores'] = store_diffs
+        return diff
+
 
 class IndexedDB:
     __URL: str
     __databases: dict[str, IDBDatabase]
+    __db_loader: Optional[Callable[[], Iterable[IDBDatabase]]]
+
+    def __load_dbs(self) -> NoReturn:
+        if self.__db_loader is not None:
+            db_loader = self.__db_loader
+            self.__db_loader = None
+            for db in db_loader():
+                self.add_db(db)
 
     @staticmethod
-    def create_from_dict(idb_dict: dict):
+    def create_from_dict(idb_dict: dict, lazy: bool = False):
         required_keys = ['url', 'databases']
         for key in required_keys:
             if key not in idb_dict:
                 raise KeyError(f'Could not find key "{key}".\n'
                                f'Make sure the dictionary contains all required keys.')
         new_idb = IndexedDB(idb_dict['url'])
-        for name, database in idb_dict['databases'].items():
-            new_idb.add_db(IDBDatabase.create_from_dict(database))
+        if lazy:
+            new_idb.set_db_loader(lambda: (
+                IDBDatabase.create_from_dict(database, True) for database in idb_dict['databases'].values()
+            ))
+        else:
+            for name, database in idb_dict['databases'].items():
+                new_idb.add_db(IDBDatabase.create_from_dict(database))
+        return new_idb
+
+    @staticmethod
+    def create_from_stream(reader: JsonStreamReader, compact: bool = False):
+        idb_dict = {}
+        databases = []
+        for key in reader.iter_object():
+            if key == 'databases':
+                for _ in reader.iter_object():
+                    databases.append(IDBDatabase.create_from_stream(reader, compact))
+                idb_dict[key] = None
+            else:
+                idb_dict[key] = reader.read_value()
+        _check_required_keys(idb_dict.keys(), ['url', 'databases'])
+        new_idb = IndexedDB(idb_dict['url'])
+        for database in databases:
+            new_idb.add_db(database)
         return new_idb
 
     def __init__(self, url: str):
         self.__URL = url.strip()
         self.__databases = {}
+        self.__db_loader = None
 
     def as_dict(self) -> dict:
+        self.__load_dbs()
         idb_dict = {'url': self.__URL, 'databases': {}}
         for name, idb_db in self.__databases.items():
             idb_dict['databases'][name] = idb_db.as_dict()
         return idb_dict
 
+    def write_to_stream(self, writer: JsonStreamWriter) -> NoReturn:
+        self.__load_dbs()
+        writer.begin_object()
+        writer.item('url', self.__URL)
+        writer.key('databases')
+        writer.begin_object()
+        for name, idb_db in self.__databases.items():
+            writer.key(name)
+            idb_db.write_to_stream(writer)
+        writer.end_object()
+        writer.end_object()
+
     def get_url(self):
         return self.__URL
 
     def add_db(self, db: IDBDatabase) -> NoReturn:
+        self.__load_dbs()
         if db.name not in self.__databases.keys():
             self.__databases[db.name] = db
         else:
             raise ValueError(f'Cannot add db. Duplicate name: {db.name}')
 
+    def delete_db(self, name: str) -> NoReturn:
+        self.__load_dbs()
+        if name not in self.__databases:
+            raise KeyError(f'Cannot delete db. Database does not exist: {name}')
+        del self.__databases[name]
+
+    def set_db_loader(self, db_loader: Callable[[], Iterable[IDBDatabase]]) -> NoReturn:
+        self.__load_dbs()
+        self.__db_loader = db_loader
+
     def get_db_num(self):
+        self.__load_dbs()
         return len(self.__databases)
 
     def get_dbs(self) -> list[IDBDatabase]:
+        self.__load_dbs()
         return list(self.__databases.values())
 
+    def set_compact(self, enabled: bool) -> NoReturn:
+        """
+        Call :meth:`IDBObjectStore.set_compact` on every object store of every database
+        """
+        for idb_db in self.get_dbs():
+            idb_db.set_compact(enabled)
+
     def get_db(self, name: str) -> IDBDatabase:
+        self.__load_dbs()
         return self.__databases[name]
 
+    def get_fingerprint(self) -> str:
+        self.__load_dbs()
+        return hash_digests([hash_value(self.__URL)] + [
+            bytes.fromhex(self.__databases[name].get_fingerprint()) for name in sorted(self.__databases)
+        ]).hex()
+
+    def diff(self, other: 'IndexedDB') -> dict:
+        """
+        Compare the IndexedDB with another version of it, only databases with different fingerprints are compared
+
+        :param other: the other version
+
+        :return: a dict containing the differences by database name, either ``added``, ``removed`` or the result of
+                 :meth:`IDBDatabase.diff`
+        """
+        own_dbs = {idb_db.name: idb_db for idb_db in self.get_dbs()}
+        other_dbs = {idb_db.name: idb_db for idb_db in other.get_dbs()}
+        diff = {name: 'removed' for name in own_dbs if name not in other_dbs}
+        for name, idb_db in other_dbs.items():
+            if name not in own_dbs:
+                diff[name] = 'added'
+            elif own_dbs[name].get_fingerprint() != idb_db.get_fingerprint():
+                diff[name] = own_dbs[name].diff(idb_db)
+        return diff
+
 
 class SessionObject:
     __NAME: str
@@ -202,26 +797,167 @@ class SessionObject:
     cookies: dict[str, str]
     local_storage: dict[str, str]
     indexed_db: IndexedDB
+    capture_time: float
+    # metrics of the operation that captured the session, only set if metrics were collected
+    metrics: Optional[SessionMetrics]
+    # the binary container the records of a lazily loaded session are read from
+    __container: Optional[SessionContainerReader] = None
 
     @staticmethod
-    def create_from_file(path: str):
+    def create_from_file(path: str, stream: bool = False, lazy: bool = False, compact: bool = False):
+        """
+        Create a :class:`SessionObject` from a session file (JSON or binary container)
+
+        :param path: the path of the session file
+        :param stream: parse JSON files incrementally instead of decoding the whole file at once
+        :param lazy: only decode and index IndexedDB records when they are accessed for the first time, binary
+                     containers stay open until the session is saved or closed with `close`
+        :param compact: store IndexedDB records encoded, see :meth:`IDBObjectStore.set_compact`
+
+        :return: the loaded `SessionObject`
+        """
+        if stream and lazy:
+            raise ValueError('stream and lazy cannot be combined. Lazy loading decodes JSON files at once.')
         if os.path.isfile(path):
             required_keys = ['name', 'url', 'fileExt', 'cookies', 'localStorage', 'indexedDb']
-            with open(path, 'r') as file:
-                session_object = json.load(file)
+            if is_container(path):
+                new_session = SessionObject.__create_from_container(path, required_keys, lazy, compact)
+            elif stream:
+                new_session = SessionObject.__create_from_stream(path, required_keys, compact)
+            else:
+                new_session = SessionObject.__create_from_json(path, required_keys, lazy)
+            # Changes saved incrementally are stored in a journal next to the file.
+            new_session.__apply_journal(path)
+            if compact:
+                new_session.indexed_db.set_compact(True)
+            return new_session
+        else:
+            raise FileNotFoundError(f'Could not find "{path}". No new session object can be created.')
+
+    @staticmethod
+    def __create_from_json(path: str, required_keys: list[str], lazy: bool):
+        with open(path, 'r') as file:
+            session_object = json.load(file)
+
+        for key in required_keys:
+            if key not in session_object.keys():
+                raise KeyError(f'Could not find key "{key}" in "{path}".\n'
+                               f'Make sure the session file contains all required keys.')
+
+        new_session = SessionObject(
+            session_object['name'], session_object['url'], session_object['fileExt'],
+            session_object['cookies'], session_object['localStorage'],
+            IndexedDB.create_from_dict(session_object['indexedDb'], lazy)
+        )
+        new_session.__restore_header(session_object.get('header'), path)
+        return new_session
 
-            for key in required_keys:
-                if key not in session_object.keys():
-                    raise KeyError(f'Could not find key "{key}" in "{path}".\n'
-                                   f'Make sure the session file contains all required keys.')
+    @staticmethod
+    def __create_from_stream(path: str, required_keys: list[str], compact: bool):
+        session_object = {}
+        with open(path, 'r') as file:
+            reader = JsonStreamReader(file)
+            for key in reader.iter_object():
+                if key == 'indexedDb':
+                    session_object[key] = IndexedDB.create_from_stream(reader, compact)
+                else:
+                    session_object[key] = reader.read_value()
+        _check_required_keys(session_object.keys(), required_keys, path)
+        new_session = SessionObject(
+            session_object['name'], session_object['url'], session_object['fileExt'],
+            session_object['cookies'], session_object['localStorage'], session_object['indexedDb']
+        )
+        new_session.__restore_header(session_object.get('header'), path)
+        return new_session
 
-            return SessionObject(
+    @staticmethod
+    def __create_from_container(path: str, required_keys: list[str], lazy: bool, compact: bool):
+        container = SessionContainerReader(path)
+        try:
+            _check_required_keys(container.get_section_names(), ['header', 'cookies', 'localStorage', 'indexedDb'],
+                                 path)
+            session_object = container.read_json_section('header')
+            session_object['cookies'] = container.read_json_section('cookies')
+            session_object['localStorage'] = container.read_json_section('localStorage')
+            # The schema is small, the records of every object store stay compressed until they are accessed.
+            idb_dict = container.read_json_section('indexedDb')
+            indexed_db = IndexedDB(idb_dict['url'])
+            for db_dict in idb_dict['databases'].values():
+                idb_db = IDBDatabase(db_dict['name'], db_dict['version'])
+                for os_dict in db_dict['objectStores'].values():
+                    object_store = IDBObjectStore(os_dict['name'], os_dict['autoIncrement'], os_dict['keyPath'])
+                    object_store.set_compact(compact)
+                    for name, options in os_dict['indices'].items():
+                        object_store.create_index(name, options)
+                    object_store.set_data_loader(
+                        lambda section=os_dict['section']: container.read_json_section(section), os_dict.get('dataNum')
+                    )
+                    idb_db.add_object_store(object_store)
+                indexed_db.add_db(idb_db)
+            session_object['indexedDb'] = indexed_db
+            if not lazy:
+                for idb_db in indexed_db.get_dbs():
+                    for object_store in idb_db.get_object_stores():
+                        object_store.get_data()
+                container.close()
+            _check_required_keys(session_object.keys(), required_keys, path)
+            new_session = SessionObject(
                 session_object['name'], session_object['url'], session_object['fileExt'],
-                session_object['cookies'], session_object['localStorage'],
-                IndexedDB.create_from_dict(session_object['indexedDb'])
+                session_object['cookies'], session_object['localStorage'], session_object['indexedDb']
             )
-        else:
-            raise FileNotFoundError(f'Could not find "{path}". No new session object can be created.')
+        except Exception:
+            container.close()
+            raise
+        if lazy:
+            new_session.__container = container
+        new_session.__restore_header(session_object, path)
+        return new_session
+
+    @staticmethod
+    def read_header(path: str) -> Optional[dict]:
+        """
+        Read the metadata header of a session file without parsing the rest of the file
+
+        :param path: the path of the session file
+
+        :return: the header or `None` if the file was created before headers were introduced
+        """
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f'Could not find "{path}".')
+        if is_container(path):
+            with SessionContainerReader(path) as container:
+                header = container.read_json_section('header')
+            return header if 'captureTime' in header else None
+        with open(path, 'r') as file:
+            reader = JsonStreamReader(file, 4096)
+            # The header is always the first member of the root object.
+            for key in reader.iter_object():
+                if key == 'header':
+                    return reader.read_value()
+                return None
+        return None
+
+    @classmethod
+    def peek(cls, path: str) -> dict:
+        """
+        Get the metadata of a session file
+
+        Only the header is read. Older files without a header are loaded lazily with `create_from_file` of the class
+        `peek` is called on, so subclasses get their own session info.
+
+        :param path: the path of the session file
+
+        :return: a dict containing the name, url, file extension, capture time, session info,
+                 the number of records per object store and the size of the session data
+        """
+        header = cls.read_header(path)
+        journal = SessionJournal(path)
+        if header is None or journal.exists():
+            # The header does not know about changes in the journal.
+            with cls.create_from_file(path, lazy=True) as session:
+                header = session.get_header()
+            header['dataSize'] = os.path.getsize(path) + journal.get_size()
+        return header
 
     @staticmethod
     def is_valid_session(param, param1, param2):
@@ -247,20 +983,230 @@ class SessionObject:
             self.indexed_db = indexed_db
         else:
             self.indexed_db = IndexedDB(self.__URL)
+        self.capture_time = time.time()
+        self.metrics = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> NoReturn:
+        """
+        Release the session file of a lazily loaded session, records that were not loaded yet cannot be loaded anymore
+        """
+        if self.__container is not None:
+            self.__container.close()
+            self.__container = None
+
+    def __load_from_container(self) -> NoReturn:
+        # Saving can overwrite the container, every record has to be read from it before.
+        if self.__container is not None:
+            for idb_db in self.indexed_db.get_dbs():
+                for object_store in idb_db.get_object_stores():
+                    object_store.get_data()
+            self.close()
+
+    def __apply_record_changes(self, changes: dict[tuple[str, str], list[dict]]) -> NoReturn:
+        for (db_name, store_name), ops in changes.items():
+            object_store = self.indexed_db.get_db(db_name).get_object_store(store_name)
+            key_path = object_store.key_path[0] if len(object_store.key_path) == 1 else object_store.key_path
+            # Only the last operation of every key has an effect.
+            latest_ops = {}
+            for op in ops:
+                key = op['key'] if op['op'] == 'delete' else evaluate_key_path(op['value'], key_path)
+                latest_ops[to_hashable_key(key) if key is not NO_KEY else None] = op
+            object_store.apply_changes([op['value'] for op in latest_ops.values() if op['op'] == 'put'],
+                                       [op['key'] for op in latest_ops.values() if op['op'] == 'delete'])
+        changes.clear()
+
+    def __apply_journal(self, path: str) -> NoReturn:
+        journal = SessionJournal(path)
+        if not journal.exists():
+            return
+        # Record changes are collected per object store, so the indexes of a store are only rebuilt once.
+        changes = {}
+        for op in journal.read():
+            if op['op'] in ('put', 'delete'):
+                changes.setdefault((op['db'], op['store']), []).append(op)
+                continue
+            self.__apply_record_changes(changes)
+            if op['op'] == 'cookies':
+                self.cookies = op['value']
+            elif op['op'] == 'localStorage':
+                self.local_storage = op['value']
+            elif op['op'] == 'deleteDb':
+                self.indexed_db.delete_db(op['db'])
+            elif op['op'] == 'db':
+                if op['db'] in (idb_db.name for idb_db in self.indexed_db.get_dbs()):
+                    self.indexed_db.get_db(op['db']).version = op['version']
+                else:
+                    self.indexed_db.add_db(IDBDatabase(op['db'], op['version']))
+            elif op['op'] == 'deleteStore':
+                self.indexed_db.get_db(op['db']).delete_object_store(op['store'])
+            elif op['op'] == 'store':
+                idb_db = self.indexed_db.get_db(op['db'])
+                if op['store'] in (object_store.name for object_store in idb_db.get_object_stores()):
+                    idb_db.delete_object_store(op['store'])
+                idb_db.add_object_store(IDBObjectStore.create_from_dict(dict(op['schema'], data=op['data'])))
+            elif op['op'] == 'commit':
+                if op.get('captureTime') is not None:
+                    self.capture_time = op['captureTime']
+            else:
+                raise ValueError(f'Unknown journal operation in "{journal.get_path()}": {op["op"]}')
+        self.__apply_record_changes(changes)
+
+    def __restore_header(self, header: Optional[dict], path: str) -> NoReturn:
+        if header is not None and 'captureTime' in header:
+            self.capture_time = header['captureTime']
+        else:
+            self.capture_time = os.path.getmtime(path)
+
+    def get_session_info(self) -> dict:
+        """
+        Get additional information about the session that should be stored in the header of session files
+
+        :return: a dict containing JSON serializable values
+        """
+        return {}
 
-    def save_to_file(self, path: str):
-        session_object = {
+    def get_readiness_probe(self) -> ReadinessProbe:
+        """
+        Get the condition that tells when the website finished loading after a login
+
+        :return: a probe that waits for a visible ``h1`` element, subclasses should use a faster probe
+        """
+        return SelectorProbe('h1')
+
+    def get_header(self) -> dict:
+        data_num = {}
+        for idb_db in self.indexed_db.get_dbs():
+            data_num[idb_db.name] = {}
+            for object_store in idb_db.get_object_stores():
+                data_num[idb_db.name][object_store.name] = object_store.get_data_num()
+        return {
             'name': self.__NAME,
             'url': self.__URL,
             'fileExt': self.__FILE_EXT,
-            'cookies': self.cookies,
-            'localStorage': self.local_storage,
-            'indexedDb': self.indexed_db.as_dict()
+            'captureTime': self.capture_time,
+            'sessionInfo': self.get_session_info(),
+            'dataNum': data_num
         }
+
+    def save_to_file(self, path: str, stream: bool = False, binary: bool = False, codec: str = 'zlib',
+                     incremental: bool = False, compact_threshold: float = 0.5):
+        """
+        Save the session to a file
+
+        :param path: the path of the session file, the file extension is added if it is missing
+        :param stream: write the JSON file incrementally instead of encoding the whole session at once
+        :param binary: write a binary container instead of a JSON file
+        :param codec: the compression codec of the binary container
+        :param incremental: if the file already exists, only append the changes since the last save to its journal
+                            (``<path>.journal``), the format of the existing file is kept
+        :param compact_threshold: the journal is merged into a new file once it is larger than this fraction of the
+                                  file
+        """
         if not path.endswith(self.__FILE_EXT):
             path = path + '.' + self.__FILE_EXT
+        self.__load_from_container()
+        if incremental and os.path.isfile(path):
+            if self.__save_to_journal(path, compact_threshold):
+                return
+            binary = is_container(path)
+        if binary:
+            self.__save_to_container(path, codec)
+        else:
+            self.__save_to_json(path, stream)
+        # A new file contains all changes of the old journal.
+        SessionJournal(path).remove()
+
+    def __save_to_journal(self, path: str, compact_threshold: float) -> bool:
+        journal = SessionJournal(path)
+        with SessionObject.create_from_file(path, lazy=True) as saved_session:
+            ops = diff_sessions(saved_session, self)
+        if len(ops) > 0:
+            journal.append(ops, self.capture_time)
+        return journal.get_size() <= compact_threshold * os.path.getsize(path)
+
+    def __save_to_json(self, path: str, stream: bool) -> NoReturn:
         with open(path, 'w') as file:
-            json.dump(session_object, file, indent=2)
+            writer = JsonStreamWriter(file)
+            writer.begin_object()
+            # The header is written first and patched at the end, readers can get it without parsing the file.
+            header = self.get_header()
+            header['dataSize'] = 0
+            header_length = len(json.dumps(header)) + 20
+            writer.key('header')
+            header_position = writer.placeholder(header_length)
+            data_start = file.tell()
+            writer.item('name', self.__NAME)
+            writer.item('url', self.__URL)
+            writer.item('fileExt', self.__FILE_EXT)
+            writer.item('cookies', self.cookies, not stream)
+            writer.item('localStorage', self.local_storage, not stream)
+            if stream:
+                writer.key('indexedDb')
+                self.indexed_db.write_to_stream(writer)
+            else:
+                writer.item('indexedDb', self.indexed_db.as_dict(), True)
+            writer.end_object()
+            header['dataSize'] = file.tell() - data_start
+            writer.fill_placeholder(header_position, header_length, header)
+
+    def __save_to_container(self, path: str, codec: str) -> NoReturn:
+        with open(path, 'wb') as file:
+            container = SessionContainerWriter(file, codec)
+            container.add_json_section('cookies', self.cookies)
+            container.add_json_section('localStorage', self.local_storage)
+            # Every object store gets its own section, the schema references them by name.
+            idb_dict = {'url': self.indexed_db.get_url(), 'databases': {}}
+            for db_num, idb_db in enumerate(self.indexed_db.get_dbs()):
+                db_dict = {'name': idb_db.name, 'version': idb_db.version, 'objectStores': {}}
+                for os_num, object_store in enumerate(idb_db.get_object_stores()):
+                    section = f'objectStore/{db_num}/{os_num}'
+                    container.add_json_section(section, list(object_store.get_data()))
+                    os_dict = object_store.as_dict()
+                    del os_dict['data']
+                    os_dict['section'] = section
+                    os_dict['dataNum'] = object_store.get_data_num()
+                    db_dict['objectStores'][object_store.name] = os_dict
+                idb_dict['databases'][idb_db.name] = db_dict
+            container.add_json_section('indexedDb', idb_dict)
+            header = self.get_header()
+            header['dataSize'] = container.get_raw_size()
+            container.add_json_section('header', header)
+            container.close()
+
+    def get_fingerprint(self) -> str:
+        """
+        Get a hash of the session data, the capture time is not part of it
+
+        :return: the hex digest
+        """
+        return hash_digests([hash_value([self.__NAME, self.__URL, self.cookies, self.local_storage]),
+                             bytes.fromhex(self.indexed_db.get_fingerprint())]).hex()
+
+    def diff(self, other: 'SessionObject') -> dict:
+        """
+        Compare the session with another version of it
+
+        Only the parts of the IndexedDB tree with different fingerprints are compared.
+
+        :param other: the other version
+
+        :return: an empty dict if both contain the same data, otherwise a dict containing ``cookies`` and
+                 ``localStorage`` if they differ and the result of :meth:`IndexedDB.diff` in ``indexedDb``
+        """
+        diff = {}
+        if hash_value(self.cookies) != hash_value(other.cookies):
+            diff['cookies'] = True
+        if hash_value(self.local_storage) != hash_value(other.local_storage):
+            diff['localStorage'] = True
+        if self.indexed_db.get_fingerprint() != other.indexed_db.get_fingerprint():
+            diff['indexedDb'] = self.indexed_db.diff(other.indexed_db)
+        return diff
 
     def get_name(self):
         return self.__NAME
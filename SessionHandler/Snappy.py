@@ -0,0 +1,100 @@
+import struct
+
+from SessionHandler.Varint import read_varint
+
+# https://github.com/google/snappy/blob/main/format_description.txt
+# https://github.com/google/snappy/blob/main/framing_format.txt
+_FRAME_STREAM_IDENTIFIER = 0xff
+_FRAME_COMPRESSED = 0x00
+_FRAME_UNCOMPRESSED = 0x01
+_FRAME_STREAM_MAGIC = b'sNaPpY'
+
+
+def get_uncompressed_length(data: bytes) -> int:
+    return read_varint(data, 0)[0]
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Decompress a raw snappy block
+
+    :param data: the compressed block
+    :return: the uncompressed data
+    """
+    length, pos = read_varint(data, 0)
+    out = bytearray()
+    end = len(data)
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        element_type = tag & 0x03
+        if element_type == 0:
+            literal_length = tag >> 2
+            if literal_length >= 60:
+                size = literal_length - 59
+                literal_length = int.from_bytes(data[pos:pos + size], 'little')
+                pos += size
+            literal_length += 1
+            if pos + literal_length > end:
+                raise ValueError('Invalid snappy data: literal exceeds the input.')
+            out += data[pos:pos + literal_length]
+            pos += literal_length
+            continue
+        if element_type == 1:
+            copy_length = ((tag >> 2) & 0x07) + 4
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif element_type == 2:
+            copy_length = (tag >> 2) + 1
+            offset, = struct.unpack_from('<H', data, pos)
+            pos += 2
+        else:
+            copy_length = (tag >> 2) + 1
+            offset, = struct.unpack_from('<I', data, pos)
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise ValueError('Invalid snappy data: copy offset is out of range.')
+        start = len(out) - offset
+        if copy_length <= offset:
+            out += out[start:start + copy_length]
+        else:
+            # The copy overlaps its own output, the last `offset` bytes are repeated.
+            pattern = out[start:]
+            repeats, rest = divmod(copy_length, offset)
+            out += pattern * repeats + pattern[:rest]
+    if len(out) != length:
+        raise ValueError(f'Invalid snappy data: expected {length} bytes but got {len(out)}.')
+    return bytes(out)
+
+
+def decompress_framed(data: bytes) -> bytes:
+    """
+    Decompress data in the snappy framing format
+
+    The CRC-32C checksums of the chunks are not verified.
+
+    :param data: the framed stream
+    :return: the uncompressed data
+    """
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        if pos + 4 > len(data):
+            raise ValueError('Invalid snappy stream: truncated chunk header.')
+        chunk_type = data[pos]
+        chunk_length = int.from_bytes(data[pos + 1:pos + 4], 'little')
+        pos += 4
+        chunk = data[pos:pos + chunk_length]
+        if len(chunk) != chunk_length:
+            raise ValueError('Invalid snappy stream: truncated chunk.')
+        pos += chunk_length
+        if chunk_type == _FRAME_STREAM_IDENTIFIER:
+            if chunk != _FRAME_STREAM_MAGIC:
+                raise ValueError('Invalid snappy stream: unknown stream identifier.')
+        elif chunk_type == _FRAME_COMPRESSED:
+            out += decompress(chunk[4:])
+        elif chunk_type == _FRAME_UNCOMPRESSED:
+            out += chunk[4:]
+        elif chunk_type < 0x80:
+            raise ValueError(f'Invalid snappy stream: unskippable chunk type {chunk_type:#x}.')
+    return bytes(out)
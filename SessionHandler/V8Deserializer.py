@@ -0,0 +1,339 @@
+import struct
+from typing import NoReturn
+
+from SessionHandler.JsValue import UNDEFINED, to_json_number, to_json_date, typed_array_to_json, is_array_index, \
+    order_properties
+from SessionHandler.LevelDB import read_varint
+
+# v8/src/objects/value-serializer.cc
+_TAG_VERSION = 0xFF
+_TAG_PADDING = 0x00
+_TAG_VERIFY_OBJECT_COUNT = ord('?')
+_TAG_THE_HOLE = ord('-')
+_TAG_UNDEFINED = ord('_')
+_TAG_NULL = ord('0')
+_TAG_TRUE = ord('T')
+_TAG_FALSE = ord('F')
+_TAG_INT32 = ord('I')
+_TAG_UINT32 = ord('U')
+_TAG_DOUBLE = ord('N')
+_TAG_BIGINT = ord('Z')
+_TAG_UTF8_STRING = ord('S')
+_TAG_ONE_BYTE_STRING = ord('"')
+_TAG_TWO_BYTE_STRING = ord('c')
+_TAG_OBJECT_REFERENCE = ord('^')
+_TAG_BEGIN_JS_OBJECT = ord('o')
+_TAG_END_JS_OBJECT = ord('{')
+_TAG_BEGIN_SPARSE_JS_ARRAY = ord('a')
+_TAG_END_SPARSE_JS_ARRAY = ord('@')
+_TAG_BEGIN_DENSE_JS_ARRAY = ord('A')
+_TAG_END_DENSE_JS_ARRAY = ord('$')
+_TAG_DATE = ord('D')
+_TAG_TRUE_OBJECT = ord('y')
+_TAG_FALSE_OBJECT = ord('x')
+_TAG_NUMBER_OBJECT = ord('n')
+_TAG_BIGINT_OBJECT = ord('z')
+_TAG_STRING_OBJECT = ord('s')
+_TAG_REGEXP = ord('R')
+_TAG_BEGIN_JS_MAP = ord(';')
+_TAG_END_JS_MAP = ord(':')
+_TAG_BEGIN_JS_SET = ord('\'')
+_TAG_END_JS_SET = ord(',')
+_TAG_ARRAY_BUFFER = ord('B')
+_TAG_RESIZABLE_ARRAY_BUFFER = ord('~')
+_TAG_ARRAY_BUFFER_VIEW = ord('V')
+_TAG_HOST_OBJECT = ord('\\')
+# element formats of the typed arrays by subtag, None for DataView
+_ARRAY_BUFFER_VIEW_FORMATS = {
+    ord('b'): 'b', ord('B'): 'B', ord('C'): 'B', ord('w'): 'h', ord('W'): 'H', ord('d'): 'i', ord('D'): 'I',
+    ord('h'): 'e', ord('f'): 'f', ord('F'): 'd', ord('q'): 'q', ord('Q'): 'Q', ord('?'): None
+}
+
+# third_party/blink/renderer/bindings/core/v8/serialization/serialization_tag.h
+_BLINK_TAG_TRAILER_OFFSET = 0xFE
+_BLINK_TAG_BLOB = ord('b')
+_BLINK_TAG_BLOB_INDEX = ord('i')
+_BLINK_TAG_FILE_INDEX = ord('e')
+_BLINK_TAG_FILE_LIST_INDEX = ord('L')
+_BLINK_TAG_CRYPTO_KEY = ord('K')
+# third_party/blink/renderer/bindings/modules/v8/serialization/web_crypto_sub_tags.h
+_CRYPTO_AES_KEY = 1
+_CRYPTO_HMAC_KEY = 2
+_CRYPTO_RSA_HASHED_KEY = 4
+_CRYPTO_EC_KEY = 5
+_CRYPTO_NO_PARAMS_KEY = 6
+_CRYPTO_ED25519_KEY = 7
+_CRYPTO_X25519_KEY = 8
+
+
+class V8Deserializer:
+    """
+    Decode values serialized by Blink and V8 into the values JSON.stringify would produce in the browser
+    """
+    __data: bytes
+    __pos: int
+    __version: int
+    # object id -> decoded object, object references point into this dict
+    __objects: dict[int, object]
+    __next_id: int
+    # id of the dict that represents an ArrayBuffer -> contents of the buffer
+    __buffers: dict[int, bytes]
+
+    def __init__(self, data: bytes):
+        self.__data = data
+        self.__pos = 0
+        self.__version = 0
+        self.__objects = {}
+        self.__next_id = 0
+        self.__buffers = {}
+
+    def __read_byte(self) -> int:
+        if self.__pos >= len(self.__data):
+            raise ValueError('Invalid V8 data: unexpected end of data.')
+        self.__pos += 1
+        return self.__data[self.__pos - 1]
+
+    def __read_varint(self) -> int:
+        value, self.__pos = read_varint(self.__data, self.__pos)
+        return value
+
+    def __read_zigzag(self) -> int:
+        value = self.__read_varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def __read_bytes(self, length: int) -> bytes:
+        if self.__pos + length > len(self.__data):
+            raise ValueError('Invalid V8 data: unexpected end of data.')
+        self.__pos += length
+        return self.__data[self.__pos - length:self.__pos]
+
+    def __read_double(self) -> float:
+        return struct.unpack('<d', self.__read_bytes(8))[0]
+
+    def __read_bigint(self) -> int:
+        bitfield = self.__read_varint()
+        value = int.from_bytes(self.__read_bytes(bitfield >> 1), 'little')
+        return -value if bitfield & 1 else value
+
+    def __peek_tag(self) -> int:
+        while self.__pos < len(self.__data) and self.__data[self.__pos] == _TAG_PADDING:
+            self.__pos += 1
+        if self.__pos >= len(self.__data):
+            raise ValueError('Invalid V8 data: unexpected end of data.')
+        return self.__data[self.__pos]
+
+    def __read_tag(self) -> int:
+        tag = self.__peek_tag()
+        self.__pos += 1
+        return tag
+
+    def __add_object(self, value: object) -> object:
+        self.__objects[self.__next_id] = value
+        self.__next_id += 1
+        return value
+
+    def __read_string_value(self, tag: int) -> str:
+        if tag == _TAG_ONE_BYTE_STRING:
+            return self.__read_bytes(self.__read_varint()).decode('latin-1')
+        if tag == _TAG_TWO_BYTE_STRING:
+            return self.__read_bytes(self.__read_varint()).decode('utf-16-le', 'surrogatepass')
+        if tag == _TAG_UTF8_STRING:
+            return self.__read_bytes(self.__read_varint()).decode('utf-8', 'replace')
+        raise ValueError(f'Invalid V8 data: expected a string but found tag {tag:#x}.')
+
+    def __read_properties(self, properties: dict[str, object], end_tag: int) -> dict[str, object]:
+        while self.__peek_tag() != end_tag:
+            key = self.__read_object()
+            if isinstance(key, float):
+                key = to_json_number(key)
+            value = self.__read_object()
+            if value is not UNDEFINED:
+                properties[str(key)] = value
+        self.__read_tag()
+        self.__read_varint()
+        return properties
+
+    def __read_array_buffer_view(self, buffer: bytes) -> dict:
+        subtag = self.__read_byte()
+        byte_offset = self.__read_varint()
+        byte_length = self.__read_varint()
+        if self.__version >= 14:
+            self.__read_varint()
+        if subtag not in _ARRAY_BUFFER_VIEW_FORMATS:
+            raise ValueError(f'Invalid V8 data: unknown ArrayBufferView type {subtag:#x}.')
+        element_format = _ARRAY_BUFFER_VIEW_FORMATS[subtag]
+        if element_format is None:
+            return self.__add_object({})
+        if byte_offset + byte_length > len(buffer):
+            raise ValueError('Invalid V8 data: ArrayBufferView exceeds its ArrayBuffer.')
+        element_num = byte_length // struct.calcsize('<' + element_format)
+        elements = struct.unpack_from(f'<{element_num}{element_format}', buffer, byte_offset)
+        return self.__add_object(typed_array_to_json(elements))
+
+    def __read_crypto_key(self) -> dict:
+        # The key material is skipped, JSON.stringify turns a CryptoKey into an empty object.
+        key_type = self.__read_byte()
+        if key_type == _CRYPTO_AES_KEY:
+            self.__read_byte()
+            self.__read_varint()
+        elif key_type == _CRYPTO_HMAC_KEY:
+            self.__read_varint()
+            self.__read_byte()
+        elif key_type == _CRYPTO_RSA_HASHED_KEY:
+            self.__read_byte()
+            self.__read_byte()
+            self.__read_varint()
+            self.__read_bytes(self.__read_varint())
+            self.__read_byte()
+        elif key_type == _CRYPTO_EC_KEY:
+            self.__read_byte()
+            self.__read_byte()
+            self.__read_byte()
+        elif key_type == _CRYPTO_NO_PARAMS_KEY:
+            self.__read_byte()
+        elif key_type == _CRYPTO_ED25519_KEY or key_type == _CRYPTO_X25519_KEY:
+            self.__read_byte()
+        else:
+            raise ValueError(f'Unsupported CryptoKey type: {key_type}')
+        self.__read_varint()
+        self.__read_bytes(self.__read_varint())
+        return self.__add_object({})
+
+    def __read_host_object(self) -> object:
+        tag = self.__read_byte()
+        if tag == _BLINK_TAG_CRYPTO_KEY:
+            return self.__read_crypto_key()
+        # Blobs and files only reference their contents, JSON.stringify turns them into empty objects.
+        if tag == _BLINK_TAG_BLOB:
+            self.__read_bytes(self.__read_varint())
+            self.__read_bytes(self.__read_varint())
+            self.__read_varint()
+            return self.__add_object({})
+        if tag == _BLINK_TAG_BLOB_INDEX or tag == _BLINK_TAG_FILE_INDEX:
+            self.__read_varint()
+            return self.__add_object({})
+        if tag == _BLINK_TAG_FILE_LIST_INDEX:
+            for _ in range(self.__read_varint()):
+                self.__read_varint()
+            return self.__add_object({})
+        raise ValueError(f'Unsupported Blink host object: {chr(tag)!r}')
+
+    def __read_object(self) -> object:
+        value = self.__read_object_internal()
+        # A view consumes the ArrayBuffer in front of it.
+        if id(value) in self.__buffers and self.__pos < len(self.__data) and \
+                self.__peek_tag() == _TAG_ARRAY_BUFFER_VIEW:
+            self.__read_tag()
+            return self.__read_array_buffer_view(self.__buffers[id(value)])
+        return value
+
+    def __read_object_internal(self) -> object:
+        tag = self.__read_tag()
+        if tag == _TAG_VERIFY_OBJECT_COUNT:
+            self.__read_varint()
+            return self.__read_object_internal()
+        if tag == _TAG_UNDEFINED:
+            return UNDEFINED
+        if tag == _TAG_NULL:
+            return None
+        if tag == _TAG_TRUE:
+            return True
+        if tag == _TAG_FALSE:
+            return False
+        if tag == _TAG_INT32:
+            return self.__read_zigzag()
+        if tag == _TAG_UINT32:
+            return self.__read_varint()
+        if tag == _TAG_DOUBLE:
+            return to_json_number(self.__read_double())
+        if tag == _TAG_BIGINT:
+            return self.__read_bigint()
+        if tag in (_TAG_ONE_BYTE_STRING, _TAG_TWO_BYTE_STRING, _TAG_UTF8_STRING):
+            return self.__read_string_value(tag)
+        if tag == _TAG_OBJECT_REFERENCE:
+            object_id = self.__read_varint()
+            if object_id not in self.__objects:
+                raise ValueError('Invalid V8 data: invalid object reference.')
+            return self.__objects[object_id]
+        if tag == _TAG_BEGIN_JS_OBJECT:
+            value = self.__add_object({})
+            self.__read_properties(value, _TAG_END_JS_OBJECT)
+            order_properties(value)
+            return value
+        if tag == _TAG_BEGIN_DENSE_JS_ARRAY:
+            value = self.__add_object([None] * self.__read_varint())
+            for i in range(len(value)):
+                if self.__peek_tag() == _TAG_THE_HOLE:
+                    self.__read_tag()
+                    continue
+                element = self.__read_object()
+                value[i] = None if element is UNDEFINED else element
+            self.__read_array_properties(value, _TAG_END_DENSE_JS_ARRAY)
+            return value
+        if tag == _TAG_BEGIN_SPARSE_JS_ARRAY:
+            value = self.__add_object([None] * self.__read_varint())
+            self.__read_array_properties(value, _TAG_END_SPARSE_JS_ARRAY)
+            return value
+        if tag == _TAG_DATE:
+            return self.__add_object(to_json_date(self.__read_double()))
+        if tag == _TAG_TRUE_OBJECT:
+            return self.__add_object(True)
+        if tag == _TAG_FALSE_OBJECT:
+            return self.__add_object(False)
+        if tag == _TAG_NUMBER_OBJECT:
+            return self.__add_object(to_json_number(self.__read_double()))
+        if tag == _TAG_BIGINT_OBJECT:
+            return self.__add_object(self.__read_bigint())
+        if tag == _TAG_STRING_OBJECT:
+            return self.__add_object(self.__read_string_value(self.__read_tag()))
+        if tag == _TAG_REGEXP:
+            self.__read_string_value(self.__read_tag())
+            self.__read_varint()
+            return self.__add_object({})
+        if tag == _TAG_BEGIN_JS_MAP or tag == _TAG_BEGIN_JS_SET:
+            # Maps and Sets cannot be represented by JSON.stringify, only their entries have to be skipped.
+            value = self.__add_object({})
+            end_tag = _TAG_END_JS_MAP if tag == _TAG_BEGIN_JS_MAP else _TAG_END_JS_SET
+            while self.__peek_tag() != end_tag:
+                self.__read_object()
+            self.__read_tag()
+            self.__read_varint()
+            return value
+        if tag == _TAG_ARRAY_BUFFER or tag == _TAG_RESIZABLE_ARRAY_BUFFER:
+            byte_length = self.__read_varint()
+            if tag == _TAG_RESIZABLE_ARRAY_BUFFER:
+                self.__read_varint()
+            value = self.__add_object({})
+            self.__buffers[id(value)] = self.__read_bytes(byte_length)
+            return value
+        if tag == _TAG_HOST_OBJECT:
+            return self.__read_host_object()
+        raise ValueError(f'Unsupported V8 serialization tag: {chr(tag)!r}')
+
+    def __read_array_properties(self, value: list, end_tag: int) -> list:
+        properties = self.__read_properties({}, end_tag)
+        self.__read_varint()
+        for key, element in properties.items():
+            if is_array_index(key) and int(key) < len(value):
+                value[int(key)] = element
+        return value
+
+    def __read_header(self) -> NoReturn:
+        # Blink writes its own version in front of the V8 version.
+        if self.__pos < len(self.__data) and self.__data[self.__pos] == _TAG_VERSION:
+            self.__pos += 1
+            self.__version = self.__read_varint()
+            if self.__pos < len(self.__data) and self.__data[self.__pos] == _BLINK_TAG_TRAILER_OFFSET:
+                self.__pos += 1 + 8 + 4
+            if self.__pos < len(self.__data) and self.__data[self.__pos] == _TAG_VERSION:
+                self.__pos += 1
+                self.__version = self.__read_varint()
+
+    def read(self) -> object:
+        self.__read_header()
+        value = self.__read_object()
+        return None if value is UNDEFINED else value
+
+
+def deserialize(data: bytes) -> object:
+    return V8Deserializer(data).read()
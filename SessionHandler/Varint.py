@@ -0,0 +1,21 @@
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """
+    Read an unsigned LEB128 integer
+
+    :param data: the buffer
+    :param pos: the position of the first byte
+    :return: the value and the position after it
+    """
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError('Invalid varint: unexpected end of data.')
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte & 0x80 == 0:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError('Invalid varint: more than 64 bits.')
@@ -1,2 +1,9 @@
 from .SessionHandler import SessionHandler, Browser
+from .AsyncSessionHandler import AsyncSessionHandler
+from .DriverPool import DriverPool
+from .IDBKey import IDBKeyRange
+from .Metrics import SessionMetrics
+from .ReadinessProbe import ReadinessProbe, LocalStorageProbe, SelectorProbe, AnyProbe
+from .RecordBuffer import RecordBuffer
+from .SessionArchive import SessionArchive
 from .SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
@@ -12,9 +12,9 @@ class WaWebSession(SessionObject):
     __log: logging.Logger
 
     @staticmethod
-    def create_from_file(path: str):
+    def create_from_file(path: str, stream: bool = False, lazy: bool = False):
         # FIXME: I should probably use __init__ for these things and not a static method
-        new_waso = SessionObject.create_from_file(path)
+        new_waso = SessionObject.create_from_file(path, stream, lazy)
         new_waso.__class__ = WaWebSession
         new_waso.update_version()
         new_waso.update_logger()
@@ -54,6 +54,10 @@ class WaWebSession(SessionObject):
     def update_version(self) -> NoReturn:
         self.__version = version.get_version(self)
 
+    def get_session_info(self) -> dict:
+        wa_version = version.get_version(self)
+        return {'version': type(wa_version).__name__ if wa_version is not None else None}
+
     def update_session(self, cookies: dict[str, str],
                        local_storage: dict[str, str],
                        indexed_db: IndexedDB) -> NoReturn:
@@ -61,6 +65,10 @@ class WaWebSession(SessionObject):
         self.local_storage = local_storage
         self.indexed_db = indexed_db
 
+    def get_readiness_probe(self) -> ReadinessProbe:
+        # The keys are written as soon as the login is done, long before the chat list is rendered.
+        return AnyProbe(LocalStorageProbe('WANoiseInfo'), LocalStorageProbe('WAToken1', 'WAToken2'))
+
     def get_idb_db_names(self) -> list:
         # FIXME: wawc_db_enc CryptoKeys do not get dumped correctly
         return ["wawc", "wawc_db_enc", "signal-storage", "model-storage"]
@@ -131,7 +139,11 @@ if __name__ == '__main__':
         elif input_browser_choice == 2:
             web = SessionHandler(waSession, Browser.FIREFOX)
 
+        web.set_checkpointing(file_path)
         new_waSession = web.open_session()
-        sh_logger.info('Saving closed session...')
-        new_waSession.save_to_file(file_path)
-        sh_logger.info('Successfully saved session to file!')
+        if new_waSession.get_fingerprint() == waSession.get_fingerprint():
+            sh_logger.info('Session did not change, the session file is kept as it is.')
+        else:
+            sh_logger.info('Saving closed session...')
+            new_waSession.save_to_file(file_path, incremental=True)
+            sh_logger.info('Successfully saved session to file!')
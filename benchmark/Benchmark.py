@@ -0,0 +1,189 @@
+import gc
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBObjectStore
+from benchmark.SessionGenerator import generate_session
+
+REPORT_VERSION = 1
+
+
+def get_percentile(sorted_values: list[float], percentile: float) -> float:
+    position = min(len(sorted_values) - 1, max(0, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[position]
+
+
+def measure(action: Callable[[], object], record_num: int, repeat: int = 5, warmup: int = 1,
+            setup: Optional[Callable[[], object]] = None) -> dict:
+    """
+    Measure the latency, throughput, peak memory and retained memory of an action
+
+    Memory is measured in a separate run, tracing allocations slows the action down. The retained memory is the
+    memory that is still allocated when the action returned, e.g. the objects it returned. Objects that were created
+    before the action are not included, even if the returned objects reference them.
+
+    :param action: the action, called without arguments
+    :param record_num: the number of records the action processes, used for the throughput
+    :param repeat: the number of measured runs
+    :param warmup: the number of runs before the measured runs
+    :param setup: called before every run, its time is not measured
+    :return: a dict containing the latencies in seconds, the throughput in records per second based on the median
+             latency, the peak and retained memory in bytes and the retained memory per record
+    """
+    latencies = []
+    for run in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start_time = time.perf_counter()
+        action()
+        duration = time.perf_counter() - start_time
+        if run >= warmup:
+            latencies.append(duration)
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = action()
+        retained_memory, peak_memory = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    latencies.sort()
+    median = statistics.median(latencies)
+    return {
+        'runs': repeat,
+        'records': record_num,
+        'latency': {
+            'min': latencies[0],
+            'median': median,
+            'p95': get_percentile(latencies, 95),
+            'max': latencies[-1]
+        },
+        'throughput': record_num / median if median > 0 else None,
+        'peakMemory': peak_memory,
+        'retainedMemory': retained_memory,
+        'memoryPerRecord': retained_memory / record_num if record_num > 0 else None
+    }
+
+
+def _copy_records(session: SessionObject) -> list[tuple[IDBObjectStore, list[dict]]]:
+    return [(object_store, object_store.get_data()) for idb_db in session.indexed_db.get_dbs()
+            for object_store in idb_db.get_object_stores()]
+
+
+def run_benchmarks(config: dict, repeat: int = 5, cases: Optional[list[str]] = None) -> dict:
+    """
+    Run the benchmarks on a synthetic session
+
+    :param config: the arguments of :func:`generate_session`
+    :param repeat: the number of measured runs per benchmark
+    :param cases: the names of the benchmarks that should run, all benchmarks run if `None`
+    :return: the report, a JSON serializable dict
+    """
+    session = generate_session(**config)
+    record_num = sum(object_store.get_data_num() for idb_db in session.indexed_db.get_dbs()
+                     for object_store in idb_db.get_object_stores())
+    stores = _copy_records(session)
+    idb_dict = session.indexed_db.as_dict()
+    temp_dir = tempfile.mkdtemp(prefix='session-benchmark')
+    paths = {file_format: os.path.join(temp_dir, f'{file_format}.{session.get_file_ext()}')
+             for file_format in ('json', 'stream', 'binary')}
+    save_options = {'json': {}, 'stream': {'stream': True}, 'binary': {'binary': True}}
+
+    def add_data(compact: bool):
+        def action() -> list[IDBObjectStore]:
+            new_stores = []
+            for object_store, records in stores:
+                new_store = IDBObjectStore(object_store.name, object_store.auto_increment, object_store.key_path)
+                new_store.set_compact(compact)
+                for name, options in object_store.get_indices().items():
+                    new_store.create_index(name, options)
+                for record in records:
+                    new_store.add_data(record)
+                new_stores.append(new_store)
+            return new_stores
+        return action
+
+    def save(file_format: str):
+        return lambda: session.save_to_file(paths[file_format], **save_options[file_format])
+
+    def load(file_format: str, compact: bool = False):
+        return lambda: SessionObject.create_from_file(paths[file_format], stream=file_format == 'stream',
+                                                      compact=compact)
+
+    def round_trip(file_format: str):
+        return lambda: (save(file_format)(), load(file_format)())
+
+    def validate():
+        # Unchanged sessions are detected by comparing a freshly loaded copy, like the re-save path does.
+        loaded = SessionObject.create_from_file(paths['binary'])
+        if session.diff(loaded) != {}:
+            raise RuntimeError('The loaded session does not match the saved session.')
+
+    benchmarks = {
+        'add_data': (add_data(False), None),
+        'add_data_compact': (add_data(True), None),
+        'create_from_dict': (lambda: IndexedDB.create_from_dict(idb_dict), None),
+        'as_dict': (lambda: session.indexed_db.as_dict(), None),
+        'validate': (validate, save('binary'))
+    }
+    for file_format in paths:
+        benchmarks[f'save_{file_format}'] = (save(file_format), None)
+        benchmarks[f'load_{file_format}'] = (load(file_format), save(file_format))
+        benchmarks[f'load_{file_format}_compact'] = (load(file_format, True), save(file_format))
+        benchmarks[f'round_trip_{file_format}'] = (round_trip(file_format), None)
+
+    results = {}
+    try:
+        for name, (action, setup) in benchmarks.items():
+            if cases is not None and name not in cases:
+                continue
+            results[name] = measure(action, record_num, repeat, setup=setup)
+            if name.startswith('save_'):
+                results[name]['fileSize'] = os.path.getsize(paths[name[len('save_'):]])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {
+        'version': REPORT_VERSION,
+        'time': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': results
+    }
+
+
+def compare_reports(report: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """
+    Find the benchmarks that got slower or use more memory than in a baseline report
+
+    :param report: the current report
+    :param baseline: the stored report
+    :param tolerance: the allowed relative increase of the median latency, the peak memory and the retained memory
+    :return: a list containing a description of every regression
+    """
+    if baseline.get('version') != REPORT_VERSION:
+        raise ValueError(f'Unsupported benchmark report version: {baseline.get("version")}')
+    if baseline['config'] != report['config']:
+        raise ValueError('The reports were created with different session configurations.')
+    regressions = []
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        base_result = baseline['results'][name]
+        values = (('median latency', result['latency']['median'], base_result['latency']['median'], 's'),
+                  ('peak memory', result['peakMemory'], base_result['peakMemory'], ' bytes'),
+                  ('retained memory', result.get('retainedMemory', 0), base_result.get('retainedMemory', 0), ' bytes'))
+        for description, value, base_value, unit in values:
+            if base_value > 0 and value > base_value * (1 + tolerance):
+                regressions.append(f'{name}: {description} increased by {(value / base_value - 1) * 100:.1f}% '
+                                   f'({base_value:.6g}{unit} -> {value:.6g}{unit})')
+    return regressions
@@ -0,0 +1,381 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from typing import Callable, NoReturn, Optional
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import JavascriptException, NoSuchWindowException, WebDriverException
+
+from SessionHandler.IDBKey import IDBKeyRange, NO_KEY, evaluate_key_path
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+# Every script of the SessionHandler names itself in its first line.
+_SCRIPT_NAME = re.compile(r'^\s*// pySessionHandler: (\w+)')
+
+
+class FakeBrowserStats:
+    """
+    Round trips of all fake browsers of a load test, shared between threads
+    """
+    __lock: threading.Lock
+    # (command, latency in seconds, sent bytes, received bytes)
+    __round_trips: list[tuple[str, float, int, int]]
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__round_trips = []
+
+    def add(self, command: str, latency: float, sent_bytes: int, received_bytes: int) -> NoReturn:
+        with self.__lock:
+            self.__round_trips.append((command, latency, sent_bytes, received_bytes))
+
+    def get_round_trips(self) -> list[tuple[str, float, int, int]]:
+        with self.__lock:
+            return list(self.__round_trips)
+
+
+class FakeOriginStorage:
+    """
+    Cookies, localStorage and IndexedDB of a single origin
+    """
+    # the change count of the page, the fake page only changes its storage if a test changes the count
+    changes: int
+    cookies: dict[str, str]
+    local_storage: dict[str, str]
+    databases: dict[str, IDBDatabase]
+
+    def __init__(self, session: Optional[SessionObject] = None):
+        """
+        :param session: a session whose data the storage starts with, it is copied
+        """
+        self.changes = 0
+        self.cookies = dict(session.cookies) if session is not None else {}
+        self.local_storage = dict(session.local_storage) if session is not None else {}
+        self.databases = {}
+        if session is not None:
+            idb_dict = json.loads(json.dumps(session.indexed_db.as_dict()))
+            for idb_db in IndexedDB.create_from_dict(idb_dict).get_dbs():
+                self.databases[idb_db.name] = idb_db
+
+    def clear(self) -> NoReturn:
+        self.cookies.clear()
+        self.local_storage.clear()
+        self.databases.clear()
+
+
+class _SwitchTo:
+    def __init__(self, driver: 'FakeWebDriver'):
+        self.__driver = driver
+
+    def window(self, handle: str) -> NoReturn:
+        if handle not in self.__driver.window_handles:
+            raise NoSuchWindowException(f'No window with the handle: {handle}')
+
+
+class FakeWebDriver:
+    """
+    Stand-in for a Selenium WebDriver that runs the scripts of :class:`SessionHandler` on a Python model of the
+    browser storage
+
+    Scripts are recognized by the name in their first line, unknown scripts raise a `JavascriptException`. Every command
+    is a round trip: arguments and results are JSON encoded like they are by the WebDriver protocol, the configured
+    latency is added and payloads larger than the limit fail.
+    """
+    __storage: dict[str, FakeOriginStorage]
+    __origin: str
+    __latency: float
+    __jitter: float
+    __bandwidth: Optional[float]
+    __max_payload: Optional[int]
+    __close_after: Optional[float]
+    __login_delay: float
+    __loaded_at: float
+    __stats: Optional[FakeBrowserStats]
+    __rng: random.Random
+    # state kept in the page between scripts, like document.pySessionHandler
+    __batch_keys: dict[tuple[str, str], object]
+    __quit: bool
+    __handle_counter: Callable[[], int]
+    __handles: list[str]
+    current_url: str
+    switch_to: _SwitchTo
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, bandwidth: Optional[float] = None,
+                 max_payload: Optional[int] = None, close_after: Optional[float] = None, login_delay: float = 0.0,
+                 stats: Optional[FakeBrowserStats] = None, seed: Optional[int] = None):
+        """
+        :param latency: the time every round trip takes in seconds
+        :param jitter: a random time of up to this number of seconds that is added to every round trip
+        :param bandwidth: the number of bytes per second that are transferred, `None` transfers instantly
+        :param max_payload: the maximum size of arguments and results in bytes, larger payloads raise a
+                            `WebDriverException`
+        :param close_after: the window is closed this number of seconds after a page was loaded, `None` keeps it open
+        :param login_delay: the number of seconds after loading a page until readiness probes succeed
+        :param stats: collects the round trips of this browser
+        :param seed: the seed of the jitter
+        """
+        self.__storage = {}
+        self.__origin = 'null'
+        self.__latency = latency
+        self.__jitter = jitter
+        self.__bandwidth = bandwidth
+        self.__max_payload = max_payload
+        self.__close_after = close_after
+        self.__login_delay = login_delay
+        self.__loaded_at = time.monotonic()
+        self.__stats = stats
+        self.__rng = random.Random(seed)
+        self.__batch_keys = {}
+        self.__quit = False
+        self.__handle_counter = itertools.count().__next__
+        self.__handles = ['window-%d' % self.__handle_counter()]
+        self.current_url = 'data:,'
+        self.switch_to = _SwitchTo(self)
+
+    @staticmethod
+    def get_origin(url: str) -> str:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            return 'null'
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def set_origin_storage(self, url: str, storage: FakeOriginStorage) -> NoReturn:
+        """
+        Set the storage of an origin, e.g. to simulate a browser profile that is logged in
+
+        :param url: an URL of the origin
+        :param storage: the storage, it is not copied and can be shared by browsers that only read it
+        """
+        self.__storage[self.get_origin(url)] = storage
+
+    def get_origin_storage(self, url: str) -> FakeOriginStorage:
+        return self.__storage.setdefault(self.get_origin(url), FakeOriginStorage())
+
+    def __get_storage(self) -> FakeOriginStorage:
+        if self.__origin == 'null':
+            raise JavascriptException('SecurityError: Storage is not available on an opaque origin.')
+        return self.__storage.setdefault(self.__origin, FakeOriginStorage())
+
+    def __transfer(self, value: object) -> tuple[object, int]:
+        # Values are copied through JSON like they are by the WebDriver protocol.
+        encoded = json.dumps(value)
+        size = len(encoded.encode('utf-8'))
+        if self.__max_payload is not None and size > self.__max_payload:
+            raise WebDriverException(f'Payload of {size} bytes exceeds the limit of {self.__max_payload} bytes.')
+        return json.loads(encoded), size
+
+    def __round_trip(self, command: str, action: Callable[..., object], *args) -> object:
+        if self.__quit:
+            raise WebDriverException('The browser was quit.')
+        start_time = time.perf_counter()
+        args, sent_bytes = self.__transfer(list(args))
+        result, received_bytes = self.__transfer(action(*args))
+        delay = self.__latency + (self.__rng.uniform(0, self.__jitter) if self.__jitter > 0 else 0)
+        if self.__bandwidth is not None:
+            delay += (sent_bytes + received_bytes) / self.__bandwidth
+        if delay > 0:
+            time.sleep(delay)
+        if self.__stats is not None:
+            self.__stats.add(command, time.perf_counter() - start_time, sent_bytes, received_bytes)
+        return result
+
+    def __check_window(self) -> NoReturn:
+        if self.__quit or len(self.__handles) == 0:
+            raise NoSuchWindowException('The browser window was closed.')
+
+    def __get_window_handle(self) -> str:
+        # The simulated user closes the window once it was open long enough.
+        if self.__close_after is not None and time.monotonic() - self.__loaded_at >= self.__close_after:
+            self.__handles = []
+        self.__check_window()
+        return self.__handles[-1]
+
+    # ---- WebDriver commands used by SessionHandler and DriverPool ----
+
+    def get(self, url: str) -> NoReturn:
+        def load(loaded_url):
+            self.__check_window()
+            self.current_url = loaded_url
+            self.__origin = self.get_origin(loaded_url)
+            self.__loaded_at = time.monotonic()
+            self.__batch_keys = {}
+        self.__round_trip('get', load, url)
+
+    def refresh(self) -> NoReturn:
+        self.get(self.current_url)
+
+    @property
+    def current_window_handle(self) -> str:
+        return self.__round_trip('current_window_handle', self.__get_window_handle)
+
+    @property
+    def window_handles(self) -> list[str]:
+        return list(self.__handles)
+
+    def set_script_timeout(self, timeout: float) -> NoReturn:
+        pass
+
+    def delete_all_cookies(self) -> NoReturn:
+        self.__round_trip('delete_all_cookies', lambda: self.__get_storage().cookies.clear())
+
+    def close(self) -> NoReturn:
+        if len(self.__handles) > 0:
+            self.__handles.pop()
+
+    def quit(self) -> NoReturn:
+        self.__quit = True
+        self.__handles = []
+
+    def execute_script(self, script: str, *args) -> object:
+        return self.__round_trip('execute_script', lambda *values: self.__run_script(script, values), *args)
+
+    def execute_async_script(self, script: str, *args) -> object:
+        return self.__round_trip('execute_async_script', lambda *values: self.__run_async_script(script, values),
+                                 *args)
+
+    # ---- page scripts ----
+
+    @staticmethod
+    def __get_script_name(script: str) -> str:
+        match = _SCRIPT_NAME.match(script)
+        if match is None:
+            raise JavascriptException('FakeWebDriver does not support this script.')
+        return match.group(1)
+
+    def __run_script(self, script: str, args: list) -> object:
+        name = self.__get_script_name(script)
+        if name == 'health_check':
+            return 1
+        if name == 'open_window':
+            self.__handles.append('window-%d' % self.__handle_counter())
+            return None
+        if name == 'close_databases':
+            self.__batch_keys = {}
+            return None
+        storage = self.__get_storage()
+        if name == 'count_changes':
+            return storage.changes
+        if name == 'get_cookies':
+            return [f'{key}={value}' for key, value in storage.cookies.items()] or ['']
+        if name == 'set_cookies':
+            storage.cookies.update(args[0])
+            return None
+        if name == 'get_local_storage':
+            return dict(storage.local_storage)
+        if name == 'set_local_storage_item':
+            storage.local_storage[args[0]] = args[1]
+            return None
+        raise JavascriptException(f'FakeWebDriver does not support the script: {name}')
+
+    def __run_async_script(self, script: str, args: list) -> object:
+        name = self.__get_script_name(script)
+        if name == 'readiness_probe':
+            return time.monotonic() - self.__loaded_at >= self.__login_delay
+        storage = self.__get_storage()
+        try:
+            if name == 'reset_storage':
+                storage.clear()
+                return {}
+            if name == 'get_indexed_db':
+                stats = {}
+                return {'databases': self.__dump(storage, args[0], args[1], args[2], stats), 'stats': stats}
+            if name == 'get_object_store_batch':
+                return self.__get_batch(storage, args[0], args[1], args[2])
+            if name == 'create_schema':
+                self.__create_schema(storage, args[0])
+                return {}
+            if name == 'write_object_store_batch':
+                self.__write_records(storage, args[0], args[1], args[2], args[3])
+                return {}
+            if name == 'restore_session':
+                return {'stats': self.__restore(storage, args[0], args[1], args[2], args[3])}
+        except (KeyError, ValueError) as error:
+            return {'error': f'{type(error).__name__}: {error}'}
+        raise JavascriptException(f'FakeWebDriver does not support the script: {name}')
+
+    @staticmethod
+    def __get_db(storage: FakeOriginStorage, db_name: str) -> IDBDatabase:
+        # Opening a database that does not exist creates it, like indexedDB.open does.
+        if db_name not in storage.databases:
+            storage.databases[db_name] = IDBDatabase(db_name, 1)
+        return storage.databases[db_name]
+
+    @staticmethod
+    def __get_schema(object_store: IDBObjectStore) -> dict:
+        return {'name': object_store.name, 'indices': object_store.get_indices(),
+                'keyPath': object_store.key_path[0] if len(object_store.key_path) == 1 else object_store.key_path,
+                'autoIncrement': object_store.auto_increment}
+
+    def __dump(self, storage: FakeOriginStorage, db_names: list[str], st_layout: Optional[dict],
+               schema_only: bool, stats: dict[str, float]) -> dict:
+        databases = {}
+        for db_name in db_names:
+            idb_db = self.__get_db(storage, db_name)
+            databases[db_name] = {'name': idb_db.name, 'version': idb_db.version, 'objectStores': {}}
+            for object_store in idb_db.get_object_stores():
+                start_time = time.perf_counter()
+                os_dict = self.__get_schema(object_store)
+                skipped = st_layout is not None and object_store.name in st_layout.get(db_name, [])
+                os_dict['data'] = [] if schema_only or skipped else list(object_store.iterate())
+                databases[db_name]['objectStores'][object_store.name] = os_dict
+                stats[f'{db_name}/{object_store.name}'] = time.perf_counter() - start_time
+        return databases
+
+    def __get_batch(self, storage: FakeOriginStorage, db_name: str, os_name: str, batch_size: int) -> dict:
+        object_store = self.__get_db(storage, db_name).get_object_store(os_name)
+        cursor_name = (db_name, os_name)
+        if len(object_store.key_path) == 0:
+            # Records without a keyPath are keyed by their position.
+            start = self.__batch_keys.get(cursor_name, 0)
+            data = object_store.get_data()[start:start + batch_size]
+            self.__batch_keys[cursor_name] = start + len(data)
+        else:
+            key_range = None
+            if cursor_name in self.__batch_keys:
+                key_range = IDBKeyRange.lower_bound(self.__batch_keys[cursor_name], True)
+            data = list(itertools.islice(object_store.iterate(key_range), batch_size))
+            if len(data) > 0:
+                key_path = object_store.key_path[0] if len(object_store.key_path) == 1 else object_store.key_path
+                self.__batch_keys[cursor_name] = evaluate_key_path(data[-1], key_path)
+        return {'data': data, 'done': len(data) < batch_size}
+
+    @staticmethod
+    def __create_schema(storage: FakeOriginStorage, schema: dict) -> NoReturn:
+        for db_name, db_dict in schema.items():
+            idb_db = IDBDatabase(db_name, db_dict['version'])
+            for os_name, os_dict in db_dict['objectStores'].items():
+                object_store = IDBObjectStore(os_name, os_dict['autoIncrement'], os_dict['keyPath'])
+                for index_name, options in os_dict['indices'].items():
+                    object_store.create_index(index_name, options)
+                idb_db.add_object_store(object_store)
+            storage.databases[db_name] = idb_db
+
+    def __write_records(self, storage: FakeOriginStorage, db_name: str, os_name: str, data: list[dict],
+                        first_key: Optional[int]) -> NoReturn:
+        object_store = self.__get_db(storage, db_name).get_object_store(os_name)
+        if first_key is not None and first_key != object_store.get_data_num() + 1:
+            raise ValueError(f'Records of "{db_name}/{os_name}" have to be written in order.')
+        key_path = object_store.key_path[0] if len(object_store.key_path) == 1 else object_store.key_path
+        for record in data:
+            if len(object_store.key_path) > 0:
+                key = evaluate_key_path(record, key_path)
+                if key is NO_KEY or object_store.get(key) is not None:
+                    raise ValueError(f'ConstraintError: Could not add record to "{db_name}/{os_name}".')
+            object_store.add_data(record)
+
+    def __restore(self, storage: FakeOriginStorage, cookies: dict, local_storage: dict, schema: dict,
+                  idb_data: dict) -> dict:
+        storage.cookies.update(cookies)
+        storage.local_storage.update(local_storage)
+        self.__create_schema(storage, schema)
+        stats = {}
+        for db_name, object_stores in idb_data.items():
+            for os_name, os_data in object_stores.items():
+                start_time = time.perf_counter()
+                self.__write_records(storage, db_name, os_name, os_data['data'], 1 if os_data['keyed'] else None)
+                stats[f'{db_name}/{os_name}'] = {'records': len(os_data['data']),
+                                                 'time': time.perf_counter() - start_time}
+        return stats
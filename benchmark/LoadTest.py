@@ -0,0 +1,191 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from SessionHandler.Metrics import SessionMetrics
+from SessionHandler.SessionHandler import SessionHandler, Browser
+from benchmark.Benchmark import get_percentile
+from benchmark.FakeWebDriver import FakeBrowserStats, FakeOriginStorage, FakeWebDriver
+from benchmark.SessionGenerator import BENCHMARK_URL, BenchmarkSession, generate_session
+
+OPERATIONS = ('create_new_session', 'get_active_session', 'open_session')
+
+
+def _get_latency_stats(latencies: list[float]) -> dict:
+    if len(latencies) == 0:
+        return {'count': 0}
+    latencies = sorted(latencies)
+    return {'count': len(latencies), 'p50': get_percentile(latencies, 50), 'p90': get_percentile(latencies, 90),
+            'p99': get_percentile(latencies, 99), 'max': latencies[-1]}
+
+
+def run_load_test(operation: str, session_num: int = 20, concurrency: int = 4, config: Optional[dict] = None,
+                  latency: float = 0.002, jitter: float = 0.0, bandwidth: Optional[float] = None,
+                  max_payload: Optional[int] = None, idb_batch_size: Optional[int] = None,
+                  single_step_restore: bool = False) -> dict:
+    """
+    Run a :class:`SessionHandler` operation many times against fake browsers
+
+    :param operation: one of ``create_new_session``, ``get_active_session`` or ``open_session``
+    :param session_num: the number of sessions, for ``get_active_session`` the number of browser profiles
+    :param concurrency: the number of operations that run at the same time
+    :param config: the arguments of :func:`generate_session` for the session of every browser
+    :param latency: the time of a round trip to the browser in seconds
+    :param jitter: the maximum random time that is added to every round trip in seconds
+    :param bandwidth: the number of bytes per second that are transferred to and from the browser
+    :param max_payload: the maximum size of a single request or response in bytes
+    :param idb_batch_size: passed to :meth:`SessionHandler.set_idb_batch_size`
+    :param single_step_restore: passed to :meth:`SessionHandler.set_single_step_restore`
+    :return: the report, a JSON serializable dict
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f'Unknown operation: {operation}')
+    if session_num < 1 or concurrency < 1:
+        raise ValueError('session_num and concurrency cannot be < 1')
+    config = config if config is not None else {}
+    session = generate_session(**config)
+    db_names = session.get_idb_db_names()
+    # Captures only read the storage, all browsers share a single copy of it.
+    storage = FakeOriginStorage(session)
+    for idb_db in storage.databases.values():
+        for object_store in idb_db.get_object_stores():
+            object_store.count()
+    stats = FakeBrowserStats()
+
+    def create_driver(options, profile_dir: Optional[str]) -> FakeWebDriver:
+        driver = FakeWebDriver(latency, jitter, bandwidth, max_payload, close_after=0, stats=stats)
+        if operation != 'open_session':
+            driver.set_origin_storage(BENCHMARK_URL, storage)
+        return driver
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def on_metrics(metrics: SessionMetrics):
+        with lock:
+            latencies.append(time.time() - metrics.start_time)
+
+    def create_handler(template: BenchmarkSession) -> SessionHandler:
+        handler = SessionHandler(template, Browser.CHROME)
+        handler.set_driver_factory(create_driver)
+        handler.set_idb_batch_size(idb_batch_size)
+        handler.set_single_step_restore(single_step_restore)
+        handler.set_collect_metrics(True, on_metrics)
+        return handler
+
+    def run_operation(action: Callable[[SessionHandler], object], template: BenchmarkSession):
+        try:
+            action(create_handler(template))
+        except Exception as error:
+            with lock:
+                errors.append(f'{type(error).__name__}: {error}')
+
+    user_dir = None
+    start_time = time.perf_counter()
+    try:
+        if operation == 'get_active_session':
+            # Every profile directory is a browser profile that is logged in, the user dir itself is the default
+            # profile.
+            user_dir = tempfile.mkdtemp(prefix='session-load-test')
+            for position in range(session_num - 1):
+                os.mkdir(os.path.join(user_dir, f'Profile {position + 1}'))
+            handler = create_handler(BenchmarkSession(db_names=db_names))
+            handler.set_browser_user_dir(user_dir)
+            handler.set_skip_profiles_without_storage(False)
+            handler.get_active_session(all_profiles=True, max_workers=concurrency)
+            errors.extend(f'{type(error).__name__}: {error}' for error in handler.get_profile_errors().values())
+        else:
+            template = session if operation == 'open_session' else BenchmarkSession(db_names=db_names)
+            action = (lambda handler: handler.open_session()) if operation == 'open_session' else \
+                (lambda handler: handler.create_new_session())
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='LoadTest') as executor:
+                for _ in range(session_num):
+                    executor.submit(run_operation, action, template)
+    finally:
+        if user_dir is not None:
+            shutil.rmtree(user_dir, ignore_errors=True)
+    wall_time = time.perf_counter() - start_time
+
+    round_trips = stats.get_round_trips()
+    commands = {}
+    for command, round_trip_latency, _, _ in round_trips:
+        commands.setdefault(command, []).append(round_trip_latency)
+    operation_num = len(latencies)
+    return {
+        'operation': operation,
+        'sessions': session_num,
+        'concurrency': concurrency,
+        'config': config,
+        'fakeBrowser': {'latency': latency, 'jitter': jitter, 'bandwidth': bandwidth, 'maxPayload': max_payload,
+                        'idbBatchSize': idb_batch_size, 'singleStepRestore': single_step_restore},
+        'wallTime': wall_time,
+        'throughput': operation_num / wall_time if wall_time > 0 else None,
+        'latency': _get_latency_stats(latencies),
+        'roundTrips': {
+            'total': len(round_trips),
+            'perOperation': len(round_trips) / operation_num if operation_num > 0 else None,
+            'sentBytes': sum(round_trip[2] for round_trip in round_trips),
+            'receivedBytes': sum(round_trip[3] for round_trip in round_trips),
+            'byCommand': {command: _get_latency_stats(values) for command, values in commands.items()}
+        },
+        'errors': errors
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmark.LoadTest',
+                                     description='Run SessionHandler operations at scale against fake browsers.')
+    parser.add_argument('operation', choices=OPERATIONS)
+    parser.add_argument('--sessions', type=int, default=20, help='number of sessions or browser profiles')
+    parser.add_argument('--concurrency', type=int, default=4, help='number of operations running at the same time')
+    parser.add_argument('--stores', type=int, default=4, help='number of object stores of every session')
+    parser.add_argument('--records', type=int, default=1000, help='number of records per object store')
+    parser.add_argument('--latency', type=float, default=0.002, help='round trip latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random extra latency in seconds')
+    parser.add_argument('--bandwidth', type=float, help='transferred bytes per second')
+    parser.add_argument('--max-payload', type=int, help='maximum size of a request or response in bytes')
+    parser.add_argument('--idb-batch-size', type=int, help='get and restore IndexedDB in batches of this size')
+    parser.add_argument('--single-step-restore', action='store_true', help='restore sessions with a single script')
+    parser.add_argument('--output', help='write the report to this file')
+    args = parser.parse_args()
+    log = logging.getLogger('benchmark')
+    log.addHandler(logging.StreamHandler())
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    # The fake browsers have no user dir and failed operations are part of the report.
+    logging.getLogger('SessionHandler').addHandler(logging.NullHandler())
+
+    report = run_load_test(args.operation, args.sessions, args.concurrency,
+                           {'store_num': args.stores, 'record_num': args.records}, args.latency, args.jitter,
+                           args.bandwidth, args.max_payload, args.idb_batch_size, args.single_step_restore)
+    latency = report['latency']
+    log.info('%s: %s operations in %.2fs (%.1f/s), %s errors', args.operation, latency['count'],
+             report['wallTime'], report['throughput'] or 0, len(report['errors']))
+    if latency['count'] > 0:
+        log.info('Latency: p50 %.4fs  p90 %.4fs  p99 %.4fs  max %.4fs', latency['p50'], latency['p90'],
+                 latency['p99'], latency['max'])
+    log.info('Round trips: %s (%.1f per operation)', report['roundTrips']['total'],
+             report['roundTrips']['perOperation'] or 0)
+    for command, command_stats in report['roundTrips']['byCommand'].items():
+        log.info('  %-24s %6s  p50 %.4fs  p99 %.4fs', command, command_stats['count'], command_stats['p50'],
+                 command_stats['p99'])
+    for error in sorted(set(report['errors'])):
+        log.error('Error: %s', error)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+        log.info('Wrote report: %s', args.output)
+    return 1 if len(report['errors']) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
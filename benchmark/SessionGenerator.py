@@ -0,0 +1,83 @@
+import random
+import string
+from typing import Optional
+
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+BENCHMARK_URL = 'https://benchmark.invalid/'
+
+
+class BenchmarkSession(SessionObject):
+    """
+    Session of the synthetic website, it can be captured and restored by :class:`SessionHandler`
+    """
+    __db_names: list[str]
+
+    def __init__(self, cookies: Optional[dict[str, str]] = None, local_storage: Optional[dict[str, str]] = None,
+                 indexed_db: Optional[IndexedDB] = None, db_names: Optional[list[str]] = None):
+        super().__init__('Benchmark', BENCHMARK_URL, 'bench', cookies, local_storage, indexed_db)
+        self.__db_names = db_names if db_names is not None else [idb_db.name for idb_db in self.indexed_db.get_dbs()]
+
+    def get_idb_db_names(self) -> list[str]:
+        return list(self.__db_names)
+
+
+def generate_record(rng: random.Random, position: int, index_num: int, unique_index_num: int,
+                    value_size: int) -> dict[str, object]:
+    """
+    Create a record that looks like the records of web apps: a numeric key, a few small fields and a larger value
+
+    :param rng: the random number generator, records only depend on its state and the other arguments
+    :param position: the position of the record in its object store, used as its key
+    :param index_num: the number of fields that are covered by non-unique indexes
+    :param unique_index_num: the number of fields that are covered by unique indexes
+    :param value_size: the number of characters of the larger value
+    :return: the record
+    """
+    record = {
+        'id': position,
+        'timestamp': 1600000000 + position * 7,
+        'flags': [rng.random() < 0.5 for _ in range(4)],
+        'value': ''.join(rng.choices(string.ascii_letters + string.digits, k=value_size))
+    }
+    for index in range(index_num):
+        record[f'field{index}'] = f'group-{rng.randrange(max(1, 2 ** (index + 4)))}'
+    for index in range(unique_index_num):
+        record[f'unique{index}'] = f'{index}-{position:08d}'
+    return record
+
+
+def generate_session(db_num: int = 1, store_num: int = 4, record_num: int = 1000, index_num: int = 2,
+                     unique_index_num: int = 1, value_size: int = 64, seed: int = 0) -> BenchmarkSession:
+    """
+    Create a synthetic session, the same arguments always create the same session
+
+    :param db_num: the number of IndexedDB databases
+    :param store_num: the number of object stores per database
+    :param record_num: the number of records per object store
+    :param index_num: the number of non-unique indexes per object store
+    :param unique_index_num: the number of unique indexes per object store
+    :param value_size: the number of characters of the largest value of every record
+    :param seed: the seed of the random values
+    :return: the session
+    """
+    rng = random.Random(seed)
+    indexed_db = IndexedDB(BENCHMARK_URL)
+    for db_position in range(db_num):
+        idb_db = IDBDatabase(f'db{db_position}', 1)
+        for store_position in range(store_num):
+            object_store = IDBObjectStore(f'store{store_position}', False, 'id')
+            for index in range(index_num):
+                object_store.create_index(f'field{index}', {'unique': False, 'keyPath': f'field{index}',
+                                                            'multiEntry': False})
+            for index in range(unique_index_num):
+                object_store.create_index(f'unique{index}', {'unique': True, 'keyPath': f'unique{index}',
+                                                             'multiEntry': False})
+            for position in range(record_num):
+                object_store.add_data(generate_record(rng, position, index_num, unique_index_num, value_size))
+            idb_db.add_object_store(object_store)
+        indexed_db.add_db(idb_db)
+    cookies = {f'cookie{position}': ''.join(rng.choices(string.hexdigits, k=32)) for position in range(8)}
+    local_storage = {f'key{position}': ''.join(rng.choices(string.ascii_letters, k=value_size))
+                     for position in range(32)}
+    return BenchmarkSession(cookies, local_storage, indexed_db)
@@ -0,0 +1,2 @@
+from .Benchmark import measure, run_benchmarks, compare_reports
+from .SessionGenerator import BenchmarkSession, generate_session, generate_record
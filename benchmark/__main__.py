@@ -0,0 +1,54 @@
+import argparse
+import json
+import logging
+import sys
+
+from benchmark.Benchmark import run_benchmarks, compare_reports
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmark',
+                                     description='Benchmark the session object model and session files.')
+    parser.add_argument('--dbs', type=int, default=1, help='number of IndexedDB databases')
+    parser.add_argument('--stores', type=int, default=4, help='number of object stores per database')
+    parser.add_argument('--records', type=int, default=1000, help='number of records per object store')
+    parser.add_argument('--indexes', type=int, default=2, help='number of non-unique indexes per object store')
+    parser.add_argument('--unique-indexes', type=int, default=1, help='number of unique indexes per object store')
+    parser.add_argument('--value-size', type=int, default=64, help='number of characters of the largest value')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random values')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measured runs per benchmark')
+    parser.add_argument('--case', action='append', dest='cases', help='only run this benchmark, can be repeated')
+    parser.add_argument('--output', help='write the report to this file')
+    parser.add_argument('--baseline', help='compare the report to this report, regressions fail the run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative increase of latency and memory compared to the baseline')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    log = logging.getLogger('benchmark')
+
+    config = {'db_num': args.dbs, 'store_num': args.stores, 'record_num': args.records,
+              'index_num': args.indexes, 'unique_index_num': args.unique_indexes, 'value_size': args.value_size,
+              'seed': args.seed}
+    report = run_benchmarks(config, args.repeat, args.cases)
+    for name, result in report['results'].items():
+        log.info('%-24s median %9.4fs  p95 %9.4fs  %12.0f records/s  peak %8.1f MiB  %8.1f bytes/record', name,
+                 result['latency']['median'], result['latency']['p95'], result['throughput'] or 0,
+                 result['peakMemory'] / 2 ** 20, result['memoryPerRecord'] or 0)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+        log.info('Wrote report: %s', args.output)
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        for regression in regressions:
+            log.error('Regression: %s', regression)
+        if len(regressions) > 0:
+            return 1
+        log.info('No regressions compared to %s.', args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
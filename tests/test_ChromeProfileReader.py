@@ -0,0 +1,385 @@
+import datetime
+import os
+import sqlite3
+import struct
+import tempfile
+import time
+import unittest
+
+from SessionHandler.ChromeProfileReader import ChromeProfileReader, decode_key
+from SessionHandler.LevelDB import read_leveldb
+from SessionHandler.SessionObject import SessionObject
+from SessionHandler.V8Deserializer import deserialize
+
+URL = 'https://web.whatsapp.com/'
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _length_prefixed(data: bytes) -> bytes:
+    return _varint(len(data)) + data
+
+
+def _log_record(record_type: int, fragment: bytes) -> bytes:
+    # The reader does not verify the checksum.
+    return b'\0' * 4 + struct.pack('<HB', len(fragment), record_type) + fragment
+
+
+def _write_batch(sequence: int, entries: list[tuple[bytes, object]]) -> bytes:
+    batch = struct.pack('<QI', sequence, len(entries))
+    for key, value in entries:
+        if value is None:
+            batch += b'\x00' + _length_prefixed(key)
+        else:
+            batch += b'\x01' + _length_prefixed(key) + _length_prefixed(value)
+    return batch
+
+
+def _snappy_block(data: bytes) -> bytes:
+    # a snappy block of a single literal
+    return _varint(len(data)) + bytes([61 << 2]) + struct.pack('<H', len(data) - 1) + data
+
+
+def _block(entries: list[tuple[bytes, bytes]]) -> bytes:
+    block = b''
+    previous = b''
+    for key, value in entries:
+        shared = 0
+        while shared < min(len(key), len(previous)) and key[shared] == previous[shared]:
+            shared += 1
+        block += _varint(shared) + _varint(len(key) - shared) + _varint(len(value)) + key[shared:] + value
+        previous = key
+    # a single restart point at the first entry
+    return block + struct.pack('<II', 0, 1)
+
+
+def _table(entries: list[tuple[bytes, int, int, bytes]], compressed: bool) -> bytes:
+    data_block = _block([(key + struct.pack('<Q', sequence << 8 | entry_type), value)
+                         for key, sequence, entry_type, value in entries])
+    if compressed:
+        data_block = _snappy_block(data_block)
+    table = data_block + bytes([1 if compressed else 0]) + b'\0' * 4
+    index_offset = len(table)
+    index_block = _block([(entries[-1][0] + b'\xff' * 8, _varint(0) + _varint(len(data_block)))])
+    table += index_block + b'\0' * 5
+    footer = _varint(0) + _varint(0) + _varint(index_offset) + _varint(len(index_block))
+    return table + footer.ljust(40, b'\0') + struct.pack('<Q', 0xdb4775248b80fb57)
+
+
+def _utf16(value: str) -> bytes:
+    return value.encode('utf-16-be')
+
+
+def _string_with_length(value: str) -> bytes:
+    return _varint(len(value)) + _utf16(value)
+
+
+def _key_prefix(db_id: int, os_id: int = 0, index_id: int = 0) -> bytes:
+    # All ids fit into one byte, so the byte holding their lengths is zero.
+    return bytes([0, db_id, os_id, index_id])
+
+
+def _idb_key(value: object) -> bytes:
+    if isinstance(value, str):
+        return b'\x01' + _string_with_length(value)
+    return b'\x03' + struct.pack('<d', value)
+
+
+def _key_path(value: str) -> bytes:
+    return b'\x00\x00\x01' + _string_with_length(value)
+
+
+def _v8_object(value: dict) -> bytes:
+    out = b'\xff\x0f\x6f'
+    for name, item in value.items():
+        out += b'\x22' + _length_prefixed(name.encode('latin-1'))
+        if isinstance(item, str):
+            out += b'\x22' + _length_prefixed(item.encode('latin-1'))
+        else:
+            # Smis are zigzag encoded.
+            out += b'\x49' + _varint(item << 1 if item >= 0 else (-item << 1) - 1)
+    return out + b'\x7b' + _varint(len(value))
+
+
+def _idb_value(data: bytes) -> bytes:
+    # Every value starts with the version of the record.
+    return _varint(1) + data
+
+
+class _TestSession(SessionObject):
+    def __init__(self):
+        super().__init__('Test', URL, 'test')
+
+    def get_idb_db_names(self) -> list[str]:
+        return ['wawc', 'missing']
+
+
+class LevelDBTest(unittest.TestCase):
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.__path = self.__temp_dir.name
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def __write(self, file_name: str, data: bytes):
+        with open(os.path.join(self.__path, file_name), 'wb') as file:
+            file.write(data)
+
+    def test_log_records(self):
+        large_value = bytes(range(256)) * 160
+        batch = _write_batch(3, [(b'large', large_value), (b'deleted', b'x')])
+        # The batch does not fit into one block and is split into a first and a last fragment.
+        first_length = 32768 - 7
+        log = _log_record(2, batch[:first_length]) + _log_record(4, batch[first_length:])
+        log += _log_record(1, _write_batch(5, [(b'deleted', None), (b'small', b'value')]))
+        # A torn record at the end of the log is dropped.
+        log += _log_record(1, _write_batch(7, [(b'torn', b'value')]))[:-3]
+        self.__write('000003.log', log)
+        self.assertEqual(read_leveldb(self.__path), {b'large': large_value, b'small': b'value'})
+
+    def test_table_blocks(self):
+        self.__write('000005.ldb', _table([(b'key-a', 2, 1, b'old'), (b'key-b', 1, 1, b'b'), (b'key-c', 4, 0, b'')],
+                                          compressed=False))
+        self.__write('000006.ldb', _table([(b'key-a', 8, 1, b'new'), (b'key-d', 9, 1, b'd' * 100)], compressed=True))
+        # Entries in the log replace entries of the tables with a lower sequence number.
+        self.__write('000007.log', _log_record(1, _write_batch(10, [(b'key-b', None)])))
+        self.assertEqual(read_leveldb(self.__path), {b'key-a': b'new', b'key-d': b'd' * 100})
+
+    def test_missing_directory(self):
+        with self.assertRaises(ValueError):
+            read_leveldb(os.path.join(self.__path, 'missing'))
+
+
+class IDBKeyTest(unittest.TestCase):
+    def test_decode_key(self):
+        cases = [
+            (b'\x00', None),
+            (b'\x01\x03\x00a\x00b\x00c', 'abc'),
+            (b'\x01\x03\x00\xe4\xd8\x3d\xde\x00', 'ä😀'),
+            (b'\x03' + struct.pack('<d', 42), 42),
+            (b'\x03' + struct.pack('<d', -1.5), -1.5),
+            (b'\x02' + struct.pack('<d', 1700000000123), datetime.datetime(2023, 11, 14, 22, 13, 20, 123000,
+                                                                          datetime.timezone.utc)),
+            (b'\x06\x03\x01\x02\xff', b'\x01\x02\xff'),
+            (b'\x04\x03\x03' + struct.pack('<d', 1) + b'\x01\x01\x00x\x04\x00', [1, 'x', []])
+        ]
+        for data, key in cases:
+            self.assertEqual(decode_key(data), key)
+
+    def test_invalid_key(self):
+        with self.assertRaises(ValueError):
+            decode_key(b'')
+        with self.assertRaises(ValueError):
+            decode_key(b'\x09')
+
+
+class V8DeserializerTest(unittest.TestCase):
+    # values serialized by V8 with their JSON.stringify results
+    CASES = [
+        ('ff0f4902', 1),
+        ('ff0f4909', -5),
+        ('ff0f4e000000000000e041', 2147483648),
+        ('ff0f4e000000000000f83f', 1.5),
+        ('ff0f4e000000000000f87f', None),
+        ('ff0f2203616263', 'abc'),
+        ('ff0f2203e4f6fc', 'äöü'),
+        ('ff0f631065006d006f006a00690020003dd800de', 'emoji 😀'),
+        ('ff0f54', True),
+        ('ff0f46', False),
+        ('ff0f5f', None),
+        ('ff0f6f490222036f6e654904220374776f220162490422016149022201755f22016e307b06',
+         {'1': 'one', '2': 'two', 'b': 2, 'a': 1, 'n': None}),
+        ('ff0f41054902220161305f6f2201784102490249042400027b01240005', [1, 'a', None, None, {'x': [1, 2]}]),
+        ('ff0f61034900490249044906400203', [1, None, 3]),
+        ('ff0f4400b08756febc7842', '2023-11-14T22:13:20.123Z'),
+        ('ff0f41036f22016149027b015e016f2201735e017b01240003', [{'a': 1}, {'a': 1}, {'s': {'a': 1}}]),
+        ('ff0f42030102ff5642000300', {'0': 1, '1': 2, '2': 255}),
+        ('ff0f6e0000000000001040', 4),
+        ('ff0f73220173', 's')
+    ]
+
+    def test_deserialize(self):
+        for hex_data, value in self.CASES:
+            data = bytes.fromhex(hex_data)
+            self.assertEqual(deserialize(data), value)
+            # Blink writes its own version envelope in front of the V8 data.
+            self.assertEqual(deserialize(b'\xff\x14' + data), value)
+            self.assertEqual(deserialize(b'\xff\x15\xfe' + b'\x00' * 12 + data), value)
+
+
+class ChromeProfileReaderTest(unittest.TestCase):
+    BLOB_NUMBER = 0x15a
+
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.__profile_dir = self.__temp_dir.name
+        self.__create_cookies()
+        self.__create_local_storage()
+        self.__create_idb()
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def __write_log(self, path: str, batches: list[list[tuple[bytes, object]]]):
+        os.makedirs(path)
+        log = b''
+        sequence = 1
+        for entries in batches:
+            log += _log_record(1, _write_batch(sequence, entries))
+            sequence += len(entries)
+        with open(os.path.join(path, '000003.log'), 'wb') as file:
+            file.write(log)
+
+    def __create_cookies(self):
+        os.makedirs(os.path.join(self.__profile_dir, 'Network'))
+        # microseconds since 1601-01-01
+        expires = int((time.time() + 11644473600 + 1000) * 1000000)
+        with sqlite3.connect(os.path.join(self.__profile_dir, 'Network', 'Cookies')) as connection:
+            connection.execute(
+                'CREATE TABLE cookies(creation_utc INTEGER, host_key TEXT, top_frame_site_key TEXT, name TEXT, '
+                'value TEXT, encrypted_value BLOB, path TEXT, expires_utc INTEGER, is_httponly INTEGER)'
+            )
+            connection.executemany('INSERT INTO cookies VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+                (1, 'web.whatsapp.com', '', 'wa_lang', 'en', b'', '/', expires, 0),
+                (2, '.whatsapp.com', '', 'domain', '1', b'', '/', expires, 0),
+                (3, 'web.whatsapp.com', '', 'session', 's', b'', '/', 0, 0),
+                (4, 'web.whatsapp.com', '', 'http_only', 'x', b'', '/', expires, 1),
+                (5, 'web.whatsapp.com', '', 'expired', 'x', b'', '/', 1, 0),
+                (6, 'example.com', '', 'other', 'x', b'', '/', expires, 0),
+                (7, '.web.whatsapp.com.example.com', '', 'suffix', 'x', b'', '/', expires, 0),
+                (8, 'web.whatsapp.com', '', 'sub_path', 'x', b'', '/sub', expires, 0),
+                (9, 'web.whatsapp.com', '', 'encrypted', '', b'v10secret', '/', expires, 0),
+                (10, 'web.whatsapp.com', 'https://example.com', 'partitioned', 'x', b'', '/', expires, 0)
+            ])
+        connection.close()
+
+    def __create_local_storage(self):
+        origin = b'_https://web.whatsapp.com\x00'
+        self.__write_log(os.path.join(self.__profile_dir, 'Local Storage', 'leveldb'), [[
+            (b'VERSION', b'1'),
+            (b'META:https://web.whatsapp.com', b'\x08\x01'),
+            (origin + b'\x01latin', b'\x01h\xe9llo'),
+            (origin + b'\x00' + 'ü😀'.encode('utf-16-le'), b'\x00' + 'wärt😀'.encode('utf-16-le')),
+            (origin + b'\x01deleted', b'\x01x'),
+            (b'_https://web.whatsapp.com:8080\x00\x01port', b'\x01x'),
+            (b'_https://example.com\x00\x01other', b'\x01x')
+        ], [
+            (origin + b'\x01deleted', None)
+        ]])
+
+    def __create_idb(self):
+        idb_dir = os.path.join(self.__profile_dir, 'IndexedDB')
+        blob_dir = os.path.join(idb_dir, 'https_web.whatsapp.com_0.indexeddb.blob', '2', '01')
+        os.makedirs(blob_dir)
+        with open(os.path.join(blob_dir, f'{self.BLOB_NUMBER:x}'), 'wb') as file:
+            file.write(b'\xff\x14' + _v8_object({'id': 'blob', 'type': 2, 'text': 'y' * 100}))
+
+        def database_name(name: str) -> bytes:
+            return _key_prefix(0) + b'\xc9' + _string_with_length('https_web.whatsapp.com_0@1') + \
+                _string_with_length(name)
+
+        def object_store_meta(db_id: int, os_id: int, name: str, key_path: bytes, auto_increment: bool) -> list:
+            prefix = _key_prefix(db_id) + b'\x32' + _varint(os_id)
+            return [(prefix + b'\x00', _utf16(name)), (prefix + b'\x01', key_path),
+                    (prefix + b'\x02', b'\x01' if auto_increment else b'\x00')]
+
+        def index_meta(db_id: int, os_id: int, index_id: int, name: str, key_path: str, unique: bool,
+                       multi_entry: bool) -> list:
+            prefix = _key_prefix(db_id) + b'\x64' + _varint(os_id) + _varint(index_id)
+            return [(prefix + b'\x00', _utf16(name)), (prefix + b'\x01', b'\x01' if unique else b'\x00'),
+                    (prefix + b'\x02', _key_path(key_path)), (prefix + b'\x03', b'\x01' if multi_entry else b'\x00')]
+
+        def record(db_id: int, os_id: int, key: object, value: bytes) -> tuple[bytes, bytes]:
+            return _key_prefix(db_id, os_id, 1) + _idb_key(key), _idb_value(value)
+
+        snappy_value = b'\xff\x14' + _v8_object({'id': 'snappy', 'type': 1, 'text': 'x' * 100})
+        blob_value = b'\xff\x14' + _v8_object({'id': 'blob', 'type': 2, 'text': 'y' * 100})
+        # type byte, blob number, type, size
+        blob_info = b'\x00' + _varint(self.BLOB_NUMBER) + _string_with_length('') + _varint(len(blob_value))
+        self.__write_log(os.path.join(idb_dir, 'https_web.whatsapp.com_0.indexeddb.leveldb'), [[
+            # The database ids are not assigned in the order of the names.
+            (database_name('wawc'), b'\x02'),
+            (database_name('other'), b'\x01'),
+            (_key_prefix(2) + b'\x04', _varint(80)),
+            (_key_prefix(1) + b'\x04', _varint(3)),
+            *object_store_meta(2, 1, 'user', _key_path('id'), True),
+            *object_store_meta(2, 2, 'files', b'\x00\x00\x00', False),
+            *index_meta(2, 1, 30, 'byType', 'type', False, False),
+            *index_meta(2, 1, 31, 'byName', 'name', True, False),
+            *object_store_meta(1, 1, 'user', _key_path('id'), False),
+            record(1, 1, 'other', _v8_object({'id': 'other'})),
+            # The records are written in a different order than IndexedDB sorts their keys.
+            record(2, 1, 'b', b'\xff\x14' + _v8_object({'id': 'b', 'type': 1})),
+            record(2, 1, 'a', _v8_object({'id': 'a', 'type': 2, 'name': 'n'})),
+            record(2, 1, 10, _v8_object({'id': 10, 'type': 1})),
+            record(2, 1, -1, _v8_object({'id': -1, 'type': 3})),
+            record(2, 1, 'snappy', b'\xff\x11\x02' + _snappy_block(snappy_value)),
+            record(2, 1, 'blob', b'\xff\x11\x01' + _varint(len(blob_value)) + _varint(0)),
+            (_key_prefix(2, 1, 3) + _idb_key('blob'), blob_info),
+            record(2, 2, 1, _v8_object({'file': 'f'}))
+        ]])
+
+    def test_has_origin_storage(self):
+        reader = ChromeProfileReader(self.__profile_dir)
+        self.assertTrue(reader.has_origin_storage(URL))
+        self.assertFalse(reader.has_origin_storage('https://example.com/'))
+        with self.assertRaises(ValueError):
+            ChromeProfileReader(os.path.join(self.__profile_dir, 'missing'))
+
+    def test_get_cookies(self):
+        cookies = ChromeProfileReader(self.__profile_dir).get_cookies(URL)
+        self.assertEqual(cookies, {'wa_lang': 'en', 'domain': '1', 'session': 's'})
+
+    def test_get_local_storage(self):
+        local_storage = ChromeProfileReader(self.__profile_dir).get_local_storage(URL)
+        self.assertEqual(local_storage, {'latin': 'héllo', 'ü😀': 'wärt😀'})
+
+    def test_get_session(self):
+        session = ChromeProfileReader(self.__profile_dir).get_session(_TestSession())
+        self.assertEqual(session.cookies, {'wa_lang': 'en', 'domain': '1', 'session': 's'})
+        self.assertEqual(session.indexed_db.get_db_num(), 1)
+        idb_db = session.indexed_db.get_db('wawc')
+        self.assertEqual(idb_db.version, 80)
+        self.assertEqual([object_store.name for object_store in idb_db.get_object_stores()], ['files', 'user'])
+        user = idb_db.get_object_store('user')
+        self.assertEqual(user.key_path, ['id'])
+        self.assertTrue(user.auto_increment)
+        self.assertEqual(user.get_indices(), {
+            'byName': {'unique': True, 'keyPath': 'name', 'multiEntry': False},
+            'byType': {'unique': False, 'keyPath': 'type', 'multiEntry': False}
+        })
+        self.assertEqual([record['id'] for record in user.get_data()], [-1, 10, 'a', 'b', 'blob', 'snappy'])
+        self.assertEqual(user.get('snappy'), {'id': 'snappy', 'type': 1, 'text': 'x' * 100})
+        self.assertEqual(user.get('blob'), {'id': 'blob', 'type': 2, 'text': 'y' * 100})
+        self.assertEqual(user.get_by_index('n', 'byName')['id'], 'a')
+        files = idb_db.get_object_store('files')
+        self.assertEqual(files.key_path, [])
+        self.assertFalse(files.auto_increment)
+        self.assertEqual(list(files.get_data()), [{'file': 'f'}])
+
+    def test_get_indexed_db(self):
+        indexed_db = ChromeProfileReader(self.__profile_dir).get_indexed_db(URL)
+        self.assertEqual(indexed_db.get_db_num(), 2)
+        other = indexed_db.get_db('other')
+        self.assertEqual(other.version, 3)
+        self.assertEqual(list(other.get_object_store('user').get_data()), [{'id': 'other'}])
+        self.assertEqual(ChromeProfileReader(self.__profile_dir).get_indexed_db('https://example.com/').get_db_num(),
+                         0)
+
+    def test_missing_blob(self):
+        blob_dir = os.path.join(self.__profile_dir, 'IndexedDB', 'https_web.whatsapp.com_0.indexeddb.blob')
+        os.remove(os.path.join(blob_dir, '2', '01', f'{self.BLOB_NUMBER:x}'))
+        with self.assertRaises(ValueError):
+            ChromeProfileReader(self.__profile_dir).get_session(_TestSession())
+
+
+if __name__ == '__main__':
+    unittest.main()
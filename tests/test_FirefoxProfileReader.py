@@ -0,0 +1,252 @@
+import os
+import sqlite3
+import struct
+import tempfile
+import time
+import unittest
+from typing import Optional
+
+from SessionHandler.FirefoxProfileReader import FirefoxProfileReader, decode_key, decode_structured_clone, \
+    get_origin_dir_name
+from SessionHandler.SessionObject import SessionObject
+
+URL = 'https://web.whatsapp.com/'
+
+
+class _TestSession(SessionObject):
+    def __init__(self):
+        super().__init__('Test', URL, 'test')
+
+    def get_idb_db_names(self) -> list[str]:
+        return ['wawc']
+
+
+def _snappy_literal(data: bytes) -> bytes:
+    if len(data) <= 60:
+        return bytes([(len(data) - 1) << 2]) + data
+    return bytes([61 << 2]) + struct.pack('<H', len(data) - 1) + data
+
+
+def _snappy_compress(data: bytes) -> bytes:
+    # Data that starts with a repeated 8 byte pattern is compressed with copies, other data with a literal.
+    length = bytearray()
+    value = len(data)
+    while value >= 0x80:
+        length.append(value & 0x7f | 0x80)
+        value >>= 7
+    length.append(value)
+    out = bytes(length)
+    pattern = data[:8]
+    rest = data[len(pattern):]
+    if len(pattern) < 8 or not rest.startswith(pattern * 4):
+        return out + _snappy_literal(data)
+    # a 2 byte offset copy of 24 bytes that overlaps its output and a 1 byte offset copy of 8 bytes
+    out += _snappy_literal(pattern)
+    out += bytes([(24 - 1) << 2 | 2]) + struct.pack('<H', 8)
+    out += bytes([(8 - 4) << 2 | 1, 8])
+    rest = rest[32:]
+    return out + (_snappy_literal(rest) if rest else b'')
+
+
+def _snappy_frame(data: bytes) -> bytes:
+    def chunk(chunk_type: int, payload: bytes) -> bytes:
+        return bytes([chunk_type]) + len(payload).to_bytes(3, 'little') + payload
+    # The decoder does not verify the checksums.
+    return chunk(0xff, b'sNaPpY') + chunk(0x00, b'\0' * 4 + _snappy_compress(data)) + chunk(0x01, b'\0' * 4 + b'')
+
+
+def _clone_pair(out: bytearray, tag: int, data: int):
+    out += struct.pack('<II', data, tag)
+
+
+def _clone_string(out: bytearray, value: str):
+    try:
+        encoded = value.encode('latin-1')
+        _clone_pair(out, 0xFFFF0004, len(value) | 0x80000000)
+    except UnicodeEncodeError:
+        encoded = value.encode('utf-16-le')
+        _clone_pair(out, 0xFFFF0004, len(encoded) // 2)
+    out += encoded + b'\0' * (-len(encoded) % 8)
+
+
+def _clone_value(out: bytearray, value: object):
+    if value is None:
+        _clone_pair(out, 0xFFFF0000, 0)
+    elif isinstance(value, bool):
+        _clone_pair(out, 0xFFFF0002, int(value))
+    elif isinstance(value, int) and -2 ** 31 <= value < 2 ** 31:
+        _clone_pair(out, 0xFFFF0003, value & 0xFFFFFFFF)
+    elif isinstance(value, (int, float)):
+        out += struct.pack('<d', value)
+    elif isinstance(value, str):
+        _clone_string(out, value)
+    elif isinstance(value, list):
+        _clone_pair(out, 0xFFFF0007, len(value))
+        for position, item in enumerate(value):
+            _clone_pair(out, 0xFFFF0003, position)
+            _clone_value(out, item)
+        _clone_pair(out, 0xFFFF0013, 0)
+    else:
+        _clone_pair(out, 0xFFFF0008, 0)
+        for name, item in value.items():
+            _clone_string(out, name)
+            _clone_value(out, item)
+        _clone_pair(out, 0xFFFF0013, 0)
+
+
+def _structured_clone(value: object) -> bytes:
+    out = bytearray(struct.pack('<II', 0, 0xFFF10000))
+    _clone_value(out, value)
+    return bytes(out)
+
+
+def _encode_key(value: object, out: Optional[bytearray] = None, type_offset: int = 0) -> bytearray:
+    out = bytearray() if out is None else out
+    if isinstance(value, list):
+        # The array marker is added to the type of the first element, up to 3 nested arrays share one byte.
+        if type_offset == 0x50 * 3:
+            out.append(type_offset)
+            type_offset = 0
+        type_offset += 0x50
+        for item in value:
+            _encode_key(item, out, type_offset)
+            type_offset = 0
+        out.append(type_offset)
+    elif isinstance(value, str):
+        out.append(0x30 + type_offset)
+        units = struct.unpack(f'<{len(value.encode("utf-16-le")) // 2}H', value.encode('utf-16-le'))
+        for unit in units:
+            if unit <= 0x7E:
+                out.append(unit + 1)
+            elif unit <= 0x3FFF + 0x7F:
+                out += (unit - 0x7F + 0x8000).to_bytes(2, 'big')
+            else:
+                out += ((unit << 6) | 0xC00000).to_bytes(3, 'big')
+        out.append(0)
+    else:
+        bits, = struct.unpack('<Q', struct.pack('<d', value))
+        bits = -bits & 0xFFFFFFFFFFFFFFFF if bits & 0x8000000000000000 else bits | 0x8000000000000000
+        out.append(0x10 + type_offset)
+        out += bits.to_bytes(8, 'big')
+    return out
+
+
+def _key(value: object) -> bytes:
+    # Firefox trims trailing zero bytes of keys.
+    return bytes(_encode_key(value)).rstrip(b'\0')
+
+
+class DecoderTest(unittest.TestCase):
+    def test_snappy_round_trip(self):
+        from SessionHandler import Snappy
+        data = b'abcdefgh' * 5 + b'tail' * 20
+        self.assertEqual(Snappy.decompress(_snappy_compress(data)), data)
+        self.assertEqual(Snappy.decompress_framed(_snappy_frame(data)), data)
+        with self.assertRaises(ValueError):
+            Snappy.decompress(_snappy_compress(data)[:-1])
+
+    def test_decode_key(self):
+        for value in [1, -2.5, 0, 'abc', 'ü€😀\x7f', [1, 'a', [2, []]], [[[[1]]]], ['x'], []]:
+            self.assertEqual(decode_key(_key(value)), value)
+
+    def test_decode_structured_clone(self):
+        value = {'a': 1, 'b': [1, 'x', None, {'c': 2.5}], 'u': '😀ü', 'big': 2 ** 40, 'n': -3.75, 't': True}
+        self.assertEqual(decode_structured_clone(_structured_clone(value)), value)
+
+
+class FirefoxProfileReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.__profile_dir = self.__temp_dir.name
+        origin_dir = os.path.join(self.__profile_dir, 'storage', 'default', get_origin_dir_name(URL))
+        os.makedirs(os.path.join(origin_dir, 'idb', '3310948317wcaw.files'))
+        os.makedirs(os.path.join(origin_dir, 'ls'))
+        self.__create_cookies()
+        self.__create_local_storage(os.path.join(origin_dir, 'ls', 'data.sqlite'))
+        self.__create_idb(os.path.join(origin_dir, 'idb', '3310948317wcaw.sqlite'))
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def __create_cookies(self):
+        expiry = int(time.time()) + 1000
+        with sqlite3.connect(os.path.join(self.__profile_dir, 'cookies.sqlite')) as connection:
+            connection.execute(
+                "CREATE TABLE moz_cookies(id INTEGER PRIMARY KEY, originAttributes TEXT NOT NULL DEFAULT '', "
+                "name TEXT, value TEXT, host TEXT, path TEXT, expiry INTEGER, creationTime INTEGER, "
+                "isHttpOnly INTEGER)"
+            )
+            connection.executemany(
+                'INSERT INTO moz_cookies(name, value, host, path, expiry, creationTime, isHttpOnly) '
+                'VALUES(?, ?, ?, ?, ?, ?, ?)', [
+                    ('wa_lang', 'en', '.web.whatsapp.com', '/', expiry, 1, 0),
+                    ('domain', '1', '.whatsapp.com', '/', expiry * 1000, 2, 0),
+                    ('http_only', 'x', 'web.whatsapp.com', '/', expiry, 3, 1),
+                    ('expired', 'x', 'web.whatsapp.com', '/', 1, 4, 0),
+                    ('other', 'x', 'example.com', '/', expiry, 5, 0),
+                    ('sub_path', 'x', 'web.whatsapp.com', '/sub', expiry, 6, 0)
+                ]
+            )
+        connection.close()
+
+    @staticmethod
+    def __create_local_storage(path: str):
+        with sqlite3.connect(path) as connection:
+            connection.execute(
+                'CREATE TABLE data(key TEXT PRIMARY KEY, utf16_length INTEGER, conversion_type INTEGER, '
+                'compression_type INTEGER, last_access_time INTEGER, value BLOB)'
+            )
+            connection.execute("INSERT INTO data VALUES('plain', 5, 1, 0, 0, ?)", ('héllo'.encode(),))
+            compressed = _snappy_compress(('WANoise!' * 6).encode())
+            connection.execute("INSERT INTO data VALUES('compressed', 48, 1, 1, 0, ?)", (compressed,))
+        connection.close()
+
+    @staticmethod
+    def __create_idb(path: str):
+        with sqlite3.connect(path) as connection:
+            connection.executescript("""
+                CREATE TABLE database(name TEXT PRIMARY KEY, origin TEXT, version INTEGER);
+                CREATE TABLE object_store(id INTEGER PRIMARY KEY, auto_increment INTEGER, name TEXT, key_path TEXT);
+                CREATE TABLE object_store_index(id INTEGER PRIMARY KEY, object_store_id INTEGER, name TEXT,
+                    key_path TEXT, unique_index INTEGER, multientry INTEGER, locale TEXT, is_auto_locale BOOLEAN);
+                CREATE TABLE object_data(object_store_id INTEGER, key BLOB, index_data_values BLOB, file_ids TEXT,
+                    data BLOB, PRIMARY KEY(object_store_id, key)) WITHOUT ROWID;
+                INSERT INTO database VALUES('wawc', 'https://web.whatsapp.com', 80);
+                INSERT INTO object_store VALUES(1, 0, 'user', 'key');
+                INSERT INTO object_store VALUES(2, 0, 'files', NULL);
+                INSERT INTO object_store_index VALUES(1, 1, 'byType', 'type', 0, 0, NULL, 0);
+            """)
+            for record in [{'key': 'b', 'type': 1}, {'key': 'a', 'type': 2}, {'key': 10, 'type': 1}]:
+                connection.execute(
+                    'INSERT INTO object_data VALUES(1, ?, NULL, NULL, ?)',
+                    (_key(record['key']), _snappy_compress(_structured_clone(record)))
+                )
+            # Large values are stored in a file with the file id as data.
+            with open(os.path.join(os.path.splitext(path)[0] + '.files', '7'), 'wb') as file:
+                file.write(_snappy_frame(_structured_clone({'large': 'y' * 100})))
+            connection.execute("INSERT INTO object_data VALUES(2, ?, NULL, '.7', 7)", (_key(1),))
+        connection.close()
+
+    def test_has_origin_storage(self):
+        reader = FirefoxProfileReader(self.__profile_dir)
+        self.assertTrue(reader.has_origin_storage(URL))
+        self.assertFalse(reader.has_origin_storage('https://example.com/'))
+
+    def test_get_session(self):
+        session = FirefoxProfileReader(self.__profile_dir).get_session(_TestSession())
+        self.assertEqual(session.cookies, {'wa_lang': 'en', 'domain': '1'})
+        self.assertEqual(session.local_storage, {'plain': 'héllo', 'compressed': 'WANoise!' * 6})
+        self.assertEqual(session.indexed_db.get_db_num(), 1)
+        idb_db = session.indexed_db.get_db('wawc')
+        self.assertEqual(idb_db.version, 80)
+        self.assertEqual([object_store.name for object_store in idb_db.get_object_stores()], ['files', 'user'])
+        user = idb_db.get_object_store('user')
+        self.assertEqual([record['key'] for record in user.get_data()], [10, 'a', 'b'])
+        self.assertEqual(user.get_indices(), {'byType': {'unique': False, 'keyPath': 'type', 'multiEntry': False}})
+        self.assertEqual(user.get_by_index(2, 'byType'), {'key': 'a', 'type': 2})
+        files = idb_db.get_object_store('files')
+        self.assertEqual(list(files.get_data()), [{'large': 'y' * 100}])
+
+
+if __name__ == '__main__':
+    unittest.main()
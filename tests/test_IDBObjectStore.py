@@ -0,0 +1,134 @@
+import datetime
+import unittest
+
+from SessionHandler.IDBKey import IDBKeyRange
+from SessionHandler.SessionObject import IDBObjectStore
+
+DATE = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)
+
+
+class IDBObjectStoreQueryTest(unittest.TestCase):
+    compact = False
+
+    def setUp(self):
+        self.store = IDBObjectStore('messages', False, 'id')
+        self.store.create_index('byChat', {'keyPath': 'chat'})
+        self.store.create_index('byTag', {'keyPath': 'tags', 'multiEntry': True})
+        self.store.create_index('byRef', {'keyPath': 'ref', 'unique': True})
+        self.store.set_compact(self.compact)
+        for record in [
+            {'id': 5, 'chat': 'b', 'tags': ['x', 'y'], 'ref': 'r5'},
+            {'id': 1, 'chat': 'a', 'tags': ['y'], 'ref': 'r1'},
+            {'id': 3, 'chat': 'b', 'tags': ['x', 'x'], 'ref': 'r3'},
+            {'id': 2, 'chat': 'a', 'tags': [], 'ref': 'r2'},
+            {'id': 4, 'chat': 'c', 'tags': 'z', 'ref': 'r4'}
+        ]:
+            self.store.add_data(record)
+
+    def __ids(self, records) -> list:
+        return [record['id'] for record in records]
+
+    def test_get(self):
+        self.assertEqual(self.store.get(3)['ref'], 'r3')
+        self.assertIsNone(self.store.get(9))
+        self.assertEqual(self.store.get(IDBKeyRange.lower_bound(3, True))['id'], 4)
+        with self.assertRaises(ValueError):
+            self.store.get(True)
+
+    def test_get_by_index(self):
+        # The first record by primary key is returned if several records have the same index key.
+        self.assertEqual(self.store.get_by_index('b', 'byChat')['id'], 3)
+        self.assertEqual(self.store.get_by_index('r4', 'byRef')['id'], 4)
+        self.assertIsNone(self.store.get_by_index('d', 'byChat'))
+        with self.assertRaises(KeyError):
+            self.store.get_by_index('a', 'missing')
+
+    def test_get_all_by_index(self):
+        self.assertEqual(self.__ids(self.store.get_all_by_index('a', 'byChat')), [1, 2])
+        self.assertEqual(self.__ids(self.store.get_all_by_index(index='byChat')), [1, 2, 3, 5, 4])
+        self.assertEqual(self.__ids(self.store.get_all_by_index()), [1, 2, 3, 4, 5])
+
+    def test_key_ranges(self):
+        cases = [
+            (IDBKeyRange.bound(2, 4), [2, 3, 4]),
+            (IDBKeyRange.bound(2, 4, True, False), [3, 4]),
+            (IDBKeyRange.bound(2, 4, False, True), [2, 3]),
+            (IDBKeyRange.bound(2, 4, True, True), [3]),
+            (IDBKeyRange.lower_bound(4), [4, 5]),
+            (IDBKeyRange.lower_bound(4, True), [5]),
+            (IDBKeyRange.upper_bound(2), [1, 2]),
+            (IDBKeyRange.upper_bound(2, True), [1]),
+            (IDBKeyRange.only(3), [3]),
+            (IDBKeyRange.bound(2.5, 2.75), [])
+        ]
+        for key_range, ids in cases:
+            self.assertEqual(self.__ids(self.store.iterate(key_range)), ids)
+            self.assertEqual(self.store.count(key_range), len(ids))
+        self.assertEqual(self.__ids(self.store.iterate(IDBKeyRange.bound('a', 'b', True), 'byChat')), [3, 5])
+        with self.assertRaises(ValueError):
+            IDBKeyRange.bound(4, 2)
+        with self.assertRaises(ValueError):
+            IDBKeyRange.bound(2, 2, True)
+
+    def test_directions(self):
+        self.assertEqual(self.__ids(self.store.iterate(index='byChat')), [1, 2, 3, 5, 4])
+        self.assertEqual(self.__ids(self.store.iterate(index='byChat', direction='prev')), [4, 5, 3, 2, 1])
+        self.assertEqual(self.__ids(self.store.iterate(index='byChat', direction='nextunique')), [1, 3, 4])
+        # Like IndexedDB, prevunique returns the first record of every key.
+        self.assertEqual(self.__ids(self.store.iterate(index='byChat', direction='prevunique')), [4, 3, 1])
+        self.assertEqual(self.__ids(self.store.iterate(IDBKeyRange.upper_bound(3), direction='prev')), [3, 2, 1])
+        with self.assertRaises(ValueError):
+            list(self.store.iterate(direction='sideways'))
+
+    def test_multi_entry(self):
+        # Every array item is an index key, duplicate items only count once.
+        self.assertEqual(self.__ids(self.store.get_all_by_index('x', 'byTag')), [3, 5])
+        self.assertEqual(self.__ids(self.store.get_all_by_index('y', 'byTag')), [1, 5])
+        self.assertEqual(self.__ids(self.store.get_all_by_index('z', 'byTag')), [4])
+        self.assertEqual(self.store.count(index='byTag'), 5)
+        self.assertEqual(self.__ids(self.store.iterate(index='byTag', direction='nextunique')), [3, 1, 4])
+
+    def test_unique_index(self):
+        with self.assertRaises(ValueError):
+            self.store.add_data({'id': 6, 'ref': 'r1'})
+        self.assertEqual(self.store.get_data_num(), 5)
+
+    def test_changes_update_indexes(self):
+        self.store.get_all_by_index('a', 'byChat')
+        self.store.add_data({'id': 0, 'chat': 'a', 'tags': ['x'], 'ref': 'r0'})
+        self.assertEqual(self.__ids(self.store.get_all_by_index('a', 'byChat')), [0, 1, 2])
+        self.store.apply_changes([{'id': 1, 'chat': 'c', 'tags': [], 'ref': 'r1'}], [0, 5])
+        self.assertEqual(self.__ids(self.store.get_all_by_index('a', 'byChat')), [2])
+        self.assertEqual(self.__ids(self.store.get_all_by_index('c', 'byChat')), [1, 4])
+        self.assertEqual(self.__ids(self.store.get_all_by_index('x', 'byTag')), [3])
+
+
+class CompactIDBObjectStoreQueryTest(IDBObjectStoreQueryTest):
+    compact = True
+
+
+class IDBKeyOrderTest(unittest.TestCase):
+    def test_mixed_key_types(self):
+        # IndexedDB orders keys by type first: number < date < string < binary < array.
+        keys = [[1], b'\x00', 'a', '', DATE, 10, -1.5, [], b'', [0, 'a'], 'B']
+        store = IDBObjectStore('mixed', False, 'key')
+        for key in keys:
+            store.add_data({'key': key})
+        expected = [-1.5, 10, DATE, '', 'B', 'a', b'', b'\x00', [], [0, 'a'], [1]]
+        self.assertEqual([record['key'] for record in store.iterate()], expected)
+        self.assertEqual([record['key'] for record in store.iterate(IDBKeyRange.bound(DATE, b'\xff'))],
+                         [DATE, '', 'B', 'a', b'', b'\x00'])
+        self.assertEqual(store.get(DATE.replace())['key'], DATE)
+        self.assertEqual(store.get([0, 'a'])['key'], [0, 'a'])
+
+    def test_compound_key_path(self):
+        store = IDBObjectStore('compound', False, ['chat', 'id'])
+        for chat, position in [('b', 1), ('a', 2), ('a', 1)]:
+            store.add_data({'chat': chat, 'id': position})
+        self.assertEqual([(record['chat'], record['id']) for record in store.iterate()],
+                         [('a', 1), ('a', 2), ('b', 1)])
+        self.assertEqual(store.count(IDBKeyRange.bound(['a'], ['a', []])), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import io
+import os
+import tempfile
+import unittest
+
+from SessionHandler.SessionContainer import CODECS, SessionContainerReader, SessionContainerWriter
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+URL = 'https://web.whatsapp.com/'
+
+
+def _create_session() -> SessionObject:
+    object_store = IDBObjectStore('message', False, 'id')
+    object_store.create_index('byChat', {'keyPath': 'chat'})
+    for position in range(50):
+        object_store.add_data({'id': position, 'chat': f'chat-{position % 4}', 'text': 'ü' * position})
+    idb_db = IDBDatabase('wawc', 3)
+    idb_db.add_object_store(object_store)
+    idb_db.add_object_store(IDBObjectStore('empty', True, 'key'))
+    indexed_db = IndexedDB(URL)
+    indexed_db.add_db(idb_db)
+    return SessionObject('Test', URL, 'test', {'wa_lang': 'en'}, {'last-wid': '"123@c.us"'}, indexed_db)
+
+
+class SessionContainerTest(unittest.TestCase):
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.__path = os.path.join(self.__temp_dir.name, 'session.test')
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def __write_container(self, codec: str) -> bytes:
+        file = io.BytesIO()
+        writer = SessionContainerWriter(file, codec)
+        writer.add_section('text', b'abc' * 1000)
+        writer.add_json_section('json', {'a': [1, 2]})
+        writer.add_section('raw', b'\x00\xff', 'none')
+        writer.close()
+        with open(self.__path, 'wb') as container_file:
+            container_file.write(file.getvalue())
+        return file.getvalue()
+
+    def test_sections(self):
+        for codec in CODECS:
+            with self.subTest(codec=codec):
+                self.__write_container(codec)
+                with SessionContainerReader(self.__path) as reader:
+                    self.assertEqual(reader.get_section_names(), ['text', 'json', 'raw'])
+                    self.assertEqual(reader.read_section('text'), b'abc' * 1000)
+                    self.assertEqual(reader.read_json_section('json'), {'a': [1, 2]})
+                    self.assertEqual(reader.read_section('raw'), b'\x00\xff')
+                    self.assertEqual(reader.get_section_size('text'), 3000)
+                    with self.assertRaises(KeyError):
+                        reader.read_section('missing')
+                with self.assertRaises(ValueError):
+                    reader.read_section('text')
+
+    def test_duplicate_section(self):
+        writer = SessionContainerWriter(io.BytesIO())
+        writer.add_section('a', b'')
+        with self.assertRaises(ValueError):
+            writer.add_section('a', b'')
+        with self.assertRaises(ValueError):
+            SessionContainerWriter(io.BytesIO(), 'unknown')
+
+    def test_session_round_trip(self):
+        session = _create_session()
+        for codec in CODECS:
+            for lazy in (False, True):
+                with self.subTest(codec=codec, lazy=lazy):
+                    session.save_to_file(self.__path, binary=True, codec=codec)
+                    with SessionObject.create_from_file(self.__path, lazy=lazy) as loaded_session:
+                        object_store = loaded_session.indexed_db.get_db('wawc').get_object_store('message')
+                        self.assertEqual(object_store.is_loaded(), not lazy)
+                        self.assertEqual(loaded_session.cookies, session.cookies)
+                        self.assertEqual(loaded_session.local_storage, session.local_storage)
+                        self.assertEqual(loaded_session.indexed_db.as_dict(), session.indexed_db.as_dict())
+                        self.assertEqual(object_store.get_by_index('chat-1', 'byChat')['id'], 1)
+                        self.assertEqual(loaded_session.get_fingerprint(), session.get_fingerprint())
+
+    def test_lazy_session_resaved_to_same_path(self):
+        _create_session().save_to_file(self.__path, binary=True)
+        loaded_session = SessionObject.create_from_file(self.__path, lazy=True)
+        loaded_session.save_to_file(self.__path, binary=True, codec='lzma')
+        self.assertEqual(SessionObject.create_from_file(self.__path).indexed_db.as_dict(),
+                         _create_session().indexed_db.as_dict())
+
+    def test_truncated_file(self):
+        data = self.__write_container('zlib')
+        for length in (0, 10, 28, len(data) // 2, len(data) - 1):
+            with self.subTest(length=length):
+                with open(self.__path, 'wb') as file:
+                    file.write(data[:length])
+                with self.assertRaises(ValueError):
+                    SessionContainerReader(self.__path)
+
+    def test_truncated_session(self):
+        _create_session().save_to_file(self.__path, binary=True)
+        with open(self.__path, 'rb') as file:
+            data = file.read()
+        with open(self.__path, 'wb') as file:
+            file.write(data[:len(data) - 20])
+        with self.assertRaises(ValueError):
+            SessionObject.create_from_file(self.__path)
+
+    def test_corrupted_section(self):
+        # Uncompressed sections have no checksum, changed bytes are only detected by the codecs.
+        for codec in ('zlib', 'lzma', 'bz2'):
+            with self.subTest(codec=codec):
+                data = bytearray(self.__write_container(codec))
+                # The first section starts right after the file header.
+                for position in range(28, 60):
+                    data[position] ^= 0x55
+                with open(self.__path, 'wb') as file:
+                    file.write(data)
+                with SessionContainerReader(self.__path) as reader:
+                    with self.assertRaises(ValueError):
+                        reader.read_section('text')
+
+    def test_corrupted_section_table(self):
+        data = bytearray(self.__write_container('zlib'))
+        # Point the last section of the table past the end of the file.
+        data[-8 - 8 - 8 - 1:-8 - 8] = b'\xff' * 9
+        with open(self.__path, 'wb') as file:
+            file.write(data)
+        with self.assertRaises(ValueError):
+            SessionContainerReader(self.__path)
+
+
+if __name__ == '__main__':
+    unittest.main()
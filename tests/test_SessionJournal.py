@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+import unittest
+from typing import NoReturn
+
+from SessionHandler.SessionJournal import SessionJournal, diff_sessions, get_journal_path
+from SessionHandler.SessionContainer import is_container
+from SessionHandler.SessionObject import SessionObject, IndexedDB, IDBDatabase, IDBObjectStore
+
+URL = 'https://web.whatsapp.com/'
+
+
+def _create_session() -> SessionObject:
+    object_store = IDBObjectStore('message', False, 'id')
+    object_store.create_index('byChat', {'keyPath': 'chat'})
+    object_store.create_index('byRef', {'keyPath': 'ref', 'unique': True})
+    for position in range(50):
+        object_store.add_data({'id': position, 'chat': f'chat-{position % 4}', 'ref': f'r{position}',
+                               'text': 'ü' * position})
+    keyless_store = IDBObjectStore('keyless', False, None)
+    keyless_store.add_data({'value': 1})
+    idb_db = IDBDatabase('wawc', 3)
+    idb_db.add_object_store(object_store)
+    idb_db.add_object_store(keyless_store)
+    indexed_db = IndexedDB(URL)
+    indexed_db.add_db(idb_db)
+    session = SessionObject('Test', URL, 'test', {'wa_lang': 'en'}, {'last-wid': '"123@c.us"'}, indexed_db)
+    session.capture_time = 1000.0
+    return session
+
+
+def _change_session(session: SessionObject, text: str) -> NoReturn:
+    message = session.indexed_db.get_db('wawc').get_object_store('message')
+    message.apply_changes([{'id': 1, 'chat': 'chat-9', 'ref': 'r1', 'text': text},
+                           {'id': 100, 'chat': 'chat-0', 'ref': 'r100', 'text': text}], [2, 3])
+    session.local_storage = dict(session.local_storage, text=text)
+    session.capture_time += 1
+
+
+class SessionJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.__path = os.path.join(self.__temp_dir.name, 'session.test')
+
+    def tearDown(self):
+        self.__temp_dir.cleanup()
+
+    def __assert_session_equal(self, first: SessionObject, second: SessionObject):
+        self.assertEqual(first.cookies, second.cookies)
+        self.assertEqual(first.local_storage, second.local_storage)
+        self.assertEqual(first.indexed_db.as_dict(), second.indexed_db.as_dict())
+        self.assertEqual(first.capture_time, second.capture_time)
+
+    def __save_with_journal(self, binary: bool) -> tuple[SessionObject, SessionObject]:
+        # Returns the saved base state and the state the journal leads to.
+        session = _create_session()
+        session.save_to_file(self.__path, binary=binary)
+        base_session = _create_session()
+        _change_session(session, 'first')
+        session.save_to_file(self.__path, incremental=True, compact_threshold=10)
+        return base_session, session
+
+    def test_incremental_save(self):
+        for binary in (False, True):
+            with self.subTest(binary=binary):
+                session = _create_session()
+                session.save_to_file(self.__path, binary=binary)
+                base_size = os.path.getsize(self.__path)
+                _change_session(session, 'first')
+                session.save_to_file(self.__path, incremental=True, compact_threshold=10)
+                _change_session(session, 'second')
+                session.indexed_db.add_db(IDBDatabase('added', 1))
+                session.save_to_file(self.__path, incremental=True, compact_threshold=10)
+                # The session file is left as it is, both saves were appended to the journal.
+                self.assertEqual(os.path.getsize(self.__path), base_size)
+                self.assertEqual(len([op for op in SessionJournal(self.__path).read() if op['op'] == 'commit']), 2)
+                loaded_session = SessionObject.create_from_file(self.__path)
+                self.__assert_session_equal(loaded_session, session)
+                message = loaded_session.indexed_db.get_db('wawc').get_object_store('message')
+                self.assertEqual([record['id'] for record in message.get_all_by_index('chat-0', 'byChat')],
+                                 [0, 4, 8, 12, 16, 20, 24, 28, 32, 36, 40, 44, 48, 100])
+                self.assertIsNone(message.get(2))
+
+    def test_unchanged_session(self):
+        session = _create_session()
+        session.save_to_file(self.__path)
+        session.save_to_file(self.__path, incremental=True)
+        self.assertFalse(SessionJournal(self.__path).exists())
+        self.assertEqual(diff_sessions(session, _create_session()), [])
+
+    def test_changed_base_file(self):
+        base_session, _ = self.__save_with_journal(binary=True)
+        stat = os.stat(self.__path)
+        os.utime(self.__path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        # The journal belongs to an older version of the file and is ignored.
+        self.assertEqual(SessionJournal(self.__path).read(), [])
+        self.__assert_session_equal(SessionObject.create_from_file(self.__path), base_session)
+        # The next save starts a new journal for the current file.
+        session = _create_session()
+        _change_session(session, 'new')
+        session.save_to_file(self.__path, incremental=True, compact_threshold=10)
+        self.assertEqual(SessionJournal(self.__path).read()[0]['op'], 'localStorage')
+        self.__assert_session_equal(SessionObject.create_from_file(self.__path), session)
+
+    def test_torn_journal(self):
+        _, session = self.__save_with_journal(binary=True)
+        journal_path = get_journal_path(self.__path)
+        with open(journal_path, 'rb') as file:
+            journal_data = file.read()
+        # an operation without a commit line and a last line that was not written completely
+        with open(journal_path, 'ab') as file:
+            file.write(json.dumps({'op': 'cookies', 'value': {}}).encode() + b'\n')
+            file.write(b'{"op":"localStorage","val')
+        self.__assert_session_equal(SessionObject.create_from_file(self.__path), session)
+        # The next save cuts off the incomplete operations.
+        _change_session(session, 'second')
+        session.save_to_file(self.__path, incremental=True, compact_threshold=10)
+        with open(journal_path, 'rb') as file:
+            self.assertTrue(file.read().startswith(journal_data))
+        self.__assert_session_equal(SessionObject.create_from_file(self.__path), session)
+
+    def test_compaction(self):
+        session = _create_session()
+        session.save_to_file(self.__path, binary=True)
+        _change_session(session, 'first')
+        session.save_to_file(self.__path, incremental=True, compact_threshold=1)
+        self.assertTrue(SessionJournal(self.__path).exists())
+        _change_session(session, 'x' * os.path.getsize(self.__path))
+        session.save_to_file(self.__path, incremental=True, compact_threshold=1)
+        # The journal grew larger than the file, so it was merged into a new file of the same format.
+        self.assertFalse(SessionJournal(self.__path).exists())
+        with SessionObject.create_from_file(self.__path) as loaded_session:
+            self.__assert_session_equal(loaded_session, session)
+        self.assertTrue(is_container(self.__path))
+
+    def test_unique_index_violation(self):
+        _, session = self.__save_with_journal(binary=False)
+        message = session.indexed_db.get_db('wawc').get_object_store('message')
+        data = list(message.get_data())
+        with self.assertRaises(ValueError):
+            message.apply_changes([{'id': 5, 'ref': 'r6'}])
+        # The object store is unchanged and its unique index still works.
+        self.assertEqual(list(message.get_data()), data)
+        self.assertEqual(message.get_by_index('r6', 'byRef')['id'], 6)
+        # A journal that violates a unique index cannot be applied.
+        SessionJournal(self.__path).append([{'op': 'put', 'db': 'wawc', 'store': 'message',
+                                             'value': {'id': 7, 'chat': 'chat-3', 'ref': 'r8'}}])
+        with self.assertRaises(ValueError):
+            SessionObject.create_from_file(self.__path)
+
+
+if __name__ == '__main__':
+    unittest.main()